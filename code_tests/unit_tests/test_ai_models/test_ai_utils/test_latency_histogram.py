@@ -0,0 +1,50 @@
+import pytest
+
+from forecasting_tools.ai_models.ai_utils.latency_histogram import (
+    LatencyHistogram,
+)
+
+
+def test_empty_histogram_has_no_percentile() -> None:
+    assert LatencyHistogram().percentile(95) is None
+
+
+def test_percentiles_are_within_bucket_error() -> None:
+    histogram = LatencyHistogram(growth_factor=1.1)
+    for duration in range(1, 101):
+        histogram.record(duration / 10)
+
+    p50 = histogram.percentile(50)
+    p95 = histogram.percentile(95)
+    assert p50 is not None and p95 is not None
+    assert 5 <= p50 <= 5 * 1.1
+    assert 9.5 <= p95 <= 9.5 * 1.1
+    assert histogram.percentile(100) == 10
+    assert histogram.count == 100
+
+
+def test_durations_outside_buckets_are_recorded() -> None:
+    histogram = LatencyHistogram(
+        smallest_bucket_in_seconds=1, largest_bucket_in_seconds=10
+    )
+    histogram.record(0.001)
+    histogram.record(500)
+    assert histogram.percentile(50) == 1
+    assert histogram.percentile(100) == 500
+
+
+def test_invalid_percentile_raises_error() -> None:
+    with pytest.raises(ValueError):
+        LatencyHistogram().percentile(101)
+
+
+def test_decaying_histogram_follows_recent_durations() -> None:
+    histogram = LatencyHistogram(half_life_in_records=10)
+    for _ in range(100):
+        histogram.record(1)
+    for _ in range(30):
+        histogram.record(20)
+
+    p50 = histogram.percentile(50)
+    assert p50 is not None and p50 > 10
+    assert histogram.count == 130
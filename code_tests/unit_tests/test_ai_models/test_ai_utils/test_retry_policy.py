@@ -0,0 +1,138 @@
+import asyncio
+
+import httpx
+import litellm
+import pytest
+
+from forecasting_tools.ai_models.ai_utils.retry_policy import (
+    ErrorCategory,
+    RetryPolicy,
+)
+from forecasting_tools.ai_models.resource_managers.hard_limit_manager import (
+    HardLimitExceededError,
+)
+
+
+class _HttpError(Exception):
+    def __init__(
+        self, status_code: int, headers: dict[str, str] | None = None
+    ) -> None:
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def _make_fast_policy(**kwargs) -> RetryPolicy:
+    return RetryPolicy(
+        min_wait_in_seconds=0,
+        max_wait_in_seconds=0.01,
+        wait_multiplier=0.01,
+        **kwargs,
+    )
+
+
+def _make_failing_call(errors: list[Exception]):
+    calls = 0
+
+    async def call() -> str:
+        nonlocal calls
+        calls += 1
+        if errors:
+            raise errors.pop(0)
+        return "Success"
+
+    return call, lambda: calls
+
+
+@pytest.mark.parametrize(
+    "error, expected_category",
+    [
+        (_HttpError(429), ErrorCategory.RATE_LIMIT),
+        (_HttpError(408), ErrorCategory.TIMEOUT),
+        (asyncio.TimeoutError(), ErrorCategory.TIMEOUT),
+        (_HttpError(503), ErrorCategory.TRANSIENT),
+        (RuntimeError("Connection reset"), ErrorCategory.TRANSIENT),
+        (_HttpError(400), ErrorCategory.FATAL),
+        (_HttpError(401), ErrorCategory.FATAL),
+        (HardLimitExceededError("Over budget"), ErrorCategory.FATAL),
+        (
+            litellm.BadRequestError(
+                message="Bad", model="gpt-4o", llm_provider="openai"
+            ),
+            ErrorCategory.FATAL,
+        ),
+        (
+            litellm.RateLimitError(
+                message="Slow down", model="gpt-4o", llm_provider="openai"
+            ),
+            ErrorCategory.RATE_LIMIT,
+        ),
+    ],
+)
+def test_errors_are_classified(
+    error: Exception, expected_category: ErrorCategory
+) -> None:
+    assert RetryPolicy().classify_error(error) == expected_category
+
+
+async def test_transient_errors_are_retried() -> None:
+    policy = _make_fast_policy()
+    call, get_calls = _make_failing_call([_HttpError(503), _HttpError(500)])
+    assert await policy.run(call, allowed_tries=3) == "Success"
+    assert get_calls() == 3
+    assert policy.metrics.retries_by_category[ErrorCategory.TRANSIENT] == 2
+    assert policy.metrics.total_retries == 2
+
+
+async def test_fatal_errors_are_not_retried() -> None:
+    policy = _make_fast_policy()
+    call, get_calls = _make_failing_call([_HttpError(400)])
+    with pytest.raises(_HttpError):
+        await policy.run(call, allowed_tries=3)
+    assert get_calls() == 1
+    assert policy.metrics.fatal_errors_not_retried == 1
+
+
+async def test_error_is_raised_when_tries_run_out() -> None:
+    policy = _make_fast_policy()
+    call, get_calls = _make_failing_call([_HttpError(503), _HttpError(503)])
+    with pytest.raises(_HttpError):
+        await policy.run(call, allowed_tries=2)
+    assert get_calls() == 2
+    assert policy.metrics.calls_that_ran_out_of_tries == 1
+
+
+async def test_retry_after_header_is_honored() -> None:
+    policy = _make_fast_policy()
+    error = _HttpError(429, {"Retry-After": "0.2"})
+    assert policy.get_wait_time(ErrorCategory.RATE_LIMIT, 1, error) == 0.2
+
+    error = _HttpError(429, {"retry-after-ms": "150"})
+    assert policy.get_wait_time(ErrorCategory.RATE_LIMIT, 1, error) == 0.15
+
+
+def test_retry_after_is_read_from_response_headers() -> None:
+    response = httpx.Response(
+        429,
+        headers={"retry-after": "3"},
+        request=httpx.Request("POST", "https://api.openai.com"),
+    )
+    error = litellm.RateLimitError(
+        message="Slow down",
+        model="gpt-4o",
+        llm_provider="openai",
+        response=response,
+    )
+    assert RetryPolicy.get_retry_after(error) == 3
+
+
+async def test_retry_is_skipped_when_it_would_pass_time_budget() -> None:
+    policy = _make_fast_policy(total_time_budget_in_seconds=0.1)
+    call, get_calls = _make_failing_call(
+        [_HttpError(429, {"Retry-After": "5"})]
+    )
+    with pytest.raises(_HttpError):
+        await policy.run(call, allowed_tries=3)
+    assert get_calls() == 1
+    assert policy.metrics.calls_that_ran_out_of_time_budget == 1
+    assert policy.metrics.total_seconds_slept == 0
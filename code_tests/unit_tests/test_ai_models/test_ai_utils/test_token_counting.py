@@ -0,0 +1,80 @@
+from unittest.mock import Mock
+
+from forecasting_tools.ai_models.ai_utils import token_counting
+from forecasting_tools.ai_models.ai_utils.token_counting import TokenCounter
+from forecasting_tools.ai_models.general_llm import GeneralLlm
+
+
+def _count_calls_not_from_warm_up(spy: Mock) -> int:
+    return len(
+        [
+            call
+            for call in spy.call_args_list
+            if call.kwargs.get("text") != "Warm up"
+        ]
+    )
+
+
+def test_counts_are_memoized(mocker: Mock) -> None:
+    TokenCounter.clear_cache()
+    spy = mocker.spy(token_counting, "token_counter")
+    messages = [{"role": "user", "content": "How many tokens is this?"}]
+
+    first_count = TokenCounter.count_message_tokens("gpt-4o", messages)
+    second_count = TokenCounter.count_message_tokens("gpt-4o", messages)
+
+    assert first_count == second_count > 0
+    assert _count_calls_not_from_warm_up(spy) == 1
+    assert TokenCounter.hits == 1
+    assert TokenCounter.misses == 1
+
+
+def test_cache_is_keyed_by_model_and_content(mocker: Mock) -> None:
+    TokenCounter.clear_cache()
+    spy = mocker.spy(token_counting, "token_counter")
+    TokenCounter.count_text_tokens("gpt-4o", "Hello")
+    TokenCounter.count_text_tokens("gpt-4o-mini", "Hello")
+    TokenCounter.count_text_tokens("gpt-4o", "Hello there")
+    assert _count_calls_not_from_warm_up(spy) == 3
+
+
+def test_least_recently_used_counts_are_evicted(mocker: Mock) -> None:
+    TokenCounter.clear_cache()
+    mocker.patch.object(TokenCounter, "MAX_CACHED_COUNTS", 2)
+    TokenCounter.count_text_tokens("gpt-4o", "1")
+    TokenCounter.count_text_tokens("gpt-4o", "2")
+    TokenCounter.count_text_tokens("gpt-4o", "1")
+    TokenCounter.count_text_tokens("gpt-4o", "3")
+
+    spy = mocker.spy(token_counting, "token_counter")
+    TokenCounter.count_text_tokens("gpt-4o", "1")
+    assert _count_calls_not_from_warm_up(spy) == 0
+    TokenCounter.count_text_tokens("gpt-4o", "2")
+    assert _count_calls_not_from_warm_up(spy) == 1
+
+
+def test_approximate_count_is_close_to_exact_count() -> None:
+    text = "The quick brown fox jumps over the lazy dog. " * 50
+    exact_count = TokenCounter.count_text_tokens("gpt-4o", text)
+    approximate_count = TokenCounter.approximate_tokens(text)
+    assert 0.5 * exact_count < approximate_count < 2 * exact_count
+
+    messages = [{"role": "user", "content": text}]
+    assert TokenCounter.approximate_tokens(messages) > approximate_count
+
+
+def test_general_llm_uses_memoized_counter(mocker: Mock) -> None:
+    TokenCounter.clear_cache()
+    spy = mocker.spy(token_counting, "token_counter")
+    model = GeneralLlm(model="gpt-4o")
+    model.input_to_tokens("Hi")
+    model.input_to_tokens("Hi")
+    assert _count_calls_not_from_warm_up(spy) == 1
+
+
+def test_warm_up_runs_once_per_model(mocker: Mock) -> None:
+    mocker.patch.object(TokenCounter, "_warmed_up_models", set())
+    spy = mocker.spy(token_counting, "token_counter")
+    TokenCounter.start_background_warm_up(["gpt-4o"]).join()
+    TokenCounter.start_background_warm_up(["gpt-4o"]).join()
+    assert spy.call_count == 1
@@ -0,0 +1,600 @@
+import asyncio
+from unittest.mock import Mock
+
+import litellm
+import pytest
+from litellm.types.utils import Delta, ModelResponseStream, StreamingChoices
+from pydantic import BaseModel
+
+from forecasting_tools.ai_models.ai_utils.response_types import (
+    MultipleTextTokenCostResponse,
+    TextTokenCostResponse,
+)
+from forecasting_tools.ai_models.general_llm import (
+    CacheablePrompt,
+    GeneralLlm,
+    HedgePolicy,
+    TimeoutPolicy,
+)
+from forecasting_tools.ai_models.resource_managers.adaptive_concurrency_limiter import (
+    AdaptiveConcurrencyLimiter,
+)
+from forecasting_tools.ai_models.resource_managers.monetary_cost_manager import (
+    MonetaryCostManager,
+)
+from forecasting_tools.forecast_helpers.prediction_extractor import (
+    PredictionExtractor,
+)
+
+
+def _make_response(
+    text: str = "Hello", cost: float = 0.1
+) -> TextTokenCostResponse:
+    return TextTokenCostResponse(
+        data=text,
+        prompt_tokens_used=10,
+        completion_tokens_used=5,
+        total_tokens_used=15,
+        model="gpt-4o",
+        cost=cost,
+    )
+
+
+def _make_multiple_response(
+    texts: list[str], cost: float = 0.1
+) -> MultipleTextTokenCostResponse:
+    return MultipleTextTokenCostResponse(
+        data=texts,
+        prompt_tokens_used=10,
+        completion_tokens_used=5 * len(texts),
+        total_tokens_used=10 + 5 * len(texts),
+        model="gpt-4o",
+        cost=cost,
+    )
+
+
+async def test_multiple_samples_use_one_request_when_n_is_supported(
+    mocker: Mock,
+) -> None:
+    mock_samples_call = mocker.patch.object(
+        GeneralLlm,
+        "_mockable_direct_call_to_model_for_samples",
+        return_value=_make_multiple_response(["1", "2", "3"], cost=0.3),
+    )
+    mock_single_call = mocker.patch.object(
+        GeneralLlm, "_mockable_direct_call_to_model"
+    )
+    model = GeneralLlm(model="gpt-4o", temperature=0.7)
+
+    with MonetaryCostManager(10) as cost_manager:
+        samples = await model.invoke_and_return_multiple_samples("Hi", 3)
+
+    assert samples == ["1", "2", "3"]
+    assert mock_samples_call.call_count == 1
+    assert mock_single_call.call_count == 0
+    assert cost_manager.current_usage == pytest.approx(0.3)
+
+
+async def test_multiple_samples_fall_back_to_concurrent_calls(
+    mocker: Mock,
+) -> None:
+    mock_samples_call = mocker.patch.object(
+        GeneralLlm, "_mockable_direct_call_to_model_for_samples"
+    )
+    mock_single_call = mocker.patch.object(
+        GeneralLlm,
+        "_mockable_direct_call_to_model",
+        return_value=_make_response(),
+    )
+    model = GeneralLlm(model="claude-3-5-sonnet-20241022", temperature=0.7)
+    assert not model.model_supports_multiple_samples()
+
+    samples = await model.invoke_and_return_multiple_samples("Hi", 3)
+
+    assert samples == ["Hello"] * 3
+    assert mock_samples_call.call_count == 0
+    assert mock_single_call.call_count == 3
+
+
+async def test_missing_samples_are_requested_individually(
+    mocker: Mock,
+) -> None:
+    mocker.patch.object(
+        GeneralLlm,
+        "_mockable_direct_call_to_model_for_samples",
+        return_value=_make_multiple_response(["1"]),
+    )
+    mock_single_call = mocker.patch.object(
+        GeneralLlm,
+        "_mockable_direct_call_to_model",
+        return_value=_make_response(),
+    )
+    model = GeneralLlm(model="gpt-4o", temperature=0.7)
+
+    samples = await model.invoke_and_return_multiple_samples("Hi", 3)
+
+    assert samples == ["1", "Hello", "Hello"]
+    assert mock_single_call.call_count == 2
+
+
+async def test_invalid_number_of_samples_raises_error() -> None:
+    model = GeneralLlm(model="gpt-4o")
+    with pytest.raises(ValueError):
+        await model.invoke_and_return_multiple_samples("Hi", 0)
+
+
+class _FakeStream:
+    def __init__(self, texts: list[str]) -> None:
+        self._chunks = [
+            ModelResponseStream(
+                model="gpt-4o",
+                choices=[StreamingChoices(delta=Delta(content=text))],
+            )
+            for text in texts
+        ]
+        self.chunks_read = 0
+        self.was_closed = False
+        self.completion_stream = self
+
+    def __aiter__(self) -> "_FakeStream":
+        return self
+
+    async def __anext__(self) -> ModelResponseStream:
+        if self.chunks_read >= len(self._chunks):
+            raise StopAsyncIteration
+        chunk = self._chunks[self.chunks_read]
+        self.chunks_read += 1
+        return chunk
+
+    async def aclose(self) -> None:
+        self.was_closed = True
+
+
+async def test_stream_stops_once_answer_is_stated(mocker: Mock) -> None:
+    fake_stream = _FakeStream(
+        ["Some reasoning. ", "Probability: 4", "0%", " and more text", "..."]
+    )
+    mocker.patch(
+        "forecasting_tools.ai_models.general_llm.acompletion",
+        return_value=fake_stream,
+    )
+    model = GeneralLlm(model="gpt-4o")
+
+    with MonetaryCostManager(10) as cost_manager:
+        text = await model.invoke_with_early_stop(
+            "Hi", PredictionExtractor.final_probability_is_stated
+        )
+
+    assert text == "Some reasoning. Probability: 40%"
+    assert fake_stream.chunks_read == 3
+    assert fake_stream.was_closed
+    assert cost_manager.current_usage > 0
+    metrics = model.get_streaming_metrics()[-1]
+    assert metrics.stopped_early
+    assert metrics.time_to_first_token is not None
+    assert metrics.time_to_answer is not None
+
+
+async def test_stream_without_stop_condition_reads_everything(
+    mocker: Mock,
+) -> None:
+    fake_stream = _FakeStream(["Hello", " ", "world"])
+    mocker.patch(
+        "forecasting_tools.ai_models.general_llm.acompletion",
+        return_value=fake_stream,
+    )
+    model = GeneralLlm(model="gpt-4o")
+
+    pieces = [piece async for piece in model.invoke_stream("Hi")]
+
+    assert pieces == ["Hello", " ", "world"]
+    assert not fake_stream.was_closed
+    metrics = model.get_streaming_metrics()[-1]
+    assert not metrics.stopped_early
+    assert metrics.time_to_answer is None
+
+
+def test_models_from_same_provider_share_concurrency_limiter() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+    GeneralLlm.set_concurrency_limiter("openai", limiter)
+    try:
+        assert GeneralLlm(model="gpt-4o").get_concurrency_limiter() is limiter
+        assert (
+            GeneralLlm(model="openai/gpt-4o-mini").get_concurrency_limiter()
+            is limiter
+        )
+        assert (
+            GeneralLlm(
+                model="anthropic/claude-3-5-sonnet-latest"
+            ).get_concurrency_limiter()
+            is None
+        )
+    finally:
+        GeneralLlm.set_concurrency_limiter("openai", None)
+    assert GeneralLlm(model="gpt-4o").get_concurrency_limiter() is None
+
+
+def test_rate_limits_are_keyed_by_provider_and_api_key() -> None:
+    GeneralLlm.set_rate_limits("openai", tokens_per_minute=1000)
+    GeneralLlm.set_rate_limits(
+        "openai", requests_per_minute=10, api_key="other-key"
+    )
+    try:
+        default_key_limiter = GeneralLlm(model="gpt-4o").get_rate_limiter()
+        other_key_limiter = GeneralLlm(
+            model="gpt-4o", api_key="other-key"
+        ).get_rate_limiter()
+        assert default_key_limiter is not None
+        assert default_key_limiter.tokens_per_minute == 1000
+        assert other_key_limiter is not None
+        assert other_key_limiter.requests_per_minute == 10
+        assert (
+            GeneralLlm(
+                model="anthropic/claude-3-5-sonnet-latest"
+            ).get_rate_limiter()
+            is None
+        )
+    finally:
+        GeneralLlm.set_rate_limits("openai")
+        GeneralLlm.set_rate_limits("openai", api_key="other-key")
+    assert GeneralLlm(model="gpt-4o").get_rate_limiter() is None
+
+
+async def test_failed_call_gives_back_its_rate_limited_tokens(
+    mocker: Mock,
+) -> None:
+    mocker.patch(
+        "forecasting_tools.ai_models.general_llm.acompletion",
+        side_effect=RuntimeError("provider is down"),
+    )
+    GeneralLlm.set_rate_limits("openai", tokens_per_minute=60)
+    try:
+        model = GeneralLlm(model="gpt-4o", allowed_tries=1)
+        with pytest.raises(RuntimeError):
+            await model.invoke("Hi there, how are you doing today?")
+        rate_limiter = model.get_rate_limiter()
+        assert rate_limiter is not None
+        token_limiter = rate_limiter._token_limiter
+        assert token_limiter is not None
+        assert token_limiter.refresh_and_then_get_available_resources() == (
+            pytest.approx(60, abs=1)
+        )
+    finally:
+        GeneralLlm.set_rate_limits("openai")
+
+
+async def test_stream_reconciles_rate_limited_tokens_with_final_usage(
+    mocker: Mock,
+) -> None:
+    fake_stream = _FakeStream(["Hello", " ", "world"] * 20)
+    mocker.patch(
+        "forecasting_tools.ai_models.general_llm.acompletion",
+        return_value=fake_stream,
+    )
+    GeneralLlm.set_rate_limits("openai", tokens_per_minute=600)
+    try:
+        model = GeneralLlm(model="gpt-4o")
+        messages = model.model_input_to_message("Hi")
+        pieces = [piece async for piece in model.invoke_stream("Hi")]
+        rate_limiter = model.get_rate_limiter()
+        assert rate_limiter is not None
+        token_limiter = rate_limiter._token_limiter
+        assert token_limiter is not None
+        usage = litellm.stream_chunk_builder(
+            fake_stream._chunks, messages=messages
+        ).usage  # type: ignore
+        assert usage.completion_tokens > 0
+        assert token_limiter.refresh_and_then_get_available_resources() == (
+            pytest.approx(600 - usage.total_tokens, abs=2)
+        )
+    finally:
+        GeneralLlm.set_rate_limits("openai")
+    assert "".join(pieces) == "Hello world" * 20
+
+
+def _make_hedged_model(
+    mocker: Mock, fallback_llm: GeneralLlm | None = None
+) -> GeneralLlm:
+    mocker.patch.dict(GeneralLlm._model_trackers, clear=True)
+    model = GeneralLlm(
+        model="gpt-4o",
+        temperature=0.5,
+        hedge_policy=HedgePolicy(
+            latency_percentile=90,
+            fallback_llm=fallback_llm,
+            min_calls_before_hedging=5,
+            min_hedge_delay_in_seconds=0.01,
+        ),
+    )
+    for _ in range(10):
+        model._get_model_tracker().latency_histogram.record(0.05)
+    return model
+
+
+async def test_slow_call_is_hedged_and_loser_is_charged(mocker: Mock) -> None:
+    fallback_llm = GeneralLlm(model="gpt-4o-mini")
+    model = _make_hedged_model(mocker, fallback_llm)
+    primary_was_cancelled = False
+
+    async def slow_primary_call(*args, **kwargs) -> TextTokenCostResponse:
+        nonlocal primary_was_cancelled
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            primary_was_cancelled = True
+            raise
+        return _make_response("Slow")
+
+    async def fast_hedge_call(*args, **kwargs) -> TextTokenCostResponse:
+        return _make_response("Fast", cost=0.2)
+
+    mocker.patch.object(model, "_call_litellm", side_effect=slow_primary_call)
+    mocker.patch.object(
+        fallback_llm, "_call_litellm", side_effect=fast_hedge_call
+    )
+
+    with MonetaryCostManager(10) as cost_manager:
+        response = await asyncio.wait_for(model.invoke("Hi"), timeout=1)
+    await asyncio.sleep(0)
+
+    assert response == "Fast"
+    assert primary_was_cancelled
+    assert cost_manager.current_usage > 0.2
+    model_tracker = model._get_model_tracker()
+    assert model_tracker.hedged_calls == 1
+    assert model_tracker.hedged_calls_won_by_hedge == 1
+
+
+async def test_fast_call_is_not_hedged(mocker: Mock) -> None:
+    model = _make_hedged_model(mocker)
+    mock_call = mocker.patch.object(
+        GeneralLlm, "_call_litellm", return_value=_make_response()
+    )
+
+    await model.invoke("Hi")
+
+    assert mock_call.call_count == 1
+    assert model._get_model_tracker().hedged_calls == 0
+
+
+async def test_no_hedging_before_enough_latency_data(mocker: Mock) -> None:
+    mocker.patch.dict(GeneralLlm._model_trackers, clear=True)
+    model = GeneralLlm(model="gpt-4o", hedge_policy=HedgePolicy())
+    assert model._get_hedge_delay() is None
+
+
+def test_cacheable_prompt_marks_prefix_for_anthropic() -> None:
+    prompt = CacheablePrompt(
+        stable_prefix="Question and research", variable_suffix="Instructions"
+    )
+
+    messages = GeneralLlm(
+        model="anthropic/claude-3-5-sonnet-20241022"
+    ).model_input_to_message(prompt)
+    content = messages[0]["content"]
+    assert content[0]["text"] == "Question and research"
+    assert content[0]["cache_control"] == {"type": "ephemeral"}
+    assert content[1]["text"] == "Instructions"
+    assert "cache_control" not in content[1]
+
+    messages = GeneralLlm(model="gpt-4o").model_input_to_message(prompt)
+    assert messages == [
+        {"role": "user", "content": "Question and research\n\nInstructions"}
+    ]
+
+
+async def test_cached_prompt_tokens_are_reported(mocker: Mock) -> None:
+    response = litellm.ModelResponse(
+        model="gpt-4o",
+        choices=[{"message": {"role": "assistant", "content": "Hello"}}],
+        usage={
+            "prompt_tokens": 2000,
+            "completion_tokens": 10,
+            "total_tokens": 2010,
+            "prompt_tokens_details": {"cached_tokens": 1536},
+        },
+    )
+    mocker.patch(
+        "forecasting_tools.ai_models.general_llm.acompletion",
+        return_value=response,
+    )
+    model = GeneralLlm(model="gpt-4o", temperature=0.5)
+
+    text_response = await model._mockable_direct_call_to_model("Hi")
+
+    assert text_response.cached_prompt_tokens_used == 1536
+    assert text_response.prompt_tokens_used == 2000
+
+
+class ForecastExample(BaseModel):
+    question: str
+    probability: float
+
+
+def _make_litellm_response(text: str) -> litellm.ModelResponse:
+    return litellm.ModelResponse(
+        model="gpt-4o",
+        choices=[{"message": {"role": "assistant", "content": text}}],
+        usage={
+            "prompt_tokens": 10,
+            "completion_tokens": 5,
+            "total_tokens": 15,
+        },
+    )
+
+
+async def test_pydantic_output_is_requested_with_response_format(
+    mocker: Mock,
+) -> None:
+    structured_output = (
+        '{"items": [{"question": "Will it rain?", "probability": 0.3}]}'
+    )
+    mock_acompletion = mocker.patch(
+        "forecasting_tools.ai_models.general_llm.acompletion",
+        return_value=_make_litellm_response(structured_output),
+    )
+    model = GeneralLlm(model="gpt-4o", temperature=0.5)
+
+    forecasts = await model.invoke_and_return_verified_type(
+        "Give forecasts", list[ForecastExample]
+    )
+
+    assert forecasts == [
+        ForecastExample(question="Will it rain?", probability=0.3)
+    ]
+    response_format = mock_acompletion.call_args.kwargs["response_format"]
+    assert response_format["type"] == "json_schema"
+    assert "response_format" not in model.litellm_kwargs
+
+
+async def test_rejected_response_format_falls_back_to_free_text(
+    mocker: Mock,
+) -> None:
+    free_text_output = (
+        'Here you go: {"question": "Will it rain?", "probability": 0.3}'
+    )
+
+    async def reject_response_format(**kwargs) -> litellm.ModelResponse:
+        if "response_format" in kwargs:
+            raise litellm.BadRequestError(
+                message="Invalid schema", model="gpt-4o", llm_provider="openai"
+            )
+        return _make_litellm_response(free_text_output)
+
+    mock_acompletion = mocker.patch(
+        "forecasting_tools.ai_models.general_llm.acompletion",
+        side_effect=reject_response_format,
+    )
+    model = GeneralLlm(model="gpt-4o", temperature=0.5)
+
+    for _ in range(2):
+        forecast = await model.invoke_and_return_verified_type(
+            "Give a forecast", ForecastExample
+        )
+        assert forecast.probability == 0.3
+    assert mock_acompletion.call_count == 3
+
+
+async def test_unsupported_models_parse_free_text(mocker: Mock) -> None:
+    mock_acompletion = mocker.patch(
+        "forecasting_tools.ai_models.general_llm.acompletion",
+        return_value=_make_litellm_response(
+            '[{"question": "Will it rain?", "probability": 0.3}]'
+        ),
+    )
+    model = GeneralLlm(model="perplexity/sonar", temperature=0.5)
+
+    forecasts = await model.invoke_and_return_verified_type(
+        "Give forecasts", list[ForecastExample]
+    )
+
+    assert forecasts[0].probability == 0.3
+    assert "response_format" not in mock_acompletion.call_args.kwargs
+
+
+def test_timeout_adapts_to_latency_by_prompt_size() -> None:
+    GeneralLlm._model_trackers.pop("gpt-4-turbo", None)
+    model = GeneralLlm(model="gpt-4-turbo")
+    static_timeout = model.litellm_kwargs["timeout"]
+    assert model.get_timeout_for_call(100) == static_timeout
+
+    model_tracker = model._get_model_tracker()
+    for _ in range(20):
+        model_tracker.record_call(
+            succeeded=True, duration=20, prompt_tokens=100
+        )
+
+    expected_timeout = pytest.approx(20 * 1.5 + 5, rel=0.2)
+    assert model.get_timeout_for_call(100) == expected_timeout
+    assert model.get_timeout_for_call(50_000) == static_timeout
+    fixed_timeout_model = GeneralLlm(model="gpt-4-turbo", timeout=7)
+    assert fixed_timeout_model.get_timeout_for_call(100) == 7
+
+
+def test_adaptive_timeout_stays_within_bounds() -> None:
+    GeneralLlm._model_trackers.pop("gpt-4-turbo", None)
+    policy = TimeoutPolicy(
+        min_timeout_in_seconds=15,
+        max_timeout_in_seconds=60,
+        min_calls_before_adapting=5,
+    )
+    model = GeneralLlm(model="gpt-4-turbo", timeout_policy=policy)
+    model_tracker = model._get_model_tracker()
+    for _ in range(5):
+        model_tracker.record_call(succeeded=True, duration=1, prompt_tokens=10)
+        model_tracker.record_call(
+            succeeded=True, duration=100, prompt_tokens=10_000
+        )
+
+    assert model.get_timeout_for_call(10) == 15
+    assert model.get_timeout_for_call(10_000) == 60
+
+
+def test_timed_out_calls_raise_the_adaptive_timeout() -> None:
+    GeneralLlm._model_trackers.pop("gpt-4-turbo", None)
+    model = GeneralLlm(
+        model="gpt-4-turbo",
+        timeout_policy=TimeoutPolicy(
+            latency_percentile=90, min_calls_before_adapting=5
+        ),
+    )
+    model_tracker = model._get_model_tracker()
+    for _ in range(5):
+        model_tracker.record_call(
+            succeeded=True, duration=10, prompt_tokens=10
+        )
+    timeout_before = model.get_timeout_for_call(10)
+    for _ in range(5):
+        model_tracker.record_call(
+            succeeded=False,
+            duration=timeout_before,
+            prompt_tokens=10,
+            timed_out=True,
+        )
+        model_tracker.record_call(
+            succeeded=False, duration=0.1, prompt_tokens=10
+        )
+
+    assert model.get_timeout_for_call(10) > timeout_before
+    assert model_tracker.latency_histogram.count == 10
+
+
+async def test_calls_that_time_out_are_recorded_at_their_timeout(
+    mocker: Mock,
+) -> None:
+    GeneralLlm._model_trackers.pop("gpt-4-turbo", None)
+    mocker.patch(
+        "forecasting_tools.ai_models.general_llm.acompletion",
+        side_effect=litellm.Timeout(
+            message="timed out", model="gpt-4-turbo", llm_provider="openai"
+        ),
+    )
+    model = GeneralLlm(model="gpt-4-turbo", timeout=30, allowed_tries=1)
+
+    with pytest.raises(litellm.Timeout):
+        await model.invoke("Hi")
+
+    latency = model._get_model_tracker().latency_histogram.percentile(100)
+    assert latency == pytest.approx(30, rel=0.2)
+
+
+async def test_adaptive_timeout_is_sent_to_provider(mocker: Mock) -> None:
+    GeneralLlm._model_trackers.pop("gpt-4-turbo", None)
+    mock_acompletion = mocker.patch(
+        "forecasting_tools.ai_models.general_llm.acompletion",
+        return_value=_make_litellm_response("Hello"),
+    )
+    model = GeneralLlm(
+        model="gpt-4-turbo",
+        temperature=0.5,
+        timeout_policy=TimeoutPolicy(min_calls_before_adapting=1),
+    )
+    model._get_model_tracker().record_call(
+        succeeded=True, duration=30, prompt_tokens=10
+    )
+
+    await model.invoke("Hi")
+
+    timeout = mock_acompletion.call_args.kwargs["timeout"]
+    assert timeout == pytest.approx(30 * 1.5 + 5, rel=0.2)
+    assert model.litellm_kwargs["timeout"] != timeout
@@ -1,7 +1,16 @@
+import base64
+import os
+from io import BytesIO
+from unittest.mock import Mock
+
+from PIL import Image
+
 from code_tests.unit_tests.test_ai_models.models_to_test import (
     GeneralLlmInstancesToTest,
 )
+from forecasting_tools.ai_models.ai_utils import token_counting
 from forecasting_tools.ai_models.ai_utils.openai_utils import OpenAiUtils
+from forecasting_tools.ai_models.ai_utils.token_counting import TokenCounter
 
 
 ################################## Message Creation Tests ##################################
@@ -47,3 +56,98 @@ def test_system_and_vision_message_creator_has_two_messages() -> None:
     assert (
         length_of_messages == 2
     ), "Length of system and vision message from prompt is not 2"
+
+
+################################## Image Dimension Tests ##################################
+def _make_noisy_png(width: int, height: int) -> bytes:
+    image = Image.frombytes(
+        "RGB", (width, height), os.urandom(width * height * 3)
+    )
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class _RecordingResponse(BytesIO):
+    bytes_read = 0
+
+    def read(self, size: int | None = -1) -> bytes:
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def test_image_dimensions_are_read_from_the_url_header_only(
+    mocker: Mock,
+) -> None:
+    OpenAiUtils.clear_image_dimensions_cache()
+    image_bytes = _make_noisy_png(1200, 900)
+    response = _RecordingResponse(image_bytes)
+    mock_urlopen = mocker.patch(
+        "forecasting_tools.ai_models.ai_utils.openai_utils.request.urlopen",
+        return_value=response,
+    )
+    url = "https://www.example.com/chart.png"
+
+    assert OpenAiUtils.get_image_dimensions(url) == (1200, 900)
+    assert OpenAiUtils.get_image_dimensions(url) == (1200, 900)
+    assert response.bytes_read <= OpenAiUtils.IMAGE_PROBE_CHUNK_SIZE_IN_BYTES
+    assert len(image_bytes) > 100 * OpenAiUtils.IMAGE_PROBE_CHUNK_SIZE_IN_BYTES
+    assert mock_urlopen.call_count == 1
+    assert (
+        mock_urlopen.call_args.kwargs["timeout"]
+        == OpenAiUtils.IMAGE_PROBE_TIMEOUT_IN_SECONDS
+    )
+
+
+async def test_base64_image_dimensions_are_cached(mocker: Mock) -> None:
+    OpenAiUtils.clear_image_dimensions_cache()
+    b64_image = base64.b64encode(_make_noisy_png(300, 200)).decode()
+    data_url = f"data:image/png;base64,{b64_image}"
+    spy = mocker.spy(base64, "b64decode")
+
+    assert await OpenAiUtils.get_image_dimensions_async(data_url) == (300, 200)
+    assert OpenAiUtils.get_image_dimensions(data_url) == (300, 200)
+    assert spy.call_count == 1
+
+
+def test_image_tokens_are_counted_without_litellm_fetching_the_image(
+    mocker: Mock,
+) -> None:
+    TokenCounter.clear_cache()
+    OpenAiUtils.clear_image_dimensions_cache()
+    mock_litellm_fetch = mocker.patch(
+        "litellm.litellm_core_utils.token_counter.get_image_dimensions"
+    )
+    spy = mocker.spy(token_counting, "token_counter")
+    b64_image = base64.b64encode(_make_noisy_png(1024, 1024)).decode()
+    messages = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "Describe this"},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/png;base64,{b64_image}",
+                        "detail": "high",
+                    },
+                },
+            ],
+        }
+    ]
+    text_only_messages = [{"role": "user", "content": "Describe this"}]
+
+    image_message_tokens = TokenCounter.count_message_tokens(
+        "gpt-4o", messages
+    )
+    text_message_tokens = TokenCounter.count_message_tokens(
+        "gpt-4o", text_only_messages
+    )
+
+    assert image_message_tokens - text_message_tokens == 765
+    assert mock_litellm_fetch.call_count == 0
+    assert all(
+        "image_url" not in str(call.kwargs.get("messages"))
+        for call in spy.call_args_list
+    )
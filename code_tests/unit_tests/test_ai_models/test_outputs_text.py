@@ -278,6 +278,24 @@ def test_schema_generation_works() -> None:
     assert "list_value" in format_instructions
 
 
+def test_response_format_is_only_made_for_pydantic_types() -> None:
+    model_format = OutputsText.make_response_format_for_type(
+        PydanticModelExample
+    )
+    assert model_format is not None
+    assert model_format["json_schema"]["name"] == "PydanticModelExample"
+
+    list_format = OutputsText.make_response_format_for_type(
+        list[PydanticModelExample]
+    )
+    assert list_format is not None
+    assert list_format["json_schema"]["schema"]["required"] == ["items"]
+
+    assert OutputsText.make_response_format_for_type(int) is None
+    assert OutputsText.make_response_format_for_type(list[str]) is None
+    assert OutputsText.make_response_format_for_type(dict) is None
+
+
 def mock_the_value_output_of_invoke(
     mocker: Mock, ai_model: type[AiModel], mock_value: str
 ) -> None:
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from forecasting_tools.ai_models.resource_managers.adaptive_concurrency_limiter import (
+    AdaptiveConcurrencyLimiter,
+)
+
+
+class _FakeRateLimitError(Exception):
+    status_code = 429
+
+
+async def test_limit_increases_additively_on_success() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=10)
+    for _ in range(4):
+        async with limiter.limit_concurrency():
+            pass
+    assert limiter.limit == 3
+
+
+async def test_limit_does_not_pass_ceiling() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=3)
+    for _ in range(50):
+        async with limiter.limit_concurrency():
+            pass
+    assert limiter.limit == 3
+
+
+async def test_limit_decreases_multiplicatively_on_rate_limit() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, min_limit=3)
+    with pytest.raises(_FakeRateLimitError):
+        async with limiter.limit_concurrency():
+            raise _FakeRateLimitError()
+    assert limiter.limit == 4
+
+    with pytest.raises(asyncio.TimeoutError):
+        async with limiter.limit_concurrency():
+            raise asyncio.TimeoutError()
+    assert limiter.limit == 3
+
+
+async def test_other_errors_do_not_change_limit() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+    with pytest.raises(ValueError):
+        async with limiter.limit_concurrency():
+            raise ValueError()
+    assert limiter.limit == 4
+    assert limiter.calls_in_flight == 0
+
+
+async def test_concurrent_failures_only_cut_limit_once() -> None:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+
+    async def failing_call() -> None:
+        async with limiter.limit_concurrency():
+            await asyncio.sleep(0.01)
+            raise _FakeRateLimitError()
+
+    results = await asyncio.gather(
+        *[failing_call() for _ in range(8)], return_exceptions=True
+    )
+    assert all(isinstance(result, _FakeRateLimitError) for result in results)
+    assert limiter.limit == 4
+    assert limiter.number_of_decreases == 1
+
+
+async def test_concurrency_never_exceeds_limit() -> None:
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=3, max_limit=3, min_limit=1
+    )
+    max_seen_in_flight = 0
+
+    async def call() -> None:
+        nonlocal max_seen_in_flight
+        async with limiter.limit_concurrency():
+            max_seen_in_flight = max(
+                max_seen_in_flight, limiter.calls_in_flight
+            )
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*[call() for _ in range(20)])
+    assert max_seen_in_flight == 3
+    assert limiter.calls_in_flight == 0
+
+
+async def test_cancelled_waiter_does_not_take_a_slot() -> None:
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=1, max_limit=1, min_limit=1
+    )
+    release = asyncio.Event()
+
+    async def holder() -> None:
+        async with limiter.limit_concurrency():
+            await release.wait()
+
+    holder_task = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    waiter_task = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    waiter_task.cancel()
+    release.set()
+    await holder_task
+    with pytest.raises(asyncio.CancelledError):
+        await waiter_task
+    assert limiter.calls_in_flight == 0
+
+    async with limiter.limit_concurrency():
+        assert limiter.calls_in_flight == 1
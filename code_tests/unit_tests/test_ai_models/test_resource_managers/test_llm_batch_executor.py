@@ -0,0 +1,318 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import AsyncIterator
+
+import pytest
+from aiohttp import web
+
+from forecasting_tools.ai_models.general_llm import GeneralLlm
+from forecasting_tools.ai_models.resource_managers.llm_batch_executor import (
+    LlmBatchError,
+    LlmBatchExecutor,
+)
+from forecasting_tools.ai_models.resource_managers.monetary_cost_manager import (
+    MonetaryCostManager,
+)
+
+
+class LocalBatchServer:
+    """
+    A stand-in for the OpenAI Files and Batches endpoints. Every request is
+    answered with "Echo: <last message>", except prompts containing "fail",
+    which are written to the error file, and prompts containing "invalid",
+    which are rejected with a 400.
+    """
+
+    def __init__(self) -> None:
+        self.files: dict[str, str] = {}
+        self.batches: dict[str, dict] = {}
+        self.polls_before_completion = 1
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/files", self.create_file)
+        app.router.add_get("/v1/files/{file_id}/content", self.file_content)
+        app.router.add_post("/v1/batches", self.create_batch)
+        app.router.add_get("/v1/batches/{batch_id}", self.retrieve_batch)
+        return app
+
+    async def create_file(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        uploaded_file = form["file"]
+        assert isinstance(uploaded_file, web.FileField)
+        file_id = f"file-{len(self.files)}"
+        self.files[file_id] = uploaded_file.file.read().decode()
+        return web.json_response(self._file_object(file_id))
+
+    async def file_content(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.files[request.match_info["file_id"]])
+
+    async def create_batch(self, request: web.Request) -> web.Response:
+        batch_request = await request.json()
+        batch_id = f"batch-{len(self.batches)}"
+        output_lines = []
+        error_lines = []
+        input_file = self.files[batch_request["input_file_id"]]
+        for line in input_file.splitlines():
+            request_line = json.loads(line)
+            prompt = request_line["body"]["messages"][-1]["content"]
+            if "fail" in prompt:
+                error_lines.append(
+                    {
+                        "custom_id": request_line["custom_id"],
+                        "response": None,
+                        "error": {"code": "server_error", "message": "boom"},
+                    }
+                )
+                continue
+            if "invalid" in prompt:
+                output_lines.append(
+                    {
+                        "custom_id": request_line["custom_id"],
+                        "response": {
+                            "status_code": 400,
+                            "body": {"error": {"message": "Bad param"}},
+                        },
+                        "error": None,
+                    }
+                )
+                continue
+            number_of_samples = request_line["body"].get("n", 1)
+            output_lines.append(
+                {
+                    "custom_id": request_line["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "choices": [
+                                {
+                                    "index": index,
+                                    "message": {
+                                        "role": "assistant",
+                                        "content": f"Echo: {prompt}",
+                                    },
+                                }
+                                for index in range(number_of_samples)
+                            ],
+                            "usage": {
+                                "prompt_tokens": 1000,
+                                "completion_tokens": 100,
+                                "total_tokens": 1100,
+                            },
+                        },
+                    },
+                    "error": None,
+                }
+            )
+        output_file_id = self._save_lines(output_lines)
+        error_file_id = self._save_lines(error_lines)
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": batch_request["endpoint"],
+            "input_file_id": batch_request["input_file_id"],
+            "completion_window": "24h",
+            "status": "in_progress",
+            "created_at": 0,
+            "output_file_id": output_file_id,
+            "error_file_id": error_file_id,
+            "polls": 0,
+        }
+        return web.json_response(self._batch_object(batch_id))
+
+    async def retrieve_batch(self, request: web.Request) -> web.Response:
+        batch_id = request.match_info["batch_id"]
+        batch = self.batches[batch_id]
+        batch["polls"] += 1
+        if batch["polls"] >= self.polls_before_completion:
+            batch["status"] = "completed"
+        return web.json_response(self._batch_object(batch_id))
+
+    def _save_lines(self, lines: list[dict]) -> str | None:
+        if not lines:
+            return None
+        file_id = f"file-{len(self.files)}"
+        self.files[file_id] = "\n".join(json.dumps(line) for line in lines)
+        return file_id
+
+    def _batch_object(self, batch_id: str) -> dict:
+        batch = self.batches[batch_id]
+        batch_object = {
+            key: value for key, value in batch.items() if key != "polls"
+        }
+        if batch["status"] != "completed":
+            batch_object["output_file_id"] = None
+            batch_object["error_file_id"] = None
+        return batch_object
+
+    @staticmethod
+    def _file_object(file_id: str) -> dict:
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": 0,
+            "created_at": 0,
+            "filename": "batch.jsonl",
+            "purpose": "batch",
+            "status": "processed",
+        }
+
+
+@pytest.fixture
+async def batch_server() -> AsyncIterator[tuple[LocalBatchServer, str]]:
+    server = LocalBatchServer()
+    runner = web.AppRunner(server.make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    yield server, f"http://127.0.0.1:{port}/v1"
+    await runner.cleanup()
+
+
+def make_executor(base_url: str, tmp_path: Path) -> LlmBatchExecutor:
+    return LlmBatchExecutor(
+        batch_file_directory=str(tmp_path),
+        seconds_to_collect_requests=0.05,
+        poll_interval_in_seconds=0.01,
+        base_url=base_url,
+        api_key="test-key",
+    )
+
+
+async def test_concurrent_calls_are_sent_as_one_batch(
+    batch_server: tuple[LocalBatchServer, str], tmp_path: Path
+) -> None:
+    server, base_url = batch_server
+    executor = make_executor(base_url, tmp_path)
+    llm = GeneralLlm(model="gpt-4o", temperature=0.5)
+    prompts = [f"Question {i}" for i in range(5)]
+
+    with MonetaryCostManager() as cost_manager:
+        with executor:
+            responses = await asyncio.gather(
+                *[llm.invoke(prompt) for prompt in prompts]
+            )
+
+    assert responses == [f"Echo: {prompt}" for prompt in prompts]
+    assert executor.batches_submitted == 1
+    assert executor.requests_submitted == 5
+    assert len(server.batches) == 1
+
+    batch_files = list(tmp_path.iterdir())
+    assert len(batch_files) == 1
+    lines = [
+        json.loads(line) for line in batch_files[0].read_text().splitlines()
+    ]
+    assert len(lines) == 5
+    assert all(line["url"] == "/v1/chat/completions" for line in lines)
+    assert all(line["body"]["model"] == "gpt-4o" for line in lines)
+    assert all("timeout" not in line["body"] for line in lines)
+
+    real_time_cost = llm.calculate_cost_from_tokens(1000, 100) * 5
+    assert cost_manager.current_usage == pytest.approx(real_time_cost / 2)
+
+
+async def test_batch_is_submitted_when_full(
+    batch_server: tuple[LocalBatchServer, str], tmp_path: Path
+) -> None:
+    _, base_url = batch_server
+    executor = make_executor(base_url, tmp_path)
+    executor.max_requests_per_batch = 2
+    executor.seconds_to_collect_requests = 60
+    llm = GeneralLlm(model="gpt-4o", temperature=0.5)
+
+    with executor:
+        responses = await asyncio.wait_for(
+            asyncio.gather(*[llm.invoke(f"Q{i}") for i in range(4)]),
+            timeout=10,
+        )
+
+    assert responses == ["Echo: Q0", "Echo: Q1", "Echo: Q2", "Echo: Q3"]
+    assert executor.batches_submitted == 2
+
+
+async def test_multiple_samples_are_batched(
+    batch_server: tuple[LocalBatchServer, str], tmp_path: Path
+) -> None:
+    _, base_url = batch_server
+    llm = GeneralLlm(model="gpt-4o", temperature=1)
+
+    with make_executor(base_url, tmp_path):
+        samples = await llm.invoke_and_return_multiple_samples("Hi", 3)
+
+    assert samples == ["Echo: Hi"] * 3
+
+
+async def test_failed_requests_raise_without_failing_the_batch(
+    batch_server: tuple[LocalBatchServer, str], tmp_path: Path
+) -> None:
+    _, base_url = batch_server
+    executor = make_executor(base_url, tmp_path)
+    llm = GeneralLlm(model="gpt-4o", temperature=0.5, allowed_tries=1)
+
+    with executor:
+        results = await asyncio.gather(
+            llm.invoke("this should fail"),
+            llm.invoke("this works"),
+            return_exceptions=True,
+        )
+
+    assert isinstance(results[0], LlmBatchError)
+    assert results[1] == "Echo: this works"
+
+
+async def test_models_from_other_providers_are_not_batched(
+    tmp_path: Path,
+) -> None:
+    executor = make_executor("http://127.0.0.1:1/v1", tmp_path)
+
+    assert executor.can_batch("openai", {"model": "gpt-4o"})
+    assert not executor.can_batch("anthropic", {"model": "claude"})
+    assert not executor.can_batch("metaculus", {"model": "gpt-4o"})
+    assert not executor.can_batch(
+        "openai", {"model": "gpt-4o", "base_url": "https://other.example"}
+    )
+    with executor:
+        assert (
+            GeneralLlm(
+                model="claude-3-5-sonnet-20241022"
+            )._get_batch_executor()
+            is None
+        )
+        assert GeneralLlm(model="gpt-4o")._get_batch_executor() is executor
+        assert LlmBatchExecutor.get_active_executor() is executor
+    assert LlmBatchExecutor.get_active_executor() is None
+
+
+async def test_reasoning_model_params_are_mapped_like_real_time_calls(
+    batch_server: tuple[LocalBatchServer, str], tmp_path: Path
+) -> None:
+    _, base_url = batch_server
+    llm = GeneralLlm(model="openai/o3-mini", temperature=0, max_tokens=100)
+
+    with make_executor(base_url, tmp_path):
+        assert await llm.invoke("Hi") == "Echo: Hi"
+
+    batch_file = next(tmp_path.iterdir())
+    body = json.loads(batch_file.read_text())["body"]
+    assert body["model"] == "o3-mini"
+    assert body["max_completion_tokens"] == 100
+    assert "max_tokens" not in body
+    assert "temperature" not in body
+
+
+async def test_rejected_batch_requests_are_not_retried(
+    batch_server: tuple[LocalBatchServer, str], tmp_path: Path
+) -> None:
+    _, base_url = batch_server
+    executor = make_executor(base_url, tmp_path)
+    llm = GeneralLlm(model="gpt-4o", temperature=0.5, allowed_tries=3)
+
+    with executor:
+        with pytest.raises(LlmBatchError) as error:
+            await llm.invoke("this is invalid")
+
+    assert error.value.status_code == 400
+    assert executor.batches_submitted == 1
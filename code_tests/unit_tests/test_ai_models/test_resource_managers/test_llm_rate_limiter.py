@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+from forecasting_tools.ai_models.resource_managers.llm_rate_limiter import (
+    LlmRateLimiter,
+)
+
+
+async def test_requests_wait_once_request_budget_is_spent() -> None:
+    limiter = LlmRateLimiter(requests_per_minute=120)
+    start_time = time.time()
+    for _ in range(120):
+        await limiter.wait_till_able_to_send(10)
+    assert time.time() - start_time < 0.5
+
+    waiting_call = asyncio.create_task(limiter.wait_till_able_to_send(10))
+    await asyncio.sleep(0.2)
+    assert not waiting_call.done()
+    waiting_call.cancel()
+
+
+async def test_prompt_tokens_are_acquired_before_sending() -> None:
+    limiter = LlmRateLimiter(tokens_per_minute=6000)
+    tokens_acquired = await limiter.wait_till_able_to_send(5000)
+    assert tokens_acquired == 5000
+
+    waiting_call = asyncio.create_task(limiter.wait_till_able_to_send(2000))
+    await asyncio.sleep(0.2)
+    assert not waiting_call.done()
+    waiting_call.cancel()
+
+
+async def test_unused_tokens_are_given_back_on_reconcile() -> None:
+    limiter = LlmRateLimiter(tokens_per_minute=6000)
+    tokens_acquired = await limiter.wait_till_able_to_send(5000)
+    await limiter.reconcile_token_usage(tokens_acquired, 1000)
+
+    await asyncio.wait_for(limiter.wait_till_able_to_send(4000), timeout=0.5)
+
+
+async def test_extra_tokens_used_are_charged_on_reconcile() -> None:
+    limiter = LlmRateLimiter(tokens_per_minute=6000)
+    tokens_acquired = await limiter.wait_till_able_to_send(1000)
+    await limiter.reconcile_token_usage(tokens_acquired, 5500)
+
+    waiting_call = asyncio.create_task(limiter.wait_till_able_to_send(1000))
+    await asyncio.sleep(0.2)
+    assert not waiting_call.done()
+    waiting_call.cancel()
+
+
+async def test_prompt_larger_than_budget_is_capped() -> None:
+    limiter = LlmRateLimiter(tokens_per_minute=600)
+    tokens_acquired = await limiter.wait_till_able_to_send(1000)
+    assert tokens_acquired == 600
@@ -0,0 +1,138 @@
+import asyncio
+import time
+from pathlib import Path
+from unittest.mock import Mock
+
+from forecasting_tools.ai_models.ai_utils.response_types import (
+    TextTokenCostResponse,
+)
+from forecasting_tools.ai_models.general_llm import GeneralLlm
+from forecasting_tools.ai_models.resource_managers.llm_response_cache import (
+    LlmResponseCache,
+)
+from forecasting_tools.ai_models.resource_managers.monetary_cost_manager import (
+    MonetaryCostManager,
+)
+
+
+def _make_response(
+    text: str = "Hello", cost: float = 0.5
+) -> TextTokenCostResponse:
+    return TextTokenCostResponse(
+        data=text,
+        prompt_tokens_used=10,
+        completion_tokens_used=5,
+        total_tokens_used=15,
+        model="gpt-4o",
+        cost=cost,
+    )
+
+
+def test_cache_round_trips_response(tmp_path: Path) -> None:
+    cache = LlmResponseCache(str(tmp_path / "cache.sqlite"))
+    key = LlmResponseCache.make_key(
+        {"model": "gpt-4o", "temperature": 0},
+        [{"role": "user", "content": "Hi"}],
+    )
+    assert cache.get(key) is None
+
+    cache.set(key, _make_response())
+    cached_response = cache.get(key)
+
+    assert cached_response is not None
+    assert cached_response.data == "Hello"
+    assert cached_response.cost == 0.5
+    assert cached_response.total_tokens_used == 15
+    assert cached_response.is_cached_response
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_cache_persists_between_instances(tmp_path: Path) -> None:
+    file_path = str(tmp_path / "cache.sqlite")
+    LlmResponseCache(file_path).set("key", _make_response())
+    assert LlmResponseCache(file_path).get("key") is not None
+
+
+def test_key_ignores_secrets_and_timeouts() -> None:
+    messages = [{"role": "user", "content": "Hi"}]
+    key_1 = LlmResponseCache.make_key(
+        {"model": "gpt-4o", "api_key": "a", "timeout": 40}, messages
+    )
+    key_2 = LlmResponseCache.make_key(
+        {"model": "gpt-4o", "api_key": "b", "timeout": 80}, messages
+    )
+    key_3 = LlmResponseCache.make_key({"model": "gpt-4o-mini"}, messages)
+    assert key_1 == key_2
+    assert key_1 != key_3
+
+
+def test_key_depends_on_the_endpoint() -> None:
+    messages = [{"role": "user", "content": "Hi"}]
+    real_key = LlmResponseCache.make_key({"model": "gpt-4o"}, messages)
+    for endpoint_kwarg in ["base_url", "api_base"]:
+        stub_key = LlmResponseCache.make_key(
+            {"model": "gpt-4o", endpoint_kwarg: "http://localhost:8000"},
+            messages,
+        )
+        assert stub_key != real_key
+
+
+def test_entries_expire_after_ttl(tmp_path: Path) -> None:
+    cache = LlmResponseCache(
+        str(tmp_path / "cache.sqlite"), ttl_in_seconds=0.1
+    )
+    cache.set("key", _make_response())
+    time.sleep(0.2)
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path) -> None:
+    cache = LlmResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.set("key_1", _make_response("1"))
+    time.sleep(0.01)
+    cache.set("key_2", _make_response("2"))
+    time.sleep(0.01)
+    cache.get("key_1")
+    time.sleep(0.01)
+    cache.set("key_3", _make_response("3"))
+
+    assert len(cache) == 2
+    assert cache.get("key_1") is not None
+    assert cache.get("key_2") is None
+    assert cache.get("key_3") is not None
+
+
+def test_general_llm_uses_active_cache_and_does_not_charge_twice(
+    mocker: Mock, tmp_path: Path
+) -> None:
+    mock_call = mocker.patch.object(
+        GeneralLlm, "_call_litellm", return_value=_make_response(cost=0.5)
+    )
+    model = GeneralLlm(model="gpt-4o", temperature=0)
+
+    with LlmResponseCache(str(tmp_path / "cache.sqlite")):
+        with MonetaryCostManager(10) as cost_manager:
+            first = asyncio.run(model.invoke("Hi"))
+            second = asyncio.run(model.invoke("Hi"))
+
+    assert first == second == "Hello"
+    assert mock_call.call_count == 1
+    assert cost_manager.current_usage == 0.5
+
+
+def test_general_llm_does_not_cache_non_deterministic_calls(
+    mocker: Mock, tmp_path: Path
+) -> None:
+    mock_call = mocker.patch.object(
+        GeneralLlm, "_call_litellm", return_value=_make_response()
+    )
+    cache = LlmResponseCache(str(tmp_path / "cache.sqlite"))
+    model = GeneralLlm(model="gpt-4o", temperature=0.7, response_cache=cache)
+
+    asyncio.run(model.invoke("Hi"))
+    asyncio.run(model.invoke("Hi"))
+
+    assert mock_call.call_count == 2
+    assert len(cache) == 0
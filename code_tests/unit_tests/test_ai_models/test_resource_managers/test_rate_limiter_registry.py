@@ -0,0 +1,163 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Iterator
+from unittest.mock import Mock
+
+import pytest
+
+from forecasting_tools.ai_models.exa_searcher import ExaSearcher
+from forecasting_tools.ai_models.general_llm import GeneralLlm
+from forecasting_tools.ai_models.resource_managers.rate_limiter_registry import (
+    RateLimit,
+    RateLimiterRegistry,
+)
+from forecasting_tools.ai_models.resource_managers.refreshing_bucket_rate_limiter import (
+    RateLimitAlgorithm,
+    RefreshingBucketRateLimiter,
+)
+from forecasting_tools.forecast_helpers.metaculus_api import MetaculusApi
+from forecasting_tools.util import async_batching
+from forecasting_tools.util.http_clients import SharedHttpClients
+
+
+@pytest.fixture(autouse=True)
+def isolated_registry(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    monkeypatch.delenv(RateLimiterRegistry.CONFIG_PATH_ENV_VAR, raising=False)
+    monkeypatch.delenv(RateLimiterRegistry.CONFIG_ENV_VAR, raising=False)
+    monkeypatch.setattr(RateLimiterRegistry, "_limiters", {})
+    monkeypatch.setattr(RateLimiterRegistry, "_configured_limits", None)
+    yield
+
+
+def test_names_are_keyed_by_provider_and_hashed_credential() -> None:
+    assert RateLimiterRegistry.make_name("exa") == "exa:requests"
+    name = RateLimiterRegistry.make_name("openai", "tokens", "secret-key")
+    assert name.startswith("openai:tokens:")
+    assert "secret-key" not in name
+    assert name != RateLimiterRegistry.make_name("openai", "tokens", "other")
+
+
+def test_same_name_gets_the_same_limiter() -> None:
+    default_limit = RateLimit(10, 60)
+    first = RateLimiterRegistry.get_limiter("exa:requests", default_limit)
+    second = RateLimiterRegistry.get_limiter("exa:requests", default_limit)
+    assert first is not None
+    assert first is second
+    assert RateLimiterRegistry.get_limiter("asknews:requests") is None
+
+
+def test_limits_are_loaded_from_file_and_env(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    config_path = tmp_path / "rate_limits.json"
+    config_path.write_text(
+        json.dumps(
+            {
+                "exa:requests": {"capacity": 5, "period_in_seconds": 1},
+                "openai:tokens": {"capacity": 600, "algorithm": "gcra"},
+            }
+        )
+    )
+    monkeypatch.setenv(
+        RateLimiterRegistry.CONFIG_PATH_ENV_VAR, str(config_path)
+    )
+    monkeypatch.setenv(
+        RateLimiterRegistry.CONFIG_ENV_VAR,
+        json.dumps({"exa:requests": {"capacity": 7, "period_in_seconds": 1}}),
+    )
+
+    exa_limiter = RateLimiterRegistry.get_limiter(
+        "exa:requests", default_limit=RateLimit(3, 1)
+    )
+    assert exa_limiter is not None
+    assert exa_limiter.capacity == 7
+
+    keyed_name = RateLimiterRegistry.make_name("openai", "tokens", "some-key")
+    openai_limiter = RateLimiterRegistry.get_limiter(keyed_name)
+    assert isinstance(openai_limiter, RefreshingBucketRateLimiter)
+    assert openai_limiter.refresh_rate == 10
+    assert openai_limiter.algorithm == RateLimitAlgorithm.GCRA
+    assert openai_limiter is not RateLimiterRegistry.get_limiter(
+        "openai:tokens"
+    )
+
+
+def test_model_decorators_look_up_limiters_by_name() -> None:
+    limiter = ExaSearcher._get_request_limiter()
+    assert limiter is RateLimiterRegistry.get_limiter("exa:requests")
+    assert limiter.capacity == ExaSearcher.REQUESTS_PER_PERIOD_LIMIT
+
+    RateLimiterRegistry.set_limit("exa:requests", RateLimit(50, 1))
+    assert ExaSearcher._get_request_limiter().capacity == 50
+
+    ExaSearcher._reinitialize_request_rate_limiter()
+    assert ExaSearcher._get_request_limiter() is not limiter
+    assert ExaSearcher._get_request_limiter().capacity == 50
+
+
+def test_general_llm_rate_limits_live_in_the_registry() -> None:
+    GeneralLlm.set_rate_limits("openai", requests_per_minute=120)
+    rate_limiter = GeneralLlm(model="gpt-4o").get_rate_limiter()
+    assert rate_limiter is not None
+    assert rate_limiter.requests_per_minute == 120
+    assert rate_limiter.tokens_per_minute is None
+    assert RateLimiterRegistry.get_limit("openai:requests") == RateLimit(
+        120, 60
+    )
+
+
+async def test_batches_with_the_same_limiter_name_share_a_limit() -> None:
+    async def return_one() -> int:
+        return 1
+
+    for _ in range(2):
+        coroutines = async_batching.wrap_coroutines_with_rate_limit(
+            [return_one() for _ in range(2)],
+            calls_per_period=4,
+            time_period_in_seconds=60,
+            limiter_name="test:requests",
+        )
+        await asyncio.gather(*coroutines)
+
+    utilization = {
+        limiter_utilization.name: limiter_utilization
+        for limiter_utilization in RateLimiterRegistry.get_utilization()
+    }
+    test_limiter = utilization["test:requests"]
+    assert test_limiter.capacity == 4
+    assert test_limiter.available_resources < 0.1
+    assert test_limiter.fraction_in_use > 0.9
+    assert test_limiter.number_of_waiters == 0
+
+
+async def test_metaculus_requests_from_many_threads_share_the_limit(
+    mocker: Mock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("METACULUS_TOKEN", "test-token")
+    RateLimiterRegistry.set_limit("metaculus:requests", RateLimit(2, 1))
+    session = mocker.Mock()
+    session.request.return_value = mocker.Mock(
+        status_code=200, reason="OK", url="https://x.com", text="{}"
+    )
+    mocker.patch.object(
+        SharedHttpClients, "requests_session", return_value=session
+    )
+
+    start_time = time.monotonic()
+    await asyncio.wait_for(
+        asyncio.gather(
+            *[
+                asyncio.to_thread(
+                    MetaculusApi._send_request, "GET", "https://x.com"
+                )
+                for _ in range(8)
+            ]
+        ),
+        timeout=30,
+    )
+
+    assert session.request.call_count == 8
+    # 2 requests right away, then the bucket refills for each next pair
+    assert time.monotonic() - start_time >= 2.5
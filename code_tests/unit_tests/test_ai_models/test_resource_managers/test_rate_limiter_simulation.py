@@ -0,0 +1,35 @@
+import asyncio
+
+from forecasting_tools.ai_models.resource_managers.rate_limiter_simulation import (
+    SimulatedClock,
+    compare_rate_limiter_algorithms,
+    run_with_simulated_time,
+)
+from forecasting_tools.ai_models.resource_managers.refreshing_bucket_rate_limiter import (
+    RateLimitAlgorithm,
+)
+
+
+def test_simulated_time_skips_sleeps() -> None:
+    clock = SimulatedClock()
+
+    async def sleep_for_an_hour() -> float:
+        await asyncio.sleep(3600)
+        return clock.now
+
+    assert run_with_simulated_time(sleep_for_an_hour(), clock) >= 3600
+
+
+def test_gcra_avoids_the_refill_stall_without_exceeding_the_rate() -> None:
+    results = compare_rate_limiter_algorithms(
+        capacity=20, refresh_rate=1, simulated_seconds=120
+    )
+    by_algorithm = {result.algorithm: result for result in results}
+    fill_the_bucket = by_algorithm[RateLimitAlgorithm.FILL_THE_BUCKET]
+    gcra = by_algorithm[RateLimitAlgorithm.GCRA]
+
+    assert fill_the_bucket.longest_gap_in_seconds >= 19
+    assert gcra.longest_gap_in_seconds <= 1.01
+    assert gcra.resources_acquired >= fill_the_bucket.resources_acquired
+    for result in results:
+        assert result.resources_acquired <= 20 + 120 * 1 + 1
@@ -1,13 +1,16 @@
 import asyncio
 import logging
 import random
+import threading
 import time
+from datetime import datetime, timedelta
 
 import pytest
 
 from code_tests.utilities_for_tests import coroutine_testing
 from forecasting_tools.ai_models.resource_managers.refreshing_bucket_rate_limiter import (
     LimitReachedResponse,
+    RateLimitAlgorithm,
     RefreshingBucketRateLimiter,
 )
 from forecasting_tools.util import async_batching
@@ -428,3 +431,232 @@ def assert_whether_rate_limit_is_respected_and_resources_tracked_right(
         over_rate_allowed=1.2,
         under_rate_allowed=0.9,
     )
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_resources_in_time_range_are_summed_from_history() -> None:
+    clock = FakeClock()
+    limiter = RefreshingBucketRateLimiter(100, 1, clock=clock)
+    for second, resources in [(0, 1), (10, 2), (20, 3)]:
+        clock.now = second
+        asyncio.run(limiter.wait_till_able_to_acquire_resources(resources))
+
+    assert limiter.calculate_resources_passed_into_acquire_in_time_range(
+        5, 25
+    ) == (2 + 3)
+    assert (
+        limiter.calculate_resources_passed_into_acquire_in_time_range(0, 20)
+        == 2
+    )
+    assert (
+        limiter.calculate_resources_passed_into_acquire_in_time_range(-1, 100)
+        == 6
+    )
+    now = datetime.now()
+    assert (
+        limiter.calculate_resources_passed_into_acquire_in_time_range(
+            now - timedelta(hours=1), now + timedelta(hours=1)
+        )
+        == 6
+    )
+
+
+def test_history_is_bounded_by_retention_window_and_size() -> None:
+    clock = FakeClock()
+    limiter = RefreshingBucketRateLimiter(
+        10, 10, history_retention_in_seconds=60, clock=clock
+    )
+    for second in range(1000):
+        clock.now = second
+        asyncio.run(limiter.wait_till_able_to_acquire_resources(1))
+
+    assert limiter.history_length <= 61
+    assert (
+        limiter.calculate_resources_passed_into_acquire_in_time_range(0, 1000)
+        == limiter.history_length
+    )
+    assert (
+        limiter.calculate_resources_passed_into_acquire_in_time_range(
+            989.5, 1000
+        )
+        == 10
+    )
+
+    small_limiter = RefreshingBucketRateLimiter(
+        10, 10, max_history_entries=5, clock=clock
+    )
+    for _ in range(20):
+        clock.now += 1
+        asyncio.run(small_limiter.wait_till_able_to_acquire_resources(1))
+    assert small_limiter.history_length <= 5
+
+
+def test_resources_refresh_by_the_injected_clock() -> None:
+    clock = FakeClock()
+    limiter = RefreshingBucketRateLimiter(10, 2, clock=clock)
+    limiter.zero_out_resources()
+    clock.now = 3
+    assert limiter.refresh_and_then_get_available_resources() == 6
+    clock.now = 100
+    assert limiter.refresh_and_then_get_available_resources() == 10
+
+
+async def _acquire_in_order(
+    limiter: RefreshingBucketRateLimiter, resource_amounts: list[int]
+) -> list[int]:
+    served_order: list[int] = []
+
+    async def acquire(index: int) -> None:
+        await limiter.wait_till_able_to_acquire_resources(
+            resource_amounts[index]
+        )
+        served_order.append(index)
+
+    await asyncio.gather(*[acquire(i) for i in range(len(resource_amounts))])
+    return served_order
+
+
+async def test_waiters_are_served_in_arrival_order() -> None:
+    limiter = RefreshingBucketRateLimiter(10, 100)
+    limiter.zero_out_resources()
+    served_order = await _acquire_in_order(limiter, [8, 1, 1, 5])
+    assert served_order == [0, 1, 2, 3]
+    assert limiter.number_of_waiters == 0
+
+
+async def test_waiters_can_be_served_fewest_resources_first() -> None:
+    limiter = RefreshingBucketRateLimiter(
+        10, 100, waiter_order="fewest_resources_first"
+    )
+    limiter.zero_out_resources()
+    served_order = await _acquire_in_order(limiter, [8, 1, 5, 1])
+    assert served_order == [1, 3, 2, 0]
+
+
+async def test_cancelled_waiter_does_not_block_the_queue() -> None:
+    limiter = RefreshingBucketRateLimiter(10, 100)
+    limiter.zero_out_resources()
+    stuck_waiter = asyncio.create_task(
+        limiter.wait_till_able_to_acquire_resources(8)
+    )
+    await asyncio.sleep(0)
+    stuck_waiter.cancel()
+    await asyncio.wait_for(
+        limiter.wait_till_able_to_acquire_resources(9), timeout=1
+    )
+    assert stuck_waiter.cancelled()
+    assert limiter.number_of_waiters == 0
+
+
+async def test_returned_resources_wake_the_next_waiter() -> None:
+    limiter = RefreshingBucketRateLimiter(10, 0.01)
+    await limiter.wait_till_able_to_acquire_resources(10)
+    waiter = asyncio.create_task(
+        limiter.wait_till_able_to_acquire_resources(5)
+    )
+    await asyncio.sleep(0)
+    await limiter.adjust_resources_used(-10)
+    await asyncio.wait_for(waiter, timeout=1)
+
+
+def test_gcra_does_not_wait_for_a_full_bucket() -> None:
+    clock = FakeClock()
+    limiter = RefreshingBucketRateLimiter(
+        10, 2, clock=clock, algorithm=RateLimitAlgorithm.GCRA
+    )
+    asyncio.run(limiter.wait_till_able_to_acquire_resources(10))
+    assert limiter.theoretical_arrival_time == 5
+
+    clock.now = 0.5
+    assert limiter.refresh_and_then_get_available_resources() == 1
+    asyncio.run(limiter.wait_till_able_to_acquire_resources(1))
+    assert limiter.theoretical_arrival_time == 5.5
+
+
+async def test_gcra_spaces_requests_at_the_sustained_rate() -> None:
+    limiter = RefreshingBucketRateLimiter(
+        5, 50, algorithm=RateLimitAlgorithm.GCRA
+    )
+    for _ in range(5):
+        await limiter.wait_till_able_to_acquire_resources(1)
+
+    start_time = time.time()
+    acquire_times: list[float] = []
+    for _ in range(5):
+        await limiter.wait_till_able_to_acquire_resources(1)
+        acquire_times.append(time.time() - start_time)
+
+    gaps = [
+        later - earlier
+        for earlier, later in zip(acquire_times, acquire_times[1:])
+    ]
+    assert all(0.01 <= gap <= 0.05 for gap in gaps)
+    assert acquire_times[-1] < 5 / 50 + 0.05
+
+
+def test_gcra_needs_a_refresh_rate() -> None:
+    with pytest.raises(ValueError):
+        RefreshingBucketRateLimiter(10, 0, algorithm=RateLimitAlgorithm.GCRA)
+
+
+async def test_threads_and_event_loop_share_the_bucket() -> None:
+    limiter = RefreshingBucketRateLimiter(
+        4, 20, algorithm=RateLimitAlgorithm.GCRA
+    )
+    start_time = time.time()
+
+    await asyncio.wait_for(
+        asyncio.gather(
+            *[
+                asyncio.to_thread(
+                    limiter.wait_till_able_to_acquire_resources_sync, 1
+                )
+                for _ in range(8)
+            ],
+            *[
+                limiter.wait_till_able_to_acquire_resources(1)
+                for _ in range(8)
+            ],
+        ),
+        timeout=10,
+    )
+
+    # 4 resources burst, the other 12 come at 20 per second
+    assert time.time() - start_time >= 12 / 20 - 0.05
+    assert limiter.number_of_waiters == 0
+
+
+def test_waiters_on_two_event_loops_are_all_served() -> None:
+    limiter = RefreshingBucketRateLimiter(2, 10)
+    finished_threads: list[int] = []
+
+    def acquire_on_own_loop(thread_index: int) -> None:
+        async def acquire_several() -> None:
+            await asyncio.gather(
+                *[
+                    limiter.wait_till_able_to_acquire_resources(1)
+                    for _ in range(4)
+                ]
+            )
+
+        asyncio.run(acquire_several())
+        finished_threads.append(thread_index)
+
+    threads = [
+        threading.Thread(target=acquire_on_own_loop, args=(thread_index,))
+        for thread_index in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert sorted(finished_threads) == [0, 1]
+    assert limiter.number_of_waiters == 0
@@ -0,0 +1,170 @@
+import asyncio
+from unittest.mock import Mock
+
+import pytest
+
+from forecasting_tools.ai_models.ai_utils.response_types import (
+    TextTokenCostResponse,
+)
+from forecasting_tools.ai_models.general_llm import GeneralLlm
+from forecasting_tools.ai_models.resource_managers.monetary_cost_manager import (
+    MonetaryCostManager,
+)
+from forecasting_tools.ai_models.resource_managers.request_coalescer import (
+    RequestCoalescer,
+)
+
+
+class CallCounter:
+    def __init__(self, seconds_to_wait: float = 0.1) -> None:
+        self.calls = 0
+        self.seconds_to_wait = seconds_to_wait
+
+    async def call(self) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.seconds_to_wait)
+        return "result"
+
+
+async def test_identical_concurrent_calls_are_merged() -> None:
+    coalescer: RequestCoalescer[str] = RequestCoalescer()
+    counter = CallCounter()
+
+    results = await asyncio.gather(
+        *[coalescer.run("key", counter.call) for _ in range(5)]
+    )
+
+    assert counter.calls == 1
+    assert [result for result, _ in results] == ["result"] * 5
+    assert [was_shared for _, was_shared in results].count(False) == 1
+    assert coalescer.calls_made == 1
+    assert coalescer.calls_coalesced == 4
+    assert coalescer.number_of_calls_in_flight == 0
+
+
+async def test_different_keys_are_not_merged() -> None:
+    coalescer: RequestCoalescer[str] = RequestCoalescer()
+    counter = CallCounter()
+
+    await asyncio.gather(
+        coalescer.run("key_1", counter.call),
+        coalescer.run("key_2", counter.call),
+    )
+
+    assert counter.calls == 2
+    assert coalescer.calls_coalesced == 0
+
+
+async def test_sequential_calls_are_not_merged() -> None:
+    coalescer: RequestCoalescer[str] = RequestCoalescer()
+    counter = CallCounter(seconds_to_wait=0)
+
+    await coalescer.run("key", counter.call)
+    await coalescer.run("key", counter.call)
+
+    assert counter.calls == 2
+
+
+async def test_cancelling_one_waiter_does_not_cancel_others() -> None:
+    coalescer: RequestCoalescer[str] = RequestCoalescer()
+    counter = CallCounter(seconds_to_wait=0.2)
+
+    waiter_to_cancel = asyncio.create_task(coalescer.run("key", counter.call))
+    waiter_to_keep = asyncio.create_task(coalescer.run("key", counter.call))
+    await asyncio.sleep(0.05)
+    waiter_to_cancel.cancel()
+
+    result, was_shared = await waiter_to_keep
+    assert result == "result"
+    assert not was_shared
+    assert waiter_to_cancel.cancelled()
+    assert counter.calls == 1
+
+
+async def test_call_is_cancelled_when_every_waiter_cancels() -> None:
+    coalescer: RequestCoalescer[str] = RequestCoalescer()
+    counter = CallCounter(seconds_to_wait=10)
+
+    waiters = [
+        asyncio.create_task(coalescer.run("key", counter.call))
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0.05)
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert coalescer.number_of_calls_in_flight == 0
+
+
+async def test_exceptions_are_given_to_every_waiter() -> None:
+    coalescer: RequestCoalescer[str] = RequestCoalescer()
+
+    async def failing_call() -> str:
+        await asyncio.sleep(0.05)
+        raise RuntimeError("Test error")
+
+    results = await asyncio.gather(
+        *[coalescer.run("key", failing_call) for _ in range(3)],
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_general_llm_merges_identical_deterministic_calls(
+    mocker: Mock,
+) -> None:
+    async def slow_call(*args, **kwargs) -> TextTokenCostResponse:
+        await asyncio.sleep(0.1)
+        return TextTokenCostResponse(
+            data="Hello",
+            prompt_tokens_used=10,
+            completion_tokens_used=5,
+            total_tokens_used=15,
+            model="gpt-4o",
+            cost=0.5,
+        )
+
+    mock_call = mocker.patch.object(
+        GeneralLlm, "_call_litellm", side_effect=slow_call
+    )
+    model = GeneralLlm(model="gpt-4o", temperature=0)
+
+    with MonetaryCostManager(10) as cost_manager:
+        responses = await asyncio.gather(
+            *[model.invoke("Hi") for _ in range(3)]
+        )
+
+    assert responses == ["Hello"] * 3
+    assert mock_call.call_count == 1
+    assert cost_manager.current_usage == pytest.approx(0.5)
+
+
+async def test_cost_is_charged_once_when_the_caller_that_started_the_call_is_cancelled(
+    mocker: Mock,
+) -> None:
+    async def slow_call(*args, **kwargs) -> TextTokenCostResponse:
+        await asyncio.sleep(0.2)
+        return TextTokenCostResponse(
+            data="Hello",
+            prompt_tokens_used=10,
+            completion_tokens_used=5,
+            total_tokens_used=15,
+            model="gpt-4o",
+            cost=0.5,
+        )
+
+    mocker.patch.object(GeneralLlm, "_call_litellm", side_effect=slow_call)
+    model = GeneralLlm(model="gpt-4o", temperature=0)
+
+    with MonetaryCostManager(10) as cost_manager:
+        starter = asyncio.create_task(model.invoke("Hi"))
+        await asyncio.sleep(0.05)
+        waiters = [asyncio.create_task(model.invoke("Hi")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        starter.cancel()
+        responses = await asyncio.gather(*waiters)
+
+    assert responses == ["Hello"] * 2
+    assert cost_manager.current_usage == pytest.approx(0.5)
@@ -0,0 +1,104 @@
+import asyncio
+import multiprocessing
+import time
+from pathlib import Path
+
+import pytest
+
+from forecasting_tools.ai_models.resource_managers.refreshing_bucket_rate_limiter import (
+    LimitReachedResponse,
+    RefreshingBucketRateLimiter,
+    ResourceUnavailableError,
+)
+from forecasting_tools.ai_models.resource_managers.shared_rate_limiter import (
+    SharedRefreshingBucketRateLimiter,
+)
+
+
+def _acquire_in_another_process(database_path: str, resources: int) -> None:
+    limiter = SharedRefreshingBucketRateLimiter(
+        "shared", 10, 0.001, database_path
+    )
+    asyncio.run(limiter.wait_till_able_to_acquire_resources(resources))
+
+
+def test_bucket_is_shared_between_processes(tmp_path: Path) -> None:
+    database_path = str(tmp_path / "limits.sqlite")
+    limiter = SharedRefreshingBucketRateLimiter(
+        "shared", 10, 0.001, database_path
+    )
+    process = multiprocessing.get_context("spawn").Process(
+        target=_acquire_in_another_process, args=(database_path, 7)
+    )
+    process.start()
+    process.join(timeout=60)
+    assert process.exitcode == 0
+
+    assert limiter.refresh_and_then_get_available_resources() == (
+        pytest.approx(3, abs=0.1)
+    )
+
+
+async def test_limiters_with_the_same_name_share_a_bucket(
+    tmp_path: Path,
+) -> None:
+    database_path = str(tmp_path / "limits.sqlite")
+    first = SharedRefreshingBucketRateLimiter(
+        "exa", 10, 0.001, database_path, LimitReachedResponse.RAISE_EXCEPTION
+    )
+    second = SharedRefreshingBucketRateLimiter(
+        "exa", 10, 0.001, database_path, LimitReachedResponse.RAISE_EXCEPTION
+    )
+    other = SharedRefreshingBucketRateLimiter(
+        "asknews", 10, 0.001, database_path
+    )
+
+    await first.wait_till_able_to_acquire_resources(6)
+    with pytest.raises(ResourceUnavailableError):
+        await second.wait_till_able_to_acquire_resources(6)
+    await other.wait_till_able_to_acquire_resources(6)
+
+    await first.adjust_resources_used(-6)
+    await second.wait_till_able_to_acquire_resources(6)
+
+
+async def test_waits_for_shared_bucket_to_refill(tmp_path: Path) -> None:
+    limiter = SharedRefreshingBucketRateLimiter(
+        "llm", 10, 20, str(tmp_path / "limits.sqlite")
+    )
+    await limiter.wait_till_able_to_acquire_resources(10)
+
+    start_time = time.time()
+    await limiter.wait_till_able_to_acquire_resources(1)
+    assert 0.4 <= time.time() - start_time < 1.5
+
+
+def test_limiter_is_only_shared_when_a_database_is_configured(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.delenv(
+        SharedRefreshingBucketRateLimiter.DATABASE_PATH_ENV_VAR, raising=False
+    )
+    limiter = SharedRefreshingBucketRateLimiter.create_rate_limiter(
+        "llm", 10, 1
+    )
+    assert isinstance(limiter, RefreshingBucketRateLimiter)
+
+    monkeypatch.setenv(
+        SharedRefreshingBucketRateLimiter.DATABASE_PATH_ENV_VAR,
+        str(tmp_path / "limits.sqlite"),
+    )
+    limiter = SharedRefreshingBucketRateLimiter.create_rate_limiter(
+        "llm", 10, 1
+    )
+    assert isinstance(limiter, SharedRefreshingBucketRateLimiter)
+
+
+def test_sync_acquire_waits_for_the_shared_bucket(tmp_path: Path) -> None:
+    limiter = SharedRefreshingBucketRateLimiter(
+        "shared", 2, 4, str(tmp_path / "limits.sqlite")
+    )
+    start_time = time.monotonic()
+    for _ in range(4):
+        limiter.wait_till_able_to_acquire_resources_sync(1)
+    assert time.monotonic() - start_time >= 0.4
@@ -0,0 +1,137 @@
+from unittest.mock import Mock
+
+import pytest
+
+from forecasting_tools.ai_models.ai_utils.response_types import (
+    MultipleTextTokenCostResponse,
+)
+from forecasting_tools.ai_models.general_llm import GeneralLlm
+from forecasting_tools.ai_models.resource_managers.monetary_cost_manager import (
+    MonetaryCostManager,
+)
+from forecasting_tools.ai_models.routed_llm import RoutedLlm
+from forecasting_tools.forecast_bots.official_bots.q1_template_bot import (
+    Q1TemplateBot2025,
+)
+from forecasting_tools.forecast_helpers.smart_searcher import SmartSearcher
+
+
+def _make_response(text: str, model: str) -> MultipleTextTokenCostResponse:
+    return MultipleTextTokenCostResponse(
+        data=[text],
+        prompt_tokens_used=10,
+        completion_tokens_used=5,
+        total_tokens_used=15,
+        model=model,
+        cost=0.1,
+    )
+
+
+@pytest.fixture(autouse=True)
+def fresh_model_trackers(mocker: Mock) -> None:
+    mocker.patch.dict(GeneralLlm._model_trackers, clear=True)
+
+
+def test_untried_candidates_are_ranked_by_price_then_order() -> None:
+    expensive = GeneralLlm(model="gpt-4o")
+    cheap = GeneralLlm(model="gpt-4o-mini")
+    router = RoutedLlm([expensive, cheap])
+    assert router.rank_candidates() == [cheap, expensive]
+
+    router = RoutedLlm(
+        [expensive, cheap], seconds_per_dollar_per_million_tokens=0
+    )
+    assert router.rank_candidates() == [expensive, cheap]
+
+
+def test_slow_and_failing_candidates_are_ranked_last() -> None:
+    first = GeneralLlm(model="gpt-4o")
+    second = GeneralLlm(model="claude-3-5-sonnet-20241022")
+    router = RoutedLlm(
+        [first, second], seconds_per_dollar_per_million_tokens=0
+    )
+
+    for _ in range(5):
+        first._get_model_tracker().record_call(succeeded=True, duration=30)
+        second._get_model_tracker().record_call(succeeded=True, duration=2)
+    assert router.rank_candidates() == [second, first]
+
+    for _ in range(3):
+        second._get_model_tracker().record_call(succeeded=False, duration=1)
+    assert router.rank_candidates() == [first, second]
+
+
+async def test_router_fails_over_to_next_candidate(mocker: Mock) -> None:
+    first = GeneralLlm(model="gpt-4o")
+    second = GeneralLlm(model="gpt-4o-mini")
+    router = RoutedLlm(
+        [first, second], seconds_per_dollar_per_million_tokens=0
+    )
+    mocker.patch.object(
+        first,
+        "_call_litellm_for_samples",
+        side_effect=RuntimeError("Provider is down"),
+    )
+    mocker.patch.object(
+        second,
+        "_call_litellm_for_samples",
+        return_value=_make_response("From fallback", second.model),
+    )
+
+    with MonetaryCostManager(10) as cost_manager:
+        response = await router.invoke("Hi")
+
+    assert response == "From fallback"
+    assert cost_manager.current_usage == pytest.approx(0.1)
+
+
+async def test_router_raises_if_every_candidate_fails(mocker: Mock) -> None:
+    router = RoutedLlm(["gpt-4o", "gpt-4o-mini"], allowed_tries=1)
+    for candidate in router.candidates:
+        mocker.patch.object(
+            candidate,
+            "_call_litellm_for_samples",
+            side_effect=RuntimeError("Provider is down"),
+        )
+
+    with pytest.raises(RuntimeError):
+        await router.invoke("Hi")
+
+
+def test_router_is_accepted_where_general_llm_is() -> None:
+    router = RoutedLlm(["gpt-4o", "gpt-4o-mini"])
+    assert SmartSearcher(model=router).llm is router
+
+
+def test_health_is_tracked_per_endpoint(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("METACULUS_TOKEN", "test-token")
+    direct = GeneralLlm(model="gpt-4o")
+    proxied = GeneralLlm(model="metaculus/gpt-4o")
+    custom_endpoint = GeneralLlm(
+        model="gpt-4o", base_url="http://localhost:8000/v1"
+    )
+
+    trackers = [
+        llm._get_model_tracker() for llm in (direct, proxied, custom_endpoint)
+    ]
+    assert len({id(tracker) for tracker in trackers}) == 3
+    assert GeneralLlm(model="gpt-4o")._get_model_tracker() is trackers[0]
+
+
+def test_template_bot_routes_only_when_opted_in(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "openai-key")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "anthropic-key")
+    bot = Q1TemplateBot2025()
+
+    final_decision_llm = bot._get_final_decision_llm()
+    assert not isinstance(final_decision_llm, RoutedLlm)
+    assert final_decision_llm.model == "gpt-4o"
+
+    monkeypatch.setattr(Q1TemplateBot2025, "ROUTE_FINAL_DECISION_LLM", True)
+    router = bot._get_final_decision_llm()
+    assert isinstance(router, RoutedLlm)
+    assert bot._get_final_decision_llm() is router
@@ -1,4 +1,7 @@
+import asyncio
+import threading
 from pathlib import Path
+from unittest.mock import Mock
 
 import pytest
 
@@ -6,15 +9,28 @@ from code_tests.unit_tests.test_forecasting.forecasting_test_manager import (
     ForecastingTestManager,
     MockBot,
 )
+from forecasting_tools.ai_models.general_llm import CacheablePrompt, GeneralLlm
 from forecasting_tools.data_models.forecast_report import ReasonedPrediction
+from forecasting_tools.data_models.multiple_choice_report import (
+    PredictedOption,
+    PredictedOptionList,
+)
 from forecasting_tools.data_models.questions import BinaryQuestion
 from forecasting_tools.forecast_bots.bot_lists import (
     get_all_important_bot_classes,
 )
 from forecasting_tools.forecast_bots.forecast_bot import (
     ForecastBot,
+    ForecastCascade,
     ForecastReport,
 )
+from forecasting_tools.forecast_helpers.metaculus_api import MetaculusApi
+from forecasting_tools.forecast_helpers.prediction_extractor import (
+    PredictionExtractor,
+)
+from forecasting_tools.forecast_helpers.research_context_packer import (
+    ResearchContextPacker,
+)
 
 
 async def test_forecast_questions_returns_exceptions_when_specified() -> None:
@@ -225,3 +241,313 @@ def test_bot_has_config(bot: type[ForecastBot]):
     bot_config = bot().get_config()
     assert bot_config is not None
     assert len(bot_config.keys()) > probable_minimum_number_of_bot_params
+
+
+async def test_multi_sample_generation_shares_one_request(
+    mocker: Mock,
+) -> None:
+    predictions_per_report = 3
+    bot = MockBot(
+        predictions_per_research_report=predictions_per_report,
+        use_multi_sample_generation=True,
+    )
+    test_question = ForecastingTestManager.get_fake_binary_question()
+    mock_samples_call = mocker.patch.object(
+        GeneralLlm,
+        "invoke_and_return_multiple_samples",
+        return_value=[
+            "Probability: 10%",
+            "Probability: 20%",
+            "Probability: 30%",
+        ],
+    )
+    mock_single_call = mocker.patch.object(GeneralLlm, "invoke")
+
+    async def forecast_with_shared_samples(
+        question: BinaryQuestion, research: str
+    ) -> ReasonedPrediction[float]:
+        reasoning = await bot._invoke_llm_for_forecast(
+            GeneralLlm(model="gpt-4o", temperature=0.7), "Same prompt"
+        )
+        prediction = PredictionExtractor.extract_last_percentage_value(
+            reasoning, max_prediction=1, min_prediction=0
+        )
+        return ReasonedPrediction(
+            prediction_value=prediction, reasoning=reasoning
+        )
+
+    bot._run_forecast_on_binary = forecast_with_shared_samples
+
+    report = await bot.forecast_question(test_question)
+
+    assert mock_samples_call.call_count == 1
+    assert mock_single_call.call_count == 0
+    assert report.prediction == pytest.approx(0.2)
+    assert bot._shared_sample_batches == {}
+
+
+async def test_llms_with_different_settings_do_not_share_samples(
+    mocker: Mock,
+) -> None:
+    bot = MockBot(
+        predictions_per_research_report=2, use_multi_sample_generation=True
+    )
+
+    async def samples_for_llm(
+        llm: GeneralLlm, prompt: CacheablePrompt, number_of_samples: int
+    ) -> list[str]:
+        await asyncio.sleep(0.01)
+        temperature = llm.litellm_kwargs["temperature"]
+        return [f"Temperature {temperature}"] * number_of_samples
+
+    mock_samples_call = mocker.patch.object(
+        GeneralLlm,
+        "invoke_and_return_multiple_samples",
+        autospec=True,
+        side_effect=samples_for_llm,
+    )
+    prompt = CacheablePrompt(
+        stable_prefix="Question and research", variable_suffix="Forecast"
+    )
+    cold_llm = GeneralLlm(model="gpt-4o", temperature=0.1)
+    warm_llm = GeneralLlm(model="gpt-4o", temperature=0.9)
+
+    responses = await asyncio.gather(
+        bot._invoke_llm_for_forecast(cold_llm, prompt),
+        bot._invoke_llm_for_forecast(warm_llm, prompt),
+    )
+
+    assert responses == ["Temperature 0.1", "Temperature 0.9"]
+    assert mock_samples_call.call_count == 2
+
+
+async def test_unclaimed_samples_are_dropped_when_the_request_finishes(
+    mocker: Mock,
+) -> None:
+    bot = MockBot(
+        predictions_per_research_report=3, use_multi_sample_generation=True
+    )
+    mock_samples_call = mocker.patch.object(
+        GeneralLlm,
+        "invoke_and_return_multiple_samples",
+        side_effect=[["First run"] * 3, ["Second run"] * 3],
+    )
+    llm = GeneralLlm(model="gpt-4o", temperature=0.7)
+
+    assert await bot._invoke_llm_for_forecast(llm, "Prompt") == "First run"
+    assert bot._shared_sample_batches == {}
+    assert await bot._invoke_llm_for_forecast(llm, "Prompt") == "Second run"
+    assert mock_samples_call.call_count == 2
+
+
+def _make_cascading_bot(
+    mocker: Mock, cheap_answers: list[str]
+) -> tuple[MockBot, list[str]]:
+    models_called: list[str] = []
+    remaining_cheap_answers = iter(cheap_answers)
+
+    async def mock_invoke(llm: GeneralLlm, prompt: str) -> str:
+        models_called.append(llm.model)
+        if llm.model == "gpt-4o-mini":
+            return next(remaining_cheap_answers)
+        return "Probability: 70%"
+
+    mocker.patch.object(
+        GeneralLlm, "invoke", autospec=True, side_effect=mock_invoke
+    )
+    bot = MockBot(
+        predictions_per_research_report=len(cheap_answers),
+        forecast_cascade=ForecastCascade(max_binary_spread=0.15),
+    )
+
+    async def forecast_through_llm(
+        question: BinaryQuestion, research: str
+    ) -> ReasonedPrediction[float]:
+        reasoning = await bot._invoke_llm_for_forecast(
+            GeneralLlm(model="o1"), "Prompt"
+        )
+        prediction = PredictionExtractor.extract_last_percentage_value(
+            reasoning, max_prediction=1, min_prediction=0
+        )
+        return ReasonedPrediction(
+            prediction_value=prediction, reasoning=reasoning
+        )
+
+    bot._run_forecast_on_binary = forecast_through_llm
+    return bot, models_called
+
+
+async def test_cascade_keeps_agreeing_cheap_predictions(mocker: Mock) -> None:
+    bot, models_called = _make_cascading_bot(
+        mocker, ["Probability: 20%", "Probability: 25%", "Probability: 30%"]
+    )
+    report = await bot.forecast_question(
+        ForecastingTestManager.get_fake_binary_question()
+    )
+
+    assert models_called == ["gpt-4o-mini"] * 3
+    assert report.prediction == pytest.approx(0.25)
+    assert report.other_notes is not None
+    assert "kept 3 predictions from gpt-4o-mini" in report.other_notes
+
+
+@pytest.mark.parametrize(
+    "cheap_answers",
+    [
+        ["Probability: 10%", "Probability: 50%", "Probability: 30%"],
+        ["Probability: 20%", "I don't know", "Probability: 30%"],
+    ],
+)
+async def test_cascade_escalates_on_disagreement_or_failure(
+    mocker: Mock, cheap_answers: list[str]
+) -> None:
+    bot, models_called = _make_cascading_bot(mocker, cheap_answers)
+    report = await bot.forecast_question(
+        ForecastingTestManager.get_fake_binary_question()
+    )
+
+    assert models_called == ["gpt-4o-mini"] * 3 + ["o1"] * 3
+    assert report.prediction == pytest.approx(0.7)
+    assert report.errors == []
+    assert report.other_notes is not None
+    assert "escalated from gpt-4o-mini" in report.other_notes
+
+
+def test_cascade_measures_multiple_choice_divergence() -> None:
+    def make_options(probability_of_yes: float) -> PredictedOptionList:
+        return PredictedOptionList(
+            predicted_options=[
+                PredictedOption(
+                    option_name="Yes", probability=probability_of_yes
+                ),
+                PredictedOption(
+                    option_name="No", probability=1 - probability_of_yes
+                ),
+            ]
+        )
+
+    cascade = ForecastCascade(max_multiple_choice_divergence=0.2)
+    divergence, threshold = cascade.measure_disagreement(
+        [make_options(0.5), make_options(0.6), make_options(0.8)]
+    )
+    assert divergence == pytest.approx(0.3)
+    assert threshold == 0.2
+    assert cascade.get_escalation_reason([make_options(0.5)] * 2, []) is None
+
+
+async def test_tournament_questions_are_fetched_off_the_event_loop(
+    mocker: Mock,
+) -> None:
+    fetching_threads: list[threading.Thread] = []
+
+    def mock_get_questions(tournament_id: int) -> list:
+        fetching_threads.append(threading.current_thread())
+        return []
+
+    mocker.patch.object(
+        MetaculusApi,
+        "get_all_open_questions_from_tournament",
+        side_effect=mock_get_questions,
+    )
+    reports = await MockBot().forecast_on_tournament(1)
+
+    assert reports == []
+    assert fetching_threads[0] is not threading.current_thread()
+
+
+class _BotWithConfiguredLlm(MockBot):
+    FINAL_DECISION_LLM = GeneralLlm(model="claude-3-5-sonnet-20241022")
+
+
+def test_tokenizers_of_configured_models_are_warmed_up_once(
+    mocker: Mock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(ForecastBot, "_models_with_tokenizer_warm_up", set())
+    mock_warm_up = mocker.patch(
+        "forecasting_tools.forecast_bots.forecast_bot.TokenCounter.start_background_warm_up"
+    )
+
+    bot = _BotWithConfiguredLlm(
+        forecast_cascade=ForecastCascade(
+            cheap_llm=GeneralLlm(model="gpt-4o-mini")
+        )
+    )
+    _BotWithConfiguredLlm()
+
+    assert [llm.model for llm in bot._llms] == [
+        "claude-3-5-sonnet-20241022",
+        "gpt-4o-mini",
+    ]
+    assert mock_warm_up.call_count == 1
+    assert mock_warm_up.call_args.args[0] == [
+        "claude-3-5-sonnet-20241022",
+        "gpt-4o-mini",
+        "gpt-4o",
+    ]
+
+
+async def test_research_is_packed_for_the_forecasting_model(
+    mocker: Mock,
+) -> None:
+    mocker.patch(
+        "forecasting_tools.forecast_bots.forecast_bot.TokenCounter.start_background_warm_up"
+    )
+    research_context_packer = ResearchContextPacker()
+    bot = _BotWithConfiguredLlm(
+        research_context_packer=research_context_packer,
+        forecast_cascade=ForecastCascade(
+            cheap_llm=GeneralLlm(model="not-a-real-model")
+        ),
+    )
+    pack_spy = mocker.spy(research_context_packer, "pack")
+
+    await bot._research_and_make_predictions(
+        ForecastingTestManager.get_fake_binary_question()
+    )
+
+    forecast_pack_calls = [
+        call
+        for call in pack_spy.call_args_list
+        if "max_tokens" not in call.kwargs
+    ]
+    assert forecast_pack_calls[-1].kwargs["model"] == (
+        "claude-3-5-sonnet-20241022"
+    )
+
+
+async def test_research_is_not_packed_by_default(mocker: Mock) -> None:
+    mocker.patch(
+        "forecasting_tools.forecast_bots.forecast_bot.TokenCounter.start_background_warm_up"
+    )
+    pack_spy = mocker.spy(ResearchContextPacker, "pack")
+    bot = _BotWithConfiguredLlm()
+
+    await bot._research_and_make_predictions(
+        ForecastingTestManager.get_fake_binary_question()
+    )
+
+    assert bot.research_context_packer is None
+    assert all("max_tokens" in call.kwargs for call in pack_spy.call_args_list)
+
+
+async def test_cascade_is_skipped_when_forecasts_bypass_the_cheap_model(
+    mocker: Mock,
+) -> None:
+    mock_invoke = mocker.patch.object(
+        GeneralLlm, "invoke", return_value="Probability: 70%"
+    )
+    bot = MockBot(
+        predictions_per_research_report=2,
+        forecast_cascade=ForecastCascade(max_binary_spread=0.15),
+    )
+    MockBot.binary_calls = 0
+
+    report = await bot.forecast_question(
+        ForecastingTestManager.get_fake_binary_question()
+    )
+
+    assert MockBot.binary_calls == 2
+    assert mock_invoke.call_count == 0
+    assert report.other_notes is not None
+    assert "Cascade: skipped" in report.other_notes
+    assert "escalated" not in report.other_notes
@@ -0,0 +1,152 @@
+from datetime import datetime
+
+import pytest
+
+from code_tests.unit_tests.test_forecasting.forecasting_test_manager import (
+    ForecastingTestManager,
+    MockBot,
+)
+from forecasting_tools.ai_models.ai_utils.token_counting import TokenCounter
+from forecasting_tools.data_models.forecast_report import ReasonedPrediction
+from forecasting_tools.data_models.questions import BinaryQuestion
+from forecasting_tools.forecast_helpers.research_context_packer import (
+    ResearchContextPacker,
+)
+
+QUESTION_TEXT = "Will the Federal Reserve cut interest rates in March 2025?"
+NOW = datetime(2025, 2, 1)
+
+
+def _make_filler_section(title: str, sentences: int = 40) -> str:
+    body = " ".join(
+        f"Filler sentence {i} about gardening and local weather."
+        for i in range(sentences)
+    )
+    return f"## {title}\n\n{body}"
+
+
+def test_research_that_fits_is_returned_unchanged() -> None:
+    research = "## Summary\n\nThe Federal Reserve met in January 2025.\n"
+    packer = ResearchContextPacker(max_tokens=1000)
+    assert packer.pack(QUESTION_TEXT, research) == research
+
+
+def test_packed_research_fits_the_token_budget() -> None:
+    research = "\n\n".join(
+        _make_filler_section(f"Section {i}") for i in range(10)
+    )
+    packer = ResearchContextPacker(model="gpt-4o", max_tokens=500)
+    packed = packer.pack(QUESTION_TEXT, research)
+
+    assert 0 < TokenCounter.count_text_tokens("gpt-4o", packed) <= 500
+    assert len(packed) < len(research)
+
+
+def test_relevant_recent_and_cited_chunks_are_kept_first() -> None:
+    relevant_section = (
+        "## Fed outlook\n\nOn 2025-01-29 the Federal Reserve held interest "
+        "rates, and markets expect a cut in March "
+        "([reuters.com](https://www.reuters.com/fed))."
+    )
+    old_section = (
+        "## History\n\nOn 2019-07-31 the Federal Reserve cut interest rates."
+    )
+    research = "\n\n".join(
+        [
+            _make_filler_section("Gardening"),
+            old_section,
+            relevant_section,
+            _make_filler_section("Weather"),
+        ]
+    )
+    budget = TokenCounter.count_text_tokens("gpt-4o", relevant_section) + 5
+    packed = ResearchContextPacker().pack(
+        QUESTION_TEXT, research, max_tokens=budget, now=NOW
+    )
+    assert packed == relevant_section
+
+
+def test_kept_chunks_stay_in_their_original_order() -> None:
+    sections = [
+        "## First\n\nThe Federal Reserve raised interest rates.",
+        _make_filler_section("Filler"),
+        "## Last\n\nThe Federal Reserve may cut interest rates in March.",
+    ]
+    budget = sum(
+        TokenCounter.count_text_tokens("gpt-4o", section)
+        for section in (sections[0], sections[2])
+    )
+    packed = ResearchContextPacker().pack(
+        QUESTION_TEXT, "\n\n".join(sections), max_tokens=budget + 10
+    )
+    assert packed == f"{sections[0]}\n\n{sections[2]}"
+
+
+def test_duplicate_chunks_across_reports_are_dropped() -> None:
+    shared_section = (
+        "## Fed outlook\n\nAnalysts at several banks expect the Federal "
+        "Reserve to cut interest rates by a quarter point in March."
+    )
+    near_duplicate = shared_section.replace("Analysts", "analysts") + " "
+    first_report = f"{shared_section}\n\n## Asknews\n\nMarkets are calm."
+    second_report = f"{near_duplicate}\n\n## Exa\n\nBond yields fell."
+
+    packed = ResearchContextPacker().pack(
+        QUESTION_TEXT, [first_report, second_report]
+    )
+    assert packed.lower().count("analysts at several banks") == 1
+    assert "Markets are calm." in packed
+    assert "Bond yields fell." in packed
+
+
+@pytest.mark.parametrize(
+    "model, expected_budget",
+    [
+        ("gpt-4o", 64000),
+        ("openrouter/openai/gpt-4o", 64000),
+        ("metaculus/gpt-4o", 64000),
+        ("not-a-real-model", None),
+    ],
+)
+def test_budget_depends_on_the_model(
+    model: str, expected_budget: int | None
+) -> None:
+    assert ResearchContextPacker().get_token_budget(model) == expected_budget
+    assert ResearchContextPacker(max_tokens=100).get_token_budget(model) == 100
+
+
+def test_research_is_not_cut_for_models_with_unknown_context_window() -> None:
+    research = "\n\n".join(
+        _make_filler_section(f"Section {i}") for i in range(200)
+    )
+    packer = ResearchContextPacker(model="not-a-real-model")
+    assert packer.pack(QUESTION_TEXT, research) == research
+
+
+async def test_bot_forecasts_on_packed_research() -> None:
+    long_research = "\n\n".join(
+        _make_filler_section(f"Section {i}") for i in range(20)
+    )
+    bot = MockBot(
+        research_context_packer=ResearchContextPacker(max_tokens=300)
+    )
+    received_research = ""
+
+    async def mock_research(*args, **kwargs) -> str:
+        return long_research
+
+    async def mock_forecast(question: BinaryQuestion, research: str):
+        nonlocal received_research
+        received_research = research
+        return ReasonedPrediction(
+            prediction_value=0.5, reasoning="test reasoning"
+        )
+
+    bot.run_research = mock_research
+    bot._run_forecast_on_binary = mock_forecast
+    await bot.forecast_question(
+        ForecastingTestManager.get_fake_binary_question()
+    )
+
+    assert received_research
+    assert TokenCounter.count_text_tokens("gpt-4o", received_research) <= 300
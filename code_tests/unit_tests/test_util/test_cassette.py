@@ -0,0 +1,141 @@
+from pathlib import Path
+from unittest.mock import Mock
+
+import litellm
+import pytest
+import requests
+
+from forecasting_tools.ai_models.exa_searcher import ExaSearcher
+from forecasting_tools.ai_models.general_llm import GeneralLlm
+from forecasting_tools.forecast_helpers.metaculus_api import MetaculusApi
+from forecasting_tools.util.cassette import Cassette, CassetteMissError
+
+
+def _make_litellm_response(text: str) -> litellm.ModelResponse:
+    return litellm.ModelResponse(
+        model="gpt-4o",
+        choices=[{"message": {"role": "assistant", "content": text}}],
+        usage={
+            "prompt_tokens": 10,
+            "completion_tokens": 5,
+            "total_tokens": 15,
+        },
+    )
+
+
+def _patch_acompletion(mocker: Mock, texts: list[str]) -> Mock:
+    return mocker.patch(
+        "forecasting_tools.ai_models.general_llm.acompletion",
+        side_effect=[_make_litellm_response(text) for text in texts],
+    )
+
+
+async def test_llm_calls_are_replayed_without_network(
+    mocker: Mock, tmp_path: Path
+) -> None:
+    file_path = str(tmp_path / "cassette.sqlite")
+    _patch_acompletion(mocker, ["Recorded answer"])
+    with Cassette(file_path, mode="record") as cassette:
+        await GeneralLlm(model="gpt-4o").invoke("Today is 2025-01-01. Hi")
+    assert cassette.recorded == 1
+
+    mock_acompletion = _patch_acompletion(mocker, [])
+    with Cassette(file_path, mode="replay") as cassette:
+        response = await GeneralLlm(model="gpt-4o").invoke(
+            "Today is 2025-03-15. Hi"
+        )
+    assert response == "Recorded answer"
+    assert cassette.replayed == 1
+    assert mock_acompletion.call_count == 0
+
+
+async def test_repeated_requests_replay_in_recorded_order(
+    mocker: Mock, tmp_path: Path
+) -> None:
+    file_path = str(tmp_path / "cassette.sqlite")
+    _patch_acompletion(mocker, ["First", "Second"])
+    model = GeneralLlm(model="gpt-4o", temperature=1)
+    with Cassette(file_path, mode="record"):
+        await model.invoke("Hi")
+        await model.invoke("Hi")
+
+    _patch_acompletion(mocker, [])
+    with Cassette(file_path, mode="replay"):
+        responses = [await model.invoke("Hi") for _ in range(3)]
+    assert responses == ["First", "Second", "First"]
+
+
+async def test_unrecorded_request_fails_without_retrying(
+    mocker: Mock, tmp_path: Path
+) -> None:
+    mock_acompletion = _patch_acompletion(mocker, [])
+    with Cassette(str(tmp_path / "cassette.sqlite"), mode="replay"):
+        with pytest.raises(CassetteMissError):
+            await GeneralLlm(model="gpt-4o", allowed_tries=3).invoke("Hi")
+    assert mock_acompletion.call_count == 0
+
+
+def test_normalizers_are_configurable(tmp_path: Path) -> None:
+    date_insensitive_cassette = Cassette(str(tmp_path / "a.sqlite"))
+    date_sensitive_cassette = Cassette(
+        str(tmp_path / "b.sqlite"), normalizers=[]
+    )
+    first_request = {"prompt": "Today is March 15, 2025. Hi"}
+    second_request = {"prompt": "Today is April 2, 2025. Hi"}
+
+    assert date_insensitive_cassette.make_request_hash(
+        "llm", first_request
+    ) == date_insensitive_cassette.make_request_hash("llm", second_request)
+    assert date_sensitive_cassette.make_request_hash(
+        "llm", first_request
+    ) != date_sensitive_cassette.make_request_hash("llm", second_request)
+
+
+async def test_search_calls_are_replayed_without_api_key(
+    mocker: Mock, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    file_path = str(tmp_path / "cassette.sqlite")
+    monkeypatch.setenv("EXA_API_KEY", "test-key")
+    mocker.patch.object(
+        ExaSearcher,
+        "_post_to_api",
+        return_value={
+            "results": [{"title": "Recorded source", "url": "https://a.com"}]
+        },
+    )
+    with Cassette(file_path, mode="record"):
+        await ExaSearcher().invoke("rain in London")
+
+    monkeypatch.delenv("EXA_API_KEY")
+    mock_post = mocker.patch.object(ExaSearcher, "_post_to_api")
+    with Cassette(file_path, mode="replay"):
+        sources = await ExaSearcher().invoke("rain in London")
+    assert sources[0].title == "Recorded source"
+    assert mock_post.call_count == 0
+
+
+def test_metaculus_requests_are_replayed_without_token(
+    mocker: Mock, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    file_path = str(tmp_path / "cassette.sqlite")
+    monkeypatch.setenv("METACULUS_TOKEN", "test-token")
+    recorded_response = requests.Response()
+    recorded_response.status_code = 200
+    recorded_response.reason = "OK"
+    recorded_response.url = "https://www.metaculus.com/api/posts/"
+    recorded_response._content = b'{"results": []}'
+    mock_session = Mock()
+    mock_session.request.return_value = recorded_response
+    mocker.patch(
+        "forecasting_tools.forecast_helpers.metaculus_api.SharedHttpClients.requests_session",
+        return_value=mock_session,
+    )
+    with Cassette(file_path, mode="record"):
+        MetaculusApi._get_questions_from_api({"limit": 5})
+
+    monkeypatch.delenv("METACULUS_TOKEN")
+    mock_session.request.reset_mock()
+    with Cassette(file_path, mode="replay"):
+        questions = MetaculusApi._get_questions_from_api({"limit": 5})
+    assert questions == []
+    assert mock_session.request.call_count == 0
@@ -0,0 +1,58 @@
+import asyncio
+
+from forecasting_tools.util.http_clients import SharedHttpClients
+
+
+async def test_clients_are_shared_while_open() -> None:
+    async with SharedHttpClients.open():
+        assert SharedHttpClients.is_open()
+        async with SharedHttpClients.aiohttp_session() as first_session:
+            pass
+        async with SharedHttpClients.aiohttp_session() as second_session:
+            pass
+        async with SharedHttpClients.httpx_client() as first_client:
+            pass
+        async with SharedHttpClients.httpx_client() as second_client:
+            pass
+        assert first_session is second_session
+        assert not first_session.closed
+        assert first_client is second_client
+    assert first_session.closed
+    assert first_client.is_closed
+    assert not SharedHttpClients.is_open()
+
+
+async def test_nested_opens_reuse_clients_until_outermost_exits() -> None:
+    async with SharedHttpClients.open():
+        async with SharedHttpClients.aiohttp_session() as outer_session:
+            pass
+        async with SharedHttpClients.open():
+            async with SharedHttpClients.aiohttp_session() as inner_session:
+                pass
+        assert inner_session is outer_session
+        assert not outer_session.closed
+    assert outer_session.closed
+
+
+async def test_short_lived_client_is_used_when_not_open() -> None:
+    async with SharedHttpClients.aiohttp_session() as session:
+        assert not session.closed
+    assert session.closed
+
+
+def test_each_event_loop_gets_its_own_clients() -> None:
+    async def get_session_while_open() -> object:
+        async with SharedHttpClients.open():
+            async with SharedHttpClients.aiohttp_session() as session:
+                return session
+
+    assert asyncio.run(get_session_while_open()) is not asyncio.run(
+        get_session_while_open()
+    )
+
+
+def test_requests_session_is_reused() -> None:
+    assert (
+        SharedHttpClients.requests_session()
+        is SharedHttpClients.requests_session()
+    )
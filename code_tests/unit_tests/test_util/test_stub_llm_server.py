@@ -0,0 +1,99 @@
+import asyncio
+import random
+
+import litellm
+import pytest
+
+from forecasting_tools.ai_models.general_llm import GeneralLlm
+from forecasting_tools.util.stub_llm_server import (
+    LatencyDistribution,
+    StubLlmServer,
+    StubLlmServerConfig,
+)
+
+
+def _make_llm(server: StubLlmServer, **kwargs) -> GeneralLlm:
+    return GeneralLlm(
+        model="gpt-4o",
+        base_url=server.base_url,
+        api_key="stub",
+        temperature=0.5,
+        **kwargs,
+    )
+
+
+async def test_scripted_responses_are_returned_in_order() -> None:
+    config = StubLlmServerConfig(
+        scripted_responses=["Probability: 37%", "Probability: 80%"]
+    )
+    async with StubLlmServer(config) as server:
+        llm = _make_llm(server)
+        responses = [await llm.invoke(f"Question {i}") for i in range(3)]
+
+    assert responses == [
+        "Probability: 37%",
+        "Probability: 80%",
+        "Probability: 37%",
+    ]
+    assert server.metrics.requests_received == 3
+    assert server.metrics.responses_by_status == {200: 3}
+
+
+async def test_concurrent_requests_are_served_in_parallel() -> None:
+    config = StubLlmServerConfig(
+        latency=LatencyDistribution(mean_in_seconds=0.2)
+    )
+    async with StubLlmServer(config) as server:
+        llm = _make_llm(server)
+        await asyncio.gather(*[llm.invoke(f"Q{i}") for i in range(10)])
+
+    assert server.metrics.max_concurrent_requests > 1
+
+
+async def test_injected_rate_limits_reach_the_caller() -> None:
+    config = StubLlmServerConfig(
+        rate_limit_error_probability=1, retry_after_in_seconds=7
+    )
+    async with StubLlmServer(config) as server:
+        with pytest.raises(litellm.RateLimitError):
+            await _make_llm(server, allowed_tries=1, max_retries=0).invoke(
+                "Hi"
+            )
+
+    assert server.metrics.responses_by_status == {429: 1}
+
+
+async def test_requests_per_minute_limit_is_enforced() -> None:
+    config = StubLlmServerConfig(requests_per_minute_limit=2)
+    async with StubLlmServer(config) as server:
+        llm = _make_llm(server, allowed_tries=1, max_retries=0)
+        results = await asyncio.gather(
+            *[llm.invoke(f"Q{i}") for i in range(3)], return_exceptions=True
+        )
+
+    assert sum(isinstance(result, str) for result in results) == 2
+    assert server.metrics.responses_by_status == {200: 2, 429: 1}
+
+
+async def test_streamed_answers_arrive_in_chunks() -> None:
+    config = StubLlmServerConfig(
+        scripted_responses=["The answer is Probability: 37%"]
+    )
+    async with StubLlmServer(config) as server:
+        chunks = [
+            chunk async for chunk in _make_llm(server).invoke_stream("Hi")
+        ]
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == "The answer is Probability: 37%"
+
+
+def test_latency_distributions_have_the_configured_mean() -> None:
+    rng = random.Random(0)
+    for kind in ["constant", "uniform", "exponential", "lognormal"]:
+        distribution = LatencyDistribution(
+            kind=kind, mean_in_seconds=2, spread_in_seconds=1  # type: ignore
+        )
+        samples = [distribution.sample(rng) for _ in range(5000)]
+        assert all(sample >= 0 for sample in samples)
+        assert sum(samples) / len(samples) == pytest.approx(2, rel=0.1)
@@ -21,9 +21,25 @@ from forecasting_tools.ai_models.deprecated_model_classes.perplexity import (
 )
 from forecasting_tools.ai_models.exa_searcher import ExaSearcher as ExaSearcher
 from forecasting_tools.ai_models.general_llm import GeneralLlm as GeneralLlm
+from forecasting_tools.ai_models.resource_managers.adaptive_concurrency_limiter import (
+    AdaptiveConcurrencyLimiter as AdaptiveConcurrencyLimiter,
+)
+from forecasting_tools.ai_models.resource_managers.llm_batch_executor import (
+    LlmBatchExecutor as LlmBatchExecutor,
+)
+from forecasting_tools.ai_models.resource_managers.llm_response_cache import (
+    LlmResponseCache as LlmResponseCache,
+)
 from forecasting_tools.ai_models.resource_managers.monetary_cost_manager import (
     MonetaryCostManager as MonetaryCostManager,
 )
+from forecasting_tools.ai_models.resource_managers.rate_limiter_registry import (
+    RateLimit as RateLimit,
+)
+from forecasting_tools.ai_models.resource_managers.rate_limiter_registry import (
+    RateLimiterRegistry as RateLimiterRegistry,
+)
+from forecasting_tools.ai_models.routed_llm import RoutedLlm as RoutedLlm
 from forecasting_tools.data_models.benchmark_for_bot import (
     BenchmarkForBot as BenchmarkForBot,
 )
@@ -72,6 +88,9 @@ from forecasting_tools.data_models.questions import (
 from forecasting_tools.forecast_bots.forecast_bot import (
     ForecastBot as ForecastBot,
 )
+from forecasting_tools.forecast_bots.forecast_bot import (
+    ForecastCascade as ForecastCascade,
+)
 from forecasting_tools.forecast_bots.main_bot import MainBot as MainBot
 from forecasting_tools.forecast_bots.official_bots.q1_template_bot import (
     Q1TemplateBot2025 as Q1TemplateBot2025,
@@ -100,6 +119,9 @@ from forecasting_tools.forecast_helpers.metaculus_api import (
 from forecasting_tools.forecast_helpers.prediction_extractor import (
     PredictionExtractor as PredictionExtractor,
 )
+from forecasting_tools.forecast_helpers.research_context_packer import (
+    ResearchContextPacker as ResearchContextPacker,
+)
 from forecasting_tools.forecast_helpers.smart_searcher import (
     SmartSearcher as SmartSearcher,
 )
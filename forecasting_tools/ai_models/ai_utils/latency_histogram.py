@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import bisect
+import math
+
+
+class LatencyHistogram:
+    """
+    A fixed-memory histogram of call durations in seconds.
+
+    Buckets grow geometrically (each bucket is `growth_factor` times wider than
+    the last), so the relative error of a percentile is the same for a 0.5 s
+    call and a 60 s call. Percentiles are reported as the upper edge of the
+    bucket they fall in, which errs on the side of waiting slightly too long.
+
+    With `half_life_in_records` set, older durations count for less: each
+    record halves in weight after that many newer ones, so percentiles follow
+    the provider's current latency rather than its whole history.
+    """
+
+    def __init__(
+        self,
+        smallest_bucket_in_seconds: float = 0.01,
+        largest_bucket_in_seconds: float = 3600,
+        growth_factor: float = 1.2,
+        half_life_in_records: float | None = None,
+    ) -> None:
+        if smallest_bucket_in_seconds <= 0:
+            raise ValueError("smallest_bucket_in_seconds must be positive")
+        if largest_bucket_in_seconds <= smallest_bucket_in_seconds:
+            raise ValueError(
+                "largest_bucket_in_seconds must be larger than smallest_bucket_in_seconds"
+            )
+        if growth_factor <= 1:
+            raise ValueError("growth_factor must be greater than 1")
+        if half_life_in_records is not None and half_life_in_records <= 0:
+            raise ValueError("half_life_in_records must be positive")
+        number_of_buckets = math.ceil(
+            math.log(largest_bucket_in_seconds / smallest_bucket_in_seconds)
+            / math.log(growth_factor)
+        )
+        self._bucket_upper_edges = [
+            smallest_bucket_in_seconds * growth_factor**index
+            for index in range(number_of_buckets + 1)
+        ]
+        self._bucket_weights = [0.0] * (len(self._bucket_upper_edges) + 1)
+        self._total_weight = 0.0
+        self._decay_per_record = (
+            0.5 ** (1 / half_life_in_records)
+            if half_life_in_records is not None
+            else 1.0
+        )
+        self._count = 0
+        self._max_seen = 0.0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def record(self, duration_in_seconds: float) -> None:
+        duration_in_seconds = max(duration_in_seconds, 0)
+        bucket_index = bisect.bisect_left(
+            self._bucket_upper_edges, duration_in_seconds
+        )
+        if self._decay_per_record != 1:
+            self._bucket_weights = [
+                weight * self._decay_per_record
+                for weight in self._bucket_weights
+            ]
+            self._total_weight *= self._decay_per_record
+        self._bucket_weights[bucket_index] += 1
+        self._total_weight += 1
+        self._count += 1
+        self._max_seen = max(self._max_seen, duration_in_seconds)
+
+    def percentile(self, percentile: float) -> float | None:
+        """
+        Returns the duration that `percentile` percent (0-100) of recorded
+        calls (by weight) finished within, or None if nothing has been
+        recorded.
+        """
+        if not 0 <= percentile <= 100:
+            raise ValueError("percentile must be between 0 and 100")
+        if self._count == 0:
+            return None
+        # Slightly under the exact rank so float rounding can't skip a bucket
+        rank = self._total_weight * percentile / 100 * (1 - 1e-9)
+        seen = 0.0
+        for bucket_index, bucket_weight in enumerate(self._bucket_weights):
+            seen += bucket_weight
+            if seen > 0 and seen >= rank:
+                if bucket_index >= len(self._bucket_upper_edges):
+                    return self._max_seen
+                return min(
+                    self._bucket_upper_edges[bucket_index], self._max_seen
+                )
+        return self._max_seen
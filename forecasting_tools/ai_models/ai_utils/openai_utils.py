@@ -1,9 +1,12 @@
+import asyncio
 import base64
+import hashlib
 import logging
 import math
 import re
-from io import BytesIO
-from typing import Literal
+import threading
+from collections import OrderedDict
+from typing import Iterable, Iterator, Literal
 from urllib import request
 
 import tiktoken
@@ -15,7 +18,7 @@ from openai.types.chat import (
     ChatCompletionUserMessageParam,
 )
 from openai.types.chat.chat_completion_content_part_image_param import ImageURL
-from PIL import Image
+from PIL import ImageFile
 from pydantic import BaseModel
 from tiktoken import Encoding
 
@@ -32,6 +35,18 @@ class VisionMessageData(BaseModel):
 
 
 class OpenAiUtils:
+    """
+    Image dimensions (needed to count the tokens of high detail images) are
+    read from the first few KB of the image only, and are remembered per URL
+    or per hash of the base64 data.
+    """
+
+    IMAGE_PROBE_CHUNK_SIZE_IN_BYTES = 4096
+    IMAGE_PROBE_TIMEOUT_IN_SECONDS = 10
+    MAX_IMAGE_PROBE_BYTES = 1024 * 1024
+    MAX_CACHED_IMAGE_DIMENSIONS = 1024
+    _cached_image_dimensions: OrderedDict[str, tuple[int, int]] = OrderedDict()
+    _image_dimensions_lock = threading.Lock()
 
     @staticmethod
     def text_to_tokens_direct(text_to_tokenize: str, model: str) -> int:
@@ -136,32 +151,106 @@ class OpenAiUtils:
                     if item["type"] == "text":
                         num_tokens += len(encoding.encode(item["text"]))
                     elif item["type"] == "image_url":
-                        num_tokens += OpenAiUtils.__calculate_tokens_of_image(item["image_url"]["url"], item["image_url"]["detail"])  # type: ignore
+                        num_tokens += OpenAiUtils.calculate_tokens_of_image(item["image_url"]["url"], item["image_url"]["detail"])  # type: ignore
             elif isinstance(value, str):
                 num_tokens += len(encoding.encode(value))
 
         return num_tokens
 
+    @classmethod
+    def get_image_dimensions(cls, image_url_or_b64: str) -> tuple[int, int]:
+        cache_key = cls.__make_image_cache_key(image_url_or_b64)
+        with cls._image_dimensions_lock:
+            dimensions = cls._cached_image_dimensions.get(cache_key)
+            if dimensions is not None:
+                cls._cached_image_dimensions.move_to_end(cache_key)
+                return dimensions
+        dimensions = cls.__get_image_dimensions(image_url_or_b64)
+        with cls._image_dimensions_lock:
+            cls._cached_image_dimensions[cache_key] = dimensions
+            while (
+                len(cls._cached_image_dimensions)
+                > cls.MAX_CACHED_IMAGE_DIMENSIONS
+            ):
+                cls._cached_image_dimensions.popitem(last=False)
+        return dimensions
+
+    @classmethod
+    async def get_image_dimensions_async(
+        cls, image_url_or_b64: str
+    ) -> tuple[int, int]:
+        """
+        Probes the image in a worker thread so the event loop is not blocked
+        by the download
+        """
+        return await asyncio.to_thread(
+            cls.get_image_dimensions, image_url_or_b64
+        )
+
+    @classmethod
+    def clear_image_dimensions_cache(cls) -> None:
+        with cls._image_dimensions_lock:
+            cls._cached_image_dimensions.clear()
+
     @staticmethod
-    def __get_image_dimensions(image_url_or_b64: str) -> tuple[int, int]:
+    def __make_image_cache_key(image_url_or_b64: str) -> str:
+        if image_url_or_b64.startswith("data:"):
+            return hashlib.sha256(image_url_or_b64.encode()).hexdigest()
+        return image_url_or_b64
+
+    @classmethod
+    def __get_image_dimensions(cls, image_url_or_b64: str) -> tuple[int, int]:
         # regex to check if image is a URL or base64 string
         url_regex = r"https?:\/\/(www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b([-a-zA-Z0-9()@:%_\+.~#?&\/\/=]*)"  # NOSONAR
         base_64_regex = r"data:image\/\w+;base64,"
         if re.match(url_regex, image_url_or_b64):
-            response = request.urlopen(image_url_or_b64)
-            image = Image.open(response)
-            return image.size
+            with request.urlopen(
+                image_url_or_b64, timeout=cls.IMAGE_PROBE_TIMEOUT_IN_SECONDS
+            ) as response:
+                chunks = iter(
+                    lambda: response.read(cls.IMAGE_PROBE_CHUNK_SIZE_IN_BYTES),
+                    b"",
+                )
+                return cls.__read_dimensions_from_image_header(chunks)
         elif re.match(base_64_regex, image_url_or_b64):
             image_url_or_b64 = re.sub(
                 r"data:image\/\w+;base64,", "", image_url_or_b64
             )
-            image = Image.open(BytesIO(base64.b64decode(image_url_or_b64)))
-            return image.size
+            return cls.__read_dimensions_from_image_header(
+                cls.__decode_base64_in_chunks(image_url_or_b64)
+            )
         else:
             raise ValueError("Image must be a URL or base64 string.")
 
+    @classmethod
+    def __decode_base64_in_chunks(cls, b64_image: str) -> Iterator[bytes]:
+        b64_image = re.sub(r"\s", "", b64_image)
+        # Every 4 base64 characters decode to 3 bytes
+        characters_per_chunk = cls.IMAGE_PROBE_CHUNK_SIZE_IN_BYTES // 3 * 4
+        for start in range(0, len(b64_image), characters_per_chunk):
+            yield base64.b64decode(
+                b64_image[start : start + characters_per_chunk]
+            )
+
+    @classmethod
+    def __read_dimensions_from_image_header(
+        cls, chunks: Iterable[bytes]
+    ) -> tuple[int, int]:
+        parser = ImageFile.Parser()
+        bytes_read = 0
+        for chunk in chunks:
+            parser.feed(chunk)
+            if parser.image is not None:
+                return parser.image.size
+            bytes_read += len(chunk)
+            if bytes_read >= cls.MAX_IMAGE_PROBE_BYTES:
+                break
+        raise ValueError(
+            f"Could not read the image dimensions from its first {bytes_read} bytes"
+        )
+
     @staticmethod
-    def __calculate_tokens_of_image(image_url_or_b64: str, detail: str) -> int:
+    def calculate_tokens_of_image(image_url_or_b64: str, detail: str) -> int:
         # Constants
         LOW_DETAIL_COST = 85
         HIGH_DETAIL_COST_PER_TILE = 170
@@ -172,9 +261,7 @@ class OpenAiUtils:
             return LOW_DETAIL_COST
         elif detail == "high":
             # Calculate token cost for high detail images
-            width, height = OpenAiUtils.__get_image_dimensions(
-                image_url_or_b64
-            )
+            width, height = OpenAiUtils.get_image_dimensions(image_url_or_b64)
             # Check if resizing is needed to fit within a 2048 x 2048 square
             if max(width, height) > 2048:
                 # Resize the image to fit within a 2048 x 2048 square
@@ -17,3 +17,25 @@ class TextTokenResponse(ModelResponse):
 
 class TextTokenCostResponse(TextTokenResponse):
     cost: float
+    cached_prompt_tokens_used: int = 0
+    """
+    Prompt tokens the provider read from its prompt cache (included in
+    prompt_tokens_used, and billed at the provider's cached rate in cost)
+    """
+    is_cached_response: bool = False
+    """
+    True if the response was served from a cache or shared with an identical
+    in-flight call. The cost and tokens are those of the original call,
+    and should not be charged again.
+    """
+
+
+class MultipleTextTokenCostResponse(ModelResponse):
+    data: list[str]
+    prompt_tokens_used: int
+    completion_tokens_used: int
+    total_tokens_used: int
+    cached_prompt_tokens_used: int = 0
+    model: str
+    cost: float
+    is_cached_response: bool = False
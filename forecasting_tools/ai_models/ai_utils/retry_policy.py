@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from enum import Enum
+from typing import Any, Callable, Coroutine, TypeVar
+
+import litellm
+
+from forecasting_tools.ai_models.resource_managers.hard_limit_manager import (
+    HardLimitExceededError,
+)
+from forecasting_tools.util.cassette import CassetteMissError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ErrorCategory(Enum):
+    RATE_LIMIT = "rate_limit"
+    TRANSIENT = "transient"
+    TIMEOUT = "timeout"
+    FATAL = "fatal"
+
+
+class RetryMetrics:
+    def __init__(self) -> None:
+        self.retries_by_category: dict[ErrorCategory, int] = {
+            category: 0 for category in ErrorCategory
+        }
+        self.total_seconds_slept: float = 0
+        self.fatal_errors_not_retried: int = 0
+        self.calls_that_ran_out_of_tries: int = 0
+        self.calls_that_ran_out_of_time_budget: int = 0
+
+    @property
+    def total_retries(self) -> int:
+        return sum(self.retries_by_category.values())
+
+    def as_dict(self) -> dict[str, float]:
+        metrics: dict[str, float] = {
+            f"retries_{category.value}": count
+            for category, count in self.retries_by_category.items()
+        }
+        metrics["total_retries"] = self.total_retries
+        metrics["total_seconds_slept"] = self.total_seconds_slept
+        metrics["fatal_errors_not_retried"] = self.fatal_errors_not_retried
+        metrics["calls_that_ran_out_of_tries"] = (
+            self.calls_that_ran_out_of_tries
+        )
+        metrics["calls_that_ran_out_of_time_budget"] = (
+            self.calls_that_ran_out_of_time_budget
+        )
+        return metrics
+
+
+class RetryPolicy:
+    """
+    Decides whether and when a failed call is retried.
+
+    Errors are classified as rate limit, transient, timeout or fatal.
+    - Fatal errors (bad requests, auth errors, exceeded cost limits, etc.)
+    are raised right away since retrying will not help.
+    - Rate limit errors wait for the provider's Retry-After delay if one is
+    given, otherwise they back off like transient errors.
+    - Transient errors and timeouts back off with random exponential waits
+    between `min_wait_in_seconds` and `max_wait_in_seconds`.
+    No retry is started if it would go past `total_time_budget_in_seconds`
+    since the first try.
+
+    Retry counts and sleep time are recorded in `metrics`. Subclass and
+    override `classify_error` or `get_wait_time` to change the policy.
+    """
+
+    FATAL_STATUS_CODES_EXCEPT: set[int] = {408, 409, 429}
+    FATAL_ERROR_TYPES: tuple[type[BaseException], ...] = (
+        HardLimitExceededError,
+        NotImplementedError,
+        TypeError,
+        litellm.BadRequestError,
+        litellm.AuthenticationError,
+        litellm.NotFoundError,
+        litellm.UnprocessableEntityError,
+        CassetteMissError,
+    )
+    TIMEOUT_ERROR_TYPES: tuple[type[BaseException], ...] = (
+        TimeoutError,
+        asyncio.TimeoutError,
+        litellm.Timeout,
+    )
+
+    def __init__(
+        self,
+        min_wait_in_seconds: float = 5,
+        max_wait_in_seconds: float = 60,
+        wait_multiplier: float = 10,
+        exponential_base: float = 2,
+        total_time_budget_in_seconds: float | None = 600,
+        max_retry_after_in_seconds: float = 120,
+    ) -> None:
+        if (
+            min_wait_in_seconds < 0
+            or max_wait_in_seconds < min_wait_in_seconds
+        ):
+            raise ValueError(
+                "Waits must be non-negative and min_wait_in_seconds must not exceed max_wait_in_seconds"
+            )
+        if (
+            total_time_budget_in_seconds is not None
+            and total_time_budget_in_seconds <= 0
+        ):
+            raise ValueError("total_time_budget_in_seconds must be positive")
+        self.min_wait_in_seconds = min_wait_in_seconds
+        self.max_wait_in_seconds = max_wait_in_seconds
+        self.wait_multiplier = wait_multiplier
+        self.exponential_base = exponential_base
+        self.total_time_budget_in_seconds = total_time_budget_in_seconds
+        self.max_retry_after_in_seconds = max_retry_after_in_seconds
+        self.metrics = RetryMetrics()
+
+    async def run(
+        self,
+        coroutine_factory: Callable[[], Coroutine[Any, Any, T]],
+        allowed_tries: int,
+    ) -> T:
+        start_time = time.monotonic()
+        attempt_number = 1
+        while True:
+            try:
+                return await coroutine_factory()
+            except Exception as error:
+                category = self.classify_error(error)
+                if category == ErrorCategory.FATAL:
+                    self.metrics.fatal_errors_not_retried += 1
+                    raise
+                if attempt_number >= allowed_tries:
+                    self.metrics.calls_that_ran_out_of_tries += 1
+                    raise
+                wait_time = self.get_wait_time(category, attempt_number, error)
+                time_used = time.monotonic() - start_time
+                if (
+                    self.total_time_budget_in_seconds is not None
+                    and time_used + wait_time
+                    > self.total_time_budget_in_seconds
+                ):
+                    self.metrics.calls_that_ran_out_of_time_budget += 1
+                    raise
+                logger.warning(
+                    f"Attempt {attempt_number} failed with {category.value} error, "
+                    f"retrying in {wait_time:.1f}s. Error: {error}"
+                )
+                self.metrics.retries_by_category[category] += 1
+                self.metrics.total_seconds_slept += wait_time
+                await asyncio.sleep(wait_time)
+                attempt_number += 1
+
+    def classify_error(self, error: BaseException) -> ErrorCategory:
+        if isinstance(error, litellm.RateLimitError):
+            return ErrorCategory.RATE_LIMIT
+        if isinstance(error, self.TIMEOUT_ERROR_TYPES):
+            return ErrorCategory.TIMEOUT
+        if isinstance(error, self.FATAL_ERROR_TYPES):
+            return ErrorCategory.FATAL
+        status_code = self._get_status_code(error)
+        if status_code == 429:
+            return ErrorCategory.RATE_LIMIT
+        if status_code == 408:
+            return ErrorCategory.TIMEOUT
+        if (
+            status_code is not None
+            and 400 <= status_code < 500
+            and status_code not in self.FATAL_STATUS_CODES_EXCEPT
+        ):
+            return ErrorCategory.FATAL
+        return ErrorCategory.TRANSIENT
+
+    def get_wait_time(
+        self,
+        category: ErrorCategory,
+        attempt_number: int,
+        error: BaseException,
+    ) -> float:
+        if category == ErrorCategory.RATE_LIMIT:
+            retry_after = self.get_retry_after(error)
+            if retry_after is not None:
+                return min(retry_after, self.max_retry_after_in_seconds)
+        exponential_wait = self.wait_multiplier * (
+            self.exponential_base ** (attempt_number - 1)
+        )
+        random_wait = random.uniform(0, exponential_wait)
+        return min(
+            max(random_wait, self.min_wait_in_seconds),
+            self.max_wait_in_seconds,
+        )
+
+    @classmethod
+    def get_retry_after(cls, error: BaseException) -> float | None:
+        headers = cls._get_headers(error)
+        if not headers:
+            return None
+        lowercase_headers = {
+            str(key).lower(): str(value) for key, value in headers.items()
+        }
+        retry_after_ms = lowercase_headers.get("retry-after-ms")
+        if retry_after_ms is not None:
+            try:
+                return max(float(retry_after_ms) / 1000, 0)
+            except ValueError:
+                pass
+        retry_after = lowercase_headers.get("retry-after")
+        if retry_after is None:
+            return None
+        try:
+            return max(float(retry_after), 0)
+        except ValueError:
+            pass
+        try:
+            retry_date = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        if retry_date.tzinfo is None:
+            retry_date = retry_date.replace(tzinfo=timezone.utc)
+        return max(
+            (retry_date - datetime.now(timezone.utc)).total_seconds(), 0
+        )
+
+    @staticmethod
+    def _get_status_code(error: BaseException) -> int | None:
+        for attribute in ("status_code", "status"):
+            status_code = getattr(error, attribute, None)
+            if isinstance(status_code, int):
+                return status_code
+        response = getattr(error, "response", None)
+        status_code = getattr(response, "status_code", None)
+        if isinstance(status_code, int):
+            return status_code
+        return None
+
+    @staticmethod
+    def _get_headers(error: BaseException) -> Any:
+        headers = getattr(error, "headers", None)
+        if headers:
+            return headers
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers:
+            return headers
+        return getattr(error, "litellm_response_headers", None)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from litellm.utils import token_counter
+
+from forecasting_tools.ai_models.ai_utils.openai_utils import OpenAiUtils
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCounter:
+    """
+    Counts tokens with litellm's token_counter, remembering recent counts so
+    the same prompt is never tokenized twice.
+
+    Counts are kept in an LRU cache keyed by a hash of the model and the
+    content. Tokenizers are loaded lazily by litellm, which can stall the
+    first call for a few seconds, so `start_background_warm_up` can load
+    them in a background thread when a bot starts.
+
+    `approximate_tokens` is a fast estimate (about 4 characters per token)
+    for budgeting paths where an exact count is not needed.
+
+    Images are counted with OpenAiUtils, which only reads the header of each
+    high detail image and remembers its dimensions. Use
+    `count_message_tokens_async` on the event loop so an image download does
+    not block it.
+    """
+
+    MAX_CACHED_COUNTS = 4096
+    CHARACTERS_PER_TOKEN = 4
+    TOKENS_PER_MESSAGE_OVERHEAD = 4
+
+    _cached_counts: OrderedDict[str, int] = OrderedDict()
+    _lock = threading.Lock()
+    _warmed_up_models: set[str] = set()
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def count_message_tokens(
+        cls, model: str, messages: list[dict[str, Any]]
+    ) -> int:
+        key = cls._make_key(model, "messages", messages)
+        cached_count = cls._get_cached_count(key)
+        if cached_count is not None:
+            return cached_count
+        messages_without_images, image_parts = cls._split_out_images(messages)
+        count = token_counter(model=model, messages=messages_without_images)
+        count += sum(cls._count_image_tokens(part) for part in image_parts)
+        cls._cache_count(key, count)
+        return count
+
+    @classmethod
+    async def count_message_tokens_async(
+        cls, model: str, messages: list[dict[str, Any]]
+    ) -> int:
+        _, image_parts = cls._split_out_images(messages)
+        if not image_parts:
+            return cls.count_message_tokens(model, messages)
+        return await asyncio.to_thread(
+            cls.count_message_tokens, model, messages
+        )
+
+    @classmethod
+    def count_text_tokens(cls, model: str, text: str) -> int:
+        key = cls._make_key(model, "text", text)
+        cached_count = cls._get_cached_count(key)
+        if cached_count is not None:
+            return cached_count
+        count = token_counter(model=model, text=text)
+        cls._cache_count(key, count)
+        return count
+
+    @classmethod
+    def approximate_tokens(cls, content: str | list[dict[str, Any]]) -> int:
+        if isinstance(content, str):
+            return len(content) // cls.CHARACTERS_PER_TOKEN + 1
+        total_tokens = 0
+        for message in content:
+            message_content = message.get("content", "")
+            if not isinstance(message_content, str):
+                message_content = json.dumps(message_content, default=str)
+            total_tokens += (
+                len(message_content) // cls.CHARACTERS_PER_TOKEN
+                + cls.TOKENS_PER_MESSAGE_OVERHEAD
+            )
+        return total_tokens
+
+    @classmethod
+    def warm_up(cls, models: list[str]) -> None:
+        """
+        Loads the tokenizer of each model (once per process)
+        """
+        for model in models:
+            with cls._lock:
+                if model in cls._warmed_up_models:
+                    continue
+                cls._warmed_up_models.add(model)
+            try:
+                token_counter(model=model, text="Warm up")
+            except Exception as e:
+                logger.debug(f"Could not preload tokenizer for {model}: {e}")
+
+    @classmethod
+    def start_background_warm_up(cls, models: list[str]) -> threading.Thread:
+        thread = threading.Thread(
+            target=cls.warm_up,
+            args=(models,),
+            name="tokenizer-warm-up",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        with cls._lock:
+            cls._cached_counts.clear()
+            cls.hits = 0
+            cls.misses = 0
+
+    @classmethod
+    def _get_cached_count(cls, key: str) -> int | None:
+        with cls._lock:
+            count = cls._cached_counts.get(key)
+            if count is None:
+                cls.misses += 1
+                return None
+            cls._cached_counts.move_to_end(key)
+            cls.hits += 1
+            return count
+
+    @classmethod
+    def _cache_count(cls, key: str, count: int) -> None:
+        with cls._lock:
+            cls._cached_counts[key] = count
+            cls._cached_counts.move_to_end(key)
+            while len(cls._cached_counts) > cls.MAX_CACHED_COUNTS:
+                cls._cached_counts.popitem(last=False)
+
+    @staticmethod
+    def _split_out_images(
+        messages: list[dict[str, Any]],
+    ) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        messages_without_images: list[dict[str, Any]] = []
+        image_parts: list[dict[str, Any]] = []
+        for message in messages:
+            content = message.get("content")
+            if not isinstance(content, list):
+                messages_without_images.append(message)
+                continue
+            other_parts = []
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "image_url":
+                    image_parts.append(part)
+                else:
+                    other_parts.append(part)
+            messages_without_images.append({**message, "content": other_parts})
+        return messages_without_images, image_parts
+
+    @staticmethod
+    def _count_image_tokens(image_part: dict[str, Any]) -> int:
+        image_url = image_part["image_url"]
+        if isinstance(image_url, str):
+            image_url = {"url": image_url}
+        # Like litellm, "auto" detail is counted as "low"
+        detail = "high" if image_url.get("detail") == "high" else "low"
+        return OpenAiUtils.calculate_tokens_of_image(image_url["url"], detail)
+
+    @staticmethod
+    def _make_key(model: str, content_type: str, content: Any) -> str:
+        serialized_content = (
+            content
+            if isinstance(content, str)
+            else json.dumps(content, sort_keys=True, default=str)
+        )
+        hasher = hashlib.sha256()
+        hasher.update(f"{model}\n{content_type}\n".encode())
+        hasher.update(serialized_content.encode())
+        return hasher.hexdigest()
@@ -4,7 +4,6 @@ import logging
 import os
 from datetime import datetime
 
-import aiohttp
 from pydantic import BaseModel, Field
 
 from forecasting_tools.ai_models.model_interfaces.incurs_cost import IncursCost
@@ -20,6 +19,8 @@ from forecasting_tools.ai_models.model_interfaces.time_limited_model import (
 from forecasting_tools.ai_models.resource_managers.monetary_cost_manager import (
     MonetaryCostManager,
 )
+from forecasting_tools.util.cassette import Cassette
+from forecasting_tools.util.http_clients import SharedHttpClients
 from forecasting_tools.util.jsonable import Jsonable
 
 logger = logging.getLogger(__name__)
@@ -83,6 +84,7 @@ class ExaSearcher(
         3  # For rate limits see https://docs.exa.ai/reference/rate-limits
     )
     REQUEST_PERIOD_IN_SECONDS = 1
+    RATE_LIMIT_PROVIDER = "exa"
     TIMEOUT_TIME = 30
     COST_PER_REQUEST = 0.005
     COST_PER_HIGHLIGHT = 0.001
@@ -224,6 +226,8 @@ class ExaSearcher(
 
     def _get_api_key(self) -> str:
         api_key = os.getenv("EXA_API_KEY")
+        if api_key is None and Cassette.is_replaying():
+            return ""
         assert (
             api_key is not None
         ), "EXA_API_KEY is not set in the environment variables"
@@ -232,7 +236,16 @@ class ExaSearcher(
     async def _make_api_request(
         self, url: str, headers: dict, payload: dict
     ) -> dict:
-        async with aiohttp.ClientSession() as session:
+        return await Cassette.record_or_replay_async(
+            "exa",
+            {"url": url, "payload": payload},
+            lambda: self._post_to_api(url, headers, payload),
+        )
+
+    async def _post_to_api(
+        self, url: str, headers: dict, payload: dict
+    ) -> dict:
+        async with SharedHttpClients.aiohttp_session() as session:
             async with session.post(
                 url, json=payload, headers=headers
             ) as response:
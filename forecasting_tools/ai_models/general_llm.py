@@ -1,24 +1,36 @@
 from __future__ import annotations
 
+import asyncio
+import bisect
+import contextlib
+import copy
 import inspect
 import logging
 import os
-from typing import Any
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable
 
 import litellm
 import typeguard
 from litellm import acompletion, model_cost
 from litellm.files.main import ModelResponse
 from litellm.types.utils import Choices, Usage
-from litellm.utils import token_counter
+from pydantic import BaseModel, ConfigDict
 
+from forecasting_tools.ai_models.ai_utils.latency_histogram import (
+    LatencyHistogram,
+)
 from forecasting_tools.ai_models.ai_utils.openai_utils import (
     OpenAiUtils,
     VisionMessageData,
 )
 from forecasting_tools.ai_models.ai_utils.response_types import (
+    MultipleTextTokenCostResponse,
     TextTokenCostResponse,
 )
+from forecasting_tools.ai_models.ai_utils.retry_policy import RetryPolicy
+from forecasting_tools.ai_models.ai_utils.token_counting import TokenCounter
 from forecasting_tools.ai_models.model_interfaces.outputs_text import (
     OutputsText,
 )
@@ -28,18 +40,268 @@ from forecasting_tools.ai_models.model_interfaces.retryable_model import (
 from forecasting_tools.ai_models.model_interfaces.tokens_incur_cost import (
     TokensIncurCost,
 )
+from forecasting_tools.ai_models.resource_managers.adaptive_concurrency_limiter import (
+    AdaptiveConcurrencyLimiter,
+)
+from forecasting_tools.ai_models.resource_managers.llm_batch_executor import (
+    LlmBatchExecutor,
+)
+from forecasting_tools.ai_models.resource_managers.llm_rate_limiter import (
+    LlmRateLimiter,
+)
+from forecasting_tools.ai_models.resource_managers.llm_response_cache import (
+    LlmResponseCache,
+)
 from forecasting_tools.ai_models.resource_managers.monetary_cost_manager import (
     MonetaryCostManager,
 )
+from forecasting_tools.ai_models.resource_managers.rate_limiter_registry import (
+    RateLimit,
+    RateLimiterRegistry,
+)
+from forecasting_tools.ai_models.resource_managers.request_coalescer import (
+    RequestCoalescer,
+)
+from forecasting_tools.util.cassette import Cassette
 
 logger = logging.getLogger(__name__)
-ModelInputType = str | VisionMessageData | list[dict[str, str]]
+
+
+class CacheablePrompt(BaseModel):
+    """
+    A prompt split into a stable prefix (e.g. question details and research)
+    that is repeated across calls, and a variable suffix.
+
+    The prefix is always sent first so providers with automatic prefix
+    caching (OpenAI, DeepSeek) can reuse it. For Anthropic models the prefix
+    is marked with `cache_control` so it is cached explicitly.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    stable_prefix: str
+    variable_suffix: str
+
+    def to_text(self) -> str:
+        return (
+            f"{self.stable_prefix.rstrip()}\n\n{self.variable_suffix.lstrip()}"
+        )
+
+
+ModelInputType = (
+    str | VisionMessageData | CacheablePrompt | list[dict[str, str]]
+)
+
+
+class StreamingMetrics(BaseModel):
+    model: str
+    time_to_first_token: float | None
+    time_to_answer: float | None
+    total_time: float
+    stopped_early: bool
+
+
+class HedgePolicy:
+    """
+    If a call has not returned within the `latency_percentile` latency seen
+    so far for the model, a duplicate call is sent (to `fallback_llm` if
+    given). The first response wins and the other call is cancelled.
+    No hedging happens until `min_calls_before_hedging` calls have been timed.
+    """
+
+    def __init__(
+        self,
+        latency_percentile: float = 95,
+        fallback_llm: GeneralLlm | None = None,
+        min_calls_before_hedging: int = 20,
+        min_hedge_delay_in_seconds: float = 1,
+    ) -> None:
+        if not 0 < latency_percentile < 100:
+            raise ValueError("latency_percentile must be between 0 and 100")
+        if min_calls_before_hedging < 1:
+            raise ValueError("min_calls_before_hedging must be at least 1")
+        self.latency_percentile = latency_percentile
+        self.fallback_llm = fallback_llm
+        self.min_calls_before_hedging = min_calls_before_hedging
+        self.min_hedge_delay_in_seconds = min_hedge_delay_in_seconds
+
+
+class TimeoutPolicy:
+    """
+    Sets the timeout of each call from the recent latency of earlier calls to
+    the same model with a similar prompt size (calls that timed out count as
+    taking as long as their timeout): the
+    `latency_percentile` latency times `margin_multiplier` plus
+    `margin_in_seconds`, kept between `min_timeout_in_seconds` and
+    `max_timeout_in_seconds`. Until a prompt size bucket has
+    `min_calls_before_adapting` timed calls, the model's static default
+    timeout is used.
+    """
+
+    def __init__(
+        self,
+        latency_percentile: float = 99,
+        margin_multiplier: float = 1.5,
+        margin_in_seconds: float = 5,
+        min_timeout_in_seconds: float = 10,
+        max_timeout_in_seconds: float = 300,
+        min_calls_before_adapting: int = 20,
+    ) -> None:
+        if not 0 < latency_percentile <= 100:
+            raise ValueError("latency_percentile must be between 0 and 100")
+        if margin_multiplier < 1 or margin_in_seconds < 0:
+            raise ValueError(
+                "margin_multiplier must be at least 1 and margin_in_seconds must not be negative"
+            )
+        if not 0 < min_timeout_in_seconds <= max_timeout_in_seconds:
+            raise ValueError(
+                "min_timeout_in_seconds must be positive and not exceed max_timeout_in_seconds"
+            )
+        if min_calls_before_adapting < 1:
+            raise ValueError("min_calls_before_adapting must be at least 1")
+        self.latency_percentile = latency_percentile
+        self.margin_multiplier = margin_multiplier
+        self.margin_in_seconds = margin_in_seconds
+        self.min_timeout_in_seconds = min_timeout_in_seconds
+        self.max_timeout_in_seconds = max_timeout_in_seconds
+        self.min_calls_before_adapting = min_calls_before_adapting
+
+    def get_timeout(
+        self,
+        model_tracker: ModelTracker,
+        prompt_tokens: int,
+        default_timeout: float,
+    ) -> float:
+        latency_histogram = model_tracker.get_latency_histogram_for_prompt(
+            prompt_tokens
+        )
+        if (
+            latency_histogram is None
+            or latency_histogram.count < self.min_calls_before_adapting
+        ):
+            return default_timeout
+        latency = latency_histogram.percentile(self.latency_percentile)
+        assert latency is not None
+        timeout = latency * self.margin_multiplier + self.margin_in_seconds
+        return min(
+            max(timeout, self.min_timeout_in_seconds),
+            self.max_timeout_in_seconds,
+        )
+
+
+class CallOutcome(BaseModel):
+    succeeded: bool
+    duration: float
+    finished_at: float
 
 
 class ModelTracker:
+    _MAX_METRICS_KEPT = 1000
+    _RECENT_CALLS_KEPT = 50
+    _RECENT_CALL_WINDOW_IN_SECONDS = 15 * 60
+    _PROMPT_SIZE_BUCKET_UPPER_EDGES_IN_TOKENS = [1_000, 4_000, 16_000, 64_000]
+    _LATENCY_HALF_LIFE_IN_CALLS = 200
+
     def __init__(self, model: str) -> None:
         self.model = model
         self.gave_cost_tracking_warning = False
+        self.streaming_metrics: deque[StreamingMetrics] = deque(
+            maxlen=self._MAX_METRICS_KEPT
+        )
+        self.latency_histogram = LatencyHistogram(
+            half_life_in_records=self._LATENCY_HALF_LIFE_IN_CALLS
+        )
+        self.latency_histograms_by_prompt_size: dict[int, LatencyHistogram] = (
+            {}
+        )
+        self.hedged_calls = 0
+        self.hedged_calls_won_by_hedge = 0
+        self.recent_calls: deque[CallOutcome] = deque(
+            maxlen=self._RECENT_CALLS_KEPT
+        )
+
+    def record_call(
+        self,
+        succeeded: bool,
+        duration: float,
+        prompt_tokens: int | None = None,
+        timed_out: bool = False,
+    ) -> None:
+        """
+        A call that timed out is recorded in the latency histograms at its
+        duration, a lower bound on how long it would have taken. Leaving it
+        out would hide exactly the slow calls a timeout has to allow for.
+        """
+        self.recent_calls.append(
+            CallOutcome(
+                succeeded=succeeded,
+                duration=duration,
+                finished_at=time.monotonic(),
+            )
+        )
+        if not succeeded and not timed_out:
+            return
+        self.latency_histogram.record(duration)
+        if prompt_tokens is not None:
+            bucket = self.get_prompt_size_bucket(prompt_tokens)
+            latency_histogram = self.latency_histograms_by_prompt_size.get(
+                bucket
+            )
+            if latency_histogram is None:
+                latency_histogram = LatencyHistogram(
+                    half_life_in_records=self._LATENCY_HALF_LIFE_IN_CALLS
+                )
+                self.latency_histograms_by_prompt_size[bucket] = (
+                    latency_histogram
+                )
+            latency_histogram.record(duration)
+
+    @classmethod
+    def get_prompt_size_bucket(cls, prompt_tokens: int) -> int:
+        return bisect.bisect_left(
+            cls._PROMPT_SIZE_BUCKET_UPPER_EDGES_IN_TOKENS, prompt_tokens
+        )
+
+    def get_latency_histogram_for_prompt(
+        self, prompt_tokens: int
+    ) -> LatencyHistogram | None:
+        return self.latency_histograms_by_prompt_size.get(
+            self.get_prompt_size_bucket(prompt_tokens)
+        )
+
+    def get_recent_calls(self) -> list[CallOutcome]:
+        oldest_time_allowed = (
+            time.monotonic() - self._RECENT_CALL_WINDOW_IN_SECONDS
+        )
+        return [
+            call
+            for call in self.recent_calls
+            if call.finished_at >= oldest_time_allowed
+        ]
+
+    def get_recent_error_rate(self) -> float | None:
+        recent_calls = self.get_recent_calls()
+        if not recent_calls:
+            return None
+        failures = [call for call in recent_calls if not call.succeeded]
+        return len(failures) / len(recent_calls)
+
+    def get_recent_latency_percentile(self, percentile: float) -> float | None:
+        durations = sorted(
+            call.duration for call in self.get_recent_calls() if call.succeeded
+        )
+        if not durations:
+            return None
+        index = min(len(durations) - 1, int(len(durations) * percentile / 100))
+        return durations[index]
+
+    def get_consecutive_failures(self) -> int:
+        consecutive_failures = 0
+        for call in reversed(self.recent_calls):
+            if call.succeeded:
+                break
+            consecutive_failures += 1
+        return consecutive_failures
 
 
 class GeneralLlm(
@@ -55,6 +317,11 @@ class GeneralLlm(
     """
 
     _model_trackers: dict[str, ModelTracker] = {}
+    _concurrency_limiters: dict[str, AdaptiveConcurrencyLimiter] = {}
+    _response_formats_rejected: set[tuple[str, str]] = set()
+    _request_coalescer: RequestCoalescer[TextTokenCostResponse] = (
+        RequestCoalescer()
+    )
     _defaults: dict[str, Any] = {
         "gpt-4o": {
             "timeout": 40,
@@ -89,9 +356,32 @@ class GeneralLlm(
         temperature: float | int | None = 0,
         timeout: float | int | None = None,
         pass_through_unknown_kwargs: bool = True,
+        response_cache: LlmResponseCache | None = None,
+        hedge_policy: HedgePolicy | None = None,
+        retry_policy: RetryPolicy | None = None,
+        timeout_policy: TimeoutPolicy | None = None,
         **kwargs,
     ) -> None:
         """
+        If a response_cache is given (or one is active as a context manager),
+        deterministic calls (temperature 0) are served from it when possible.
+        Identical deterministic calls that run at the same time are merged
+        into one call to the model.
+
+        If a hedge_policy is given, slow calls are duplicated to cut tail
+        latency (see HedgePolicy).
+
+        Failed calls are retried according to the retry_policy (see
+        RetryPolicy), up to allowed_tries times.
+
+        Concurrent calls are not limited by default. To have calls to a
+        provider back off when it rate limits or times out, opt in with
+        GeneralLlm.set_concurrency_limiter (see AdaptiveConcurrencyLimiter).
+
+        Unless a fixed timeout is given, each call's timeout adapts to the
+        latency seen for calls of a similar prompt size (see TimeoutPolicy).
+        The static default for the model is used until there is enough data.
+
         Pass in litellm kwargs as needed. Below are the available kwargs as of Feb 13 2025.
 
         # Optional OpenAI params: see https://platform.openai.com/docs/api-reference/chat/create
@@ -131,8 +421,15 @@ class GeneralLlm(
         # Optional liteLLM function params
         **kwargs,
         """
-        super().__init__(allowed_tries=allowed_tries)
+        super().__init__(
+            allowed_tries=allowed_tries, retry_policy=retry_policy
+        )
         self.model = model
+        self.response_cache = response_cache
+        self.hedge_policy = hedge_policy
+        self.timeout_policy = timeout_policy
+        if timeout_policy is None and timeout is None:
+            self.timeout_policy = TimeoutPolicy()
 
         metaculus_prefix = "metaculus/"
         openai_prefix = "openai/"
@@ -197,12 +494,111 @@ class GeneralLlm(
             return 60
         return cls._defaults[matching_keys[0]]["timeout"]
 
+    @classmethod
+    def set_concurrency_limiter(
+        cls, provider: str, limiter: AdaptiveConcurrencyLimiter | None
+    ) -> None:
+        """
+        Caps how many calls to a provider (e.g. "openai", "anthropic",
+        "metaculus") run at once with a limiter shared by all GeneralLlms
+        for it. Concurrency is not limited unless a limiter is set, and
+        None removes it again.
+        """
+        if limiter is None:
+            cls._concurrency_limiters.pop(provider, None)
+        else:
+            cls._concurrency_limiters[provider] = limiter
+
+    def get_concurrency_limiter(self) -> AdaptiveConcurrencyLimiter | None:
+        return self._concurrency_limiters.get(self.get_provider())
+
+    @classmethod
+    def set_rate_limits(
+        cls,
+        provider: str,
+        tokens_per_minute: int | None = None,
+        requests_per_minute: int | None = None,
+        api_key: str | None = None,
+    ) -> None:
+        """
+        Sets the TPM/RPM budget shared by all GeneralLlms that call a provider
+        (e.g. "openai", "anthropic", "metaculus") with the given api_key.
+        Leave api_key as None for models that use the default key from the
+        environment. Pass no limits to remove the budget.
+
+        The budget is kept in the RateLimiterRegistry under
+        "<provider>:tokens" and "<provider>:requests" (plus a hash of the
+        api_key), so it can also be configured there.
+        """
+        for resource, limit_per_minute in [
+            ("tokens", tokens_per_minute),
+            ("requests", requests_per_minute),
+        ]:
+            RateLimiterRegistry.set_limit(
+                RateLimiterRegistry.make_name(provider, resource, api_key),
+                (
+                    RateLimit(limit_per_minute, period_in_seconds=60)
+                    if limit_per_minute is not None
+                    else None
+                ),
+            )
+
+    def get_rate_limiter(self) -> LlmRateLimiter | None:
+        api_key = None
+        if not self._use_metaculus_proxy:
+            api_key = self.litellm_kwargs.get("api_key")
+        provider = self.get_provider()
+        token_limiter = RateLimiterRegistry.get_limiter(
+            RateLimiterRegistry.make_name(provider, "tokens", api_key)
+        )
+        request_limiter = RateLimiterRegistry.get_limiter(
+            RateLimiterRegistry.make_name(provider, "requests", api_key)
+        )
+        if token_limiter is None and request_limiter is None:
+            return None
+        return LlmRateLimiter.from_limiters(token_limiter, request_limiter)
+
+    def get_timeout_for_call(self, prompt_tokens: int) -> float:
+        default_timeout = self.litellm_kwargs["timeout"]
+        if self.timeout_policy is None:
+            return default_timeout
+        return self.timeout_policy.get_timeout(
+            self._get_model_tracker(), prompt_tokens, default_timeout
+        )
+
+    def get_provider(self) -> str:
+        if self._use_metaculus_proxy:
+            return "metaculus"
+        try:
+            _, provider, _, _ = litellm.get_llm_provider(self._litellm_model)
+        except Exception:
+            provider = self._litellm_model.split("/")[0]
+        return provider
+
+    def _get_model_tracker(self) -> ModelTracker:
+        """
+        Trackers are shared by GeneralLlms that call the same model at the
+        same endpoint, so e.g. "gpt-4o" and "metaculus/gpt-4o" keep separate
+        latency and health stats.
+        """
+        tracker_key = self._get_model_tracker_key()
+        model_tracker = self._model_trackers.get(tracker_key)
+        if model_tracker is None:
+            model_tracker = ModelTracker(self._litellm_model)
+            self._model_trackers[tracker_key] = model_tracker
+        return model_tracker
+
+    def _get_model_tracker_key(self) -> str:
+        base_url = self.litellm_kwargs.get(
+            "base_url"
+        ) or self.litellm_kwargs.get("api_base")
+        if base_url is None:
+            return self.model
+        return f"{self.model}@{base_url}"
+
     def _give_cost_tracking_warning_if_needed(self) -> None:
         model = self._litellm_model
-        model_tracker = self._model_trackers.get(model)
-        if model_tracker is None:
-            self._model_trackers[model] = ModelTracker(model)
-        model_tracker = self._model_trackers[model]
+        model_tracker = self._get_model_tracker()
 
         if model_tracker.gave_cost_tracking_warning:
             return
@@ -225,6 +621,209 @@ class GeneralLlm(
         )
         return response.data
 
+    async def invoke_stream(
+        self,
+        prompt: ModelInputType,
+        stop_condition: Callable[[str], bool] | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Yields the text of the response as it is generated.
+
+        If stop_condition is given it is called with all the text generated so
+        far after each chunk. As soon as it returns True the request is
+        cancelled and no more tokens are read (or paid for). For instance
+        `PredictionExtractor.final_probability_is_stated` stops a binary
+        forecast once "Probability: NN%" has been written.
+
+        The cost of the tokens received is charged to the cost managers, and
+        time to first token and time to answer are recorded in the model's
+        StreamingMetrics. Streamed calls are not retried. If a rate limit is
+        set, the estimated tokens taken from it are corrected to the final
+        usage of the stream once it ends (or given back if the call fails).
+        """
+        MonetaryCostManager.raise_error_if_limit_would_be_reached()
+        self._everything_special_to_call_before_direct_call()
+        messages = self.model_input_to_message(prompt)
+        litellm.drop_params = True
+        rate_limiter = self.get_rate_limiter()
+        tokens_acquired = 0
+        if rate_limiter is not None:
+            tokens_acquired = await rate_limiter.wait_till_able_to_send(
+                await TokenCounter.count_message_tokens_async(
+                    self._litellm_model, messages
+                )
+            )
+        start_time = time.time()
+        stream = None
+        chunks: list[Any] = []
+        text_so_far = ""
+        time_to_first_token: float | None = None
+        time_to_answer: float | None = None
+        stopped_early = False
+        stream_was_exhausted = False
+        try:
+            stream = await acompletion(
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **self.litellm_kwargs,
+            )
+            async for chunk in stream:  # type: ignore
+                chunks.append(chunk)
+                new_text = self._get_text_from_stream_chunk(chunk)
+                if not new_text:
+                    continue
+                if time_to_first_token is None:
+                    time_to_first_token = time.time() - start_time
+                text_so_far += new_text
+                answer_found = stop_condition is not None and stop_condition(
+                    text_so_far
+                )
+                if answer_found:
+                    time_to_answer = time.time() - start_time
+                yield new_text
+                if answer_found:
+                    stopped_early = True
+                    break
+            else:
+                stream_was_exhausted = True
+        finally:
+            if stream is not None and not stream_was_exhausted:
+                await self._close_stream(stream)
+            tokens_actually_used = self._track_cost_of_stream(chunks, messages)
+            if rate_limiter is not None:
+                await rate_limiter.reconcile_token_usage(
+                    tokens_acquired, tokens_actually_used
+                )
+            self._record_streaming_metrics(
+                StreamingMetrics(
+                    model=self.model,
+                    time_to_first_token=time_to_first_token,
+                    time_to_answer=time_to_answer,
+                    total_time=time.time() - start_time,
+                    stopped_early=stopped_early,
+                )
+            )
+
+    async def invoke_with_early_stop(
+        self, prompt: ModelInputType, stop_condition: Callable[[str], bool]
+    ) -> str:
+        """
+        Streams the response and returns the text generated up to the point
+        stop_condition was satisfied (or the full response if it never was)
+        """
+        text = ""
+        async for new_text in self.invoke_stream(prompt, stop_condition):
+            text += new_text
+        return text
+
+    def get_streaming_metrics(self) -> list[StreamingMetrics]:
+        return list(self._get_model_tracker().streaming_metrics)
+
+    @staticmethod
+    def _get_text_from_stream_chunk(chunk: Any) -> str:
+        choices = getattr(chunk, "choices", None)
+        if not choices:
+            return ""
+        delta = getattr(choices[0], "delta", None)
+        content = getattr(delta, "content", None)
+        return content or ""
+
+    @staticmethod
+    async def _close_stream(stream: Any) -> None:
+        underlying_stream = getattr(stream, "completion_stream", stream)
+        close_function = getattr(underlying_stream, "aclose", None) or getattr(
+            underlying_stream, "close", None
+        )
+        if close_function is None:
+            return
+        try:
+            close_result = close_function()
+            if inspect.isawaitable(close_result):
+                await close_result
+        except Exception as e:
+            logger.debug(f"Could not close stream: {e}")
+
+    def _track_cost_of_stream(
+        self, chunks: list[Any], messages: list[dict[str, str]]
+    ) -> int:
+        """
+        Charges the cost of the streamed chunks and returns the total tokens
+        they used (0 if nothing was received or the usage is unknown).
+        """
+        if not chunks:
+            return 0
+        total_tokens = 0
+        try:
+            full_response = litellm.stream_chunk_builder(
+                chunks, messages=messages
+            )
+            usage = getattr(full_response, "usage", None)
+            if isinstance(usage, Usage):
+                total_tokens = usage.total_tokens
+            cost = litellm.completion_cost(completion_response=full_response)
+        except Exception as e:
+            logger.warning(
+                f"Could not calculate cost of streamed response for model {self.model}: {e}"
+            )
+            cost = 0
+        cost += self.calculate_per_request_cost(self.model)
+        MonetaryCostManager.increase_current_usage_in_parent_managers(cost)
+        return total_tokens
+
+    def _record_streaming_metrics(self, metrics: StreamingMetrics) -> None:
+        logger.debug(f"Streaming metrics: {metrics}")
+        self._get_model_tracker().streaming_metrics.append(metrics)
+
+    async def invoke_and_return_multiple_samples(
+        self, prompt: ModelInputType, number_of_samples: int
+    ) -> list[str]:
+        """
+        Returns number_of_samples completions for the same prompt.
+        If the provider supports `n`, all samples are requested in one call
+        (the prompt is only sent and paid for once). Otherwise the samples
+        are requested with concurrent calls.
+        """
+        if number_of_samples < 1:
+            raise ValueError("number_of_samples must be at least 1")
+        if (
+            number_of_samples == 1
+            or not self.model_supports_multiple_samples()
+        ):
+            return await self._invoke_concurrently(prompt, number_of_samples)
+
+        response: MultipleTextTokenCostResponse = (
+            await self._invoke_samples_with_cost_limits_and_retry(
+                prompt, number_of_samples
+            )
+        )
+        samples = response.data[:number_of_samples]
+        missing_samples = number_of_samples - len(samples)
+        if missing_samples > 0:
+            logger.warning(
+                f"Model {self.model} returned {len(samples)} of {number_of_samples} samples. Requesting the rest individually"
+            )
+            samples += await self._invoke_concurrently(prompt, missing_samples)
+        return samples
+
+    def model_supports_multiple_samples(self) -> bool:
+        try:
+            supported_params = litellm.get_supported_openai_params(
+                model=self._litellm_model
+            )
+        except Exception:
+            return False
+        return supported_params is not None and "n" in supported_params
+
+    async def _invoke_concurrently(
+        self, prompt: ModelInputType, number_of_calls: int
+    ) -> list[str]:
+        return list(
+            await asyncio.gather(
+                *[self.invoke(prompt) for _ in range(number_of_calls)]
+            )
+        )
+
     @RetryableModel._retry_according_to_model_allowed_tries
     async def _invoke_with_request_cost_time_and_token_limits_and_retry(
         self, *args, **kwargs
@@ -240,33 +839,284 @@ class GeneralLlm(
             else direct_call_response
         )
         logger.debug(f"Model responded with: {response_to_log}...")
-        cost = direct_call_response.cost
-        MonetaryCostManager.increase_current_usage_in_parent_managers(cost)
+        self._track_cost_of_response(direct_call_response)
         return direct_call_response
 
+    @RetryableModel._retry_according_to_model_allowed_tries
+    async def _invoke_samples_with_cost_limits_and_retry(
+        self, prompt: ModelInputType, number_of_samples: int
+    ) -> MultipleTextTokenCostResponse:
+        MonetaryCostManager.raise_error_if_limit_would_be_reached()
+        response = await self._mockable_direct_call_to_model_for_samples(
+            prompt, number_of_samples
+        )
+        self._track_cost_of_response(response)
+        return response
+
+    @staticmethod
+    def _track_cost_of_response(
+        response: TextTokenCostResponse | MultipleTextTokenCostResponse,
+    ) -> None:
+        if not response.is_cached_response:
+            MonetaryCostManager.increase_current_usage_in_parent_managers(
+                response.cost
+            )
+
     async def _mockable_direct_call_to_model(
         self, prompt: ModelInputType
     ) -> TextTokenCostResponse:
         self._everything_special_to_call_before_direct_call()
         assert self._litellm_model is not None
-        litellm.drop_params = True
+        messages = self.model_input_to_message(prompt)
+        if not self._call_is_deterministic():
+            return await self._call_litellm_with_hedging(messages)
+
+        request_key = LlmResponseCache.make_key(self.litellm_kwargs, messages)
+        response_cache = self._get_response_cache()
+        if response_cache is not None:
+            cached_response = response_cache.get(request_key)
+            if cached_response is not None:
+                return cached_response
+
+        response, response_was_shared = await self._request_coalescer.run(
+            request_key, lambda: self._call_litellm_with_hedging(messages)
+        )
+        if response_was_shared:
+            return response.model_copy(update={"is_cached_response": True})
+        if response_cache is not None:
+            response_cache.set(request_key, response)
+        return response
+
+    def _get_response_cache(self) -> LlmResponseCache | None:
+        if self.response_cache is not None:
+            return self.response_cache
+        return LlmResponseCache.get_active_cache()
+
+    def _call_is_deterministic(self) -> bool:
+        return self.litellm_kwargs.get("temperature") == 0
+
+    async def _mockable_direct_call_to_model_for_samples(
+        self, prompt: ModelInputType, number_of_samples: int
+    ) -> MultipleTextTokenCostResponse:
+        self._everything_special_to_call_before_direct_call()
+        messages = self.model_input_to_message(prompt)
+        return await self._call_litellm_for_samples(
+            messages, number_of_samples
+        )
+
+    async def _call_litellm_with_hedging(
+        self, messages: list[dict[str, str]]
+    ) -> TextTokenCostResponse:
+        hedge_delay = self._get_hedge_delay()
+        if hedge_delay is None:
+            return await self._call_litellm(messages)
+        assert self.hedge_policy is not None
+
+        primary_call = asyncio.ensure_future(self._call_litellm(messages))
+        calls = [primary_call]
+        try:
+            done, _ = await asyncio.wait({primary_call}, timeout=hedge_delay)
+            if done:
+                return primary_call.result()
+
+            hedge_llm = self.hedge_policy.fallback_llm or self
+            logger.info(
+                f"Call to {self.model} took longer than {hedge_delay:.1f}s, "
+                f"sending hedged call to {hedge_llm.model}"
+            )
+            hedge_llm._everything_special_to_call_before_direct_call()
+            hedge_call = asyncio.ensure_future(
+                hedge_llm._call_litellm(messages)
+            )
+            calls.append(hedge_call)
+            model_tracker = self._get_model_tracker()
+            model_tracker.hedged_calls += 1
+            winner = await self._first_successful_call(calls)
+        finally:
+            for call in calls:
+                if not call.done():
+                    call.cancel()
+        loser = hedge_call if winner is primary_call else primary_call
+        if winner is hedge_call:
+            model_tracker.hedged_calls_won_by_hedge += 1
+        loser_llm = hedge_llm if loser is hedge_call else self
+        self._charge_cost_of_hedging_loser(loser, loser_llm, messages)
+        return winner.result()
+
+    def _get_hedge_delay(self) -> float | None:
+        if self.hedge_policy is None or self._get_batch_executor() is not None:
+            return None
+        latency_histogram = self._get_model_tracker().latency_histogram
+        if (
+            latency_histogram.count
+            < self.hedge_policy.min_calls_before_hedging
+        ):
+            return None
+        latency_percentile = latency_histogram.percentile(
+            self.hedge_policy.latency_percentile
+        )
+        assert latency_percentile is not None
+        return max(
+            latency_percentile, self.hedge_policy.min_hedge_delay_in_seconds
+        )
+
+    @staticmethod
+    async def _first_successful_call(
+        calls: list[asyncio.Future[TextTokenCostResponse]],
+    ) -> asyncio.Future[TextTokenCostResponse]:
+        pending = set(calls)
+        while True:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            successful_calls = [
+                call
+                for call in calls
+                if call in done and call.exception() is None
+            ]
+            if successful_calls:
+                return successful_calls[0]
+            if not pending:
+                raise calls[0].exception()  # type: ignore
 
-        response = await acompletion(
-            messages=self.model_input_to_message(prompt),
-            **self.litellm_kwargs,
-        )
-        assert isinstance(response, ModelResponse)
-        choices = response.choices
-        choices = typeguard.check_type(choices, list[Choices])
-        answer = choices[0].message.content
-        assert isinstance(
-            answer, str
-        ), f"Answer is not a string and is of type: {type(answer)}. Answer: {answer}"
-        usage = response.usage  # type: ignore
-        assert isinstance(usage, Usage)
-        prompt_tokens = usage.prompt_tokens
-        completion_tokens = usage.completion_tokens
-        total_tokens = usage.total_tokens
+    @staticmethod
+    def _charge_cost_of_hedging_loser(
+        loser: asyncio.Future[TextTokenCostResponse],
+        loser_llm: GeneralLlm,
+        messages: list[dict[str, str]],
+    ) -> None:
+        """
+        A finished loser is charged its real cost. A cancelled loser is
+        charged for its prompt, since providers may bill for input tokens of
+        requests that were cut off.
+        """
+        if (
+            loser.done()
+            and not loser.cancelled()
+            and loser.exception() is None
+        ):
+            cost = loser.result().cost
+        else:
+            try:
+                prompt_tokens = TokenCounter.approximate_tokens(messages)
+                cost = loser_llm.calculate_cost_from_tokens(prompt_tokens, 0)
+            except Exception as e:
+                logger.warning(
+                    f"Could not estimate cost of cancelled hedged call to {loser_llm.model}: {e}"
+                )
+                cost = 0
+        MonetaryCostManager.increase_current_usage_in_parent_managers(cost)
+
+    async def _call_litellm(
+        self, messages: list[dict[str, str]]
+    ) -> TextTokenCostResponse:
+        response = await self._call_litellm_for_samples(messages, 1)
+        return TextTokenCostResponse(
+            data=response.data[0],
+            prompt_tokens_used=response.prompt_tokens_used,
+            completion_tokens_used=response.completion_tokens_used,
+            total_tokens_used=response.total_tokens_used,
+            cached_prompt_tokens_used=response.cached_prompt_tokens_used,
+            model=response.model,
+            cost=response.cost,
+        )
+
+    async def _call_litellm_for_samples(
+        self, messages: list[dict[str, str]], number_of_samples: int
+    ) -> MultipleTextTokenCostResponse:
+        cassette_request = {
+            "model": self.model,
+            "kwargs": {
+                key: value
+                for key, value in self.litellm_kwargs.items()
+                if key not in LlmResponseCache.KWARGS_EXCLUDED_FROM_KEY
+            },
+            "messages": messages,
+            "number_of_samples": number_of_samples,
+        }
+        return await Cassette.record_or_replay_async(
+            "general_llm",
+            cassette_request,
+            lambda: self._call_provider_for_samples(
+                messages, number_of_samples
+            ),
+            MultipleTextTokenCostResponse,
+        )
+
+    async def _call_provider_for_samples(
+        self, messages: list[dict[str, str]], number_of_samples: int
+    ) -> MultipleTextTokenCostResponse:
+        assert self._litellm_model is not None
+        litellm.drop_params = True
+        litellm_kwargs = self.litellm_kwargs
+        if number_of_samples > 1:
+            litellm_kwargs = {**litellm_kwargs, "n": number_of_samples}
+        batch_executor = self._get_batch_executor()
+        if batch_executor is not None:
+            return await self._call_batch_api_for_samples(
+                batch_executor, messages, litellm_kwargs
+            )
+        prompt_tokens = TokenCounter.approximate_tokens(messages)
+        timeout = self.get_timeout_for_call(prompt_tokens)
+        litellm_kwargs = {**litellm_kwargs, "timeout": timeout}
+        rate_limiter = self.get_rate_limiter()
+        tokens_acquired = 0
+        if rate_limiter is not None:
+            tokens_acquired = await rate_limiter.wait_till_able_to_send(
+                prompt_tokens
+            )
+        tokens_actually_used = 0
+        try:
+            model_tracker = self._get_model_tracker()
+            concurrency_limiter = self.get_concurrency_limiter()
+            async with (
+                concurrency_limiter.limit_concurrency()
+                if concurrency_limiter is not None
+                else contextlib.nullcontext()
+            ):
+                call_start_time = time.monotonic()
+                try:
+                    response = await acompletion(
+                        messages=messages,
+                        **litellm_kwargs,
+                    )
+                except Exception as e:
+                    timed_out = isinstance(e, RetryPolicy.TIMEOUT_ERROR_TYPES)
+                    duration = time.monotonic() - call_start_time
+                    model_tracker.record_call(
+                        succeeded=False,
+                        duration=(
+                            max(duration, timeout) if timed_out else duration
+                        ),
+                        prompt_tokens=prompt_tokens,
+                        timed_out=timed_out,
+                    )
+                    raise
+                model_tracker.record_call(
+                    succeeded=True,
+                    duration=time.monotonic() - call_start_time,
+                    prompt_tokens=prompt_tokens,
+                )
+            assert isinstance(response, ModelResponse)
+            choices = response.choices
+            choices = typeguard.check_type(choices, list[Choices])
+            answers = [choice.message.content for choice in choices]
+            for answer in answers:
+                assert isinstance(
+                    answer, str
+                ), f"Answer is not a string and is of type: {type(answer)}. Answer: {answer}"
+            usage = response.usage  # type: ignore
+            assert isinstance(usage, Usage)
+            prompt_tokens = usage.prompt_tokens
+            completion_tokens = usage.completion_tokens
+            total_tokens = usage.total_tokens
+            cached_prompt_tokens = self._get_cached_prompt_tokens(usage)
+            tokens_actually_used = total_tokens
+        finally:
+            if rate_limiter is not None:
+                await rate_limiter.reconcile_token_usage(
+                    tokens_acquired, tokens_actually_used
+                )
 
         cost = response._hidden_params.get(
             "response_cost"
@@ -276,15 +1126,80 @@ class GeneralLlm(
 
         cost += self.calculate_per_request_cost(self.model)
 
-        return TextTokenCostResponse(
-            data=answer,
+        return MultipleTextTokenCostResponse(
+            data=answers,  # type: ignore <- checked by the assert above
             prompt_tokens_used=prompt_tokens,
             completion_tokens_used=completion_tokens,
             total_tokens_used=total_tokens,
+            cached_prompt_tokens_used=cached_prompt_tokens,
+            model=self.model,
+            cost=cost,
+        )
+
+    def _get_batch_executor(self) -> LlmBatchExecutor | None:
+        batch_executor = LlmBatchExecutor.get_active_executor()
+        if batch_executor is None or not batch_executor.can_batch(
+            self.get_provider(), self.litellm_kwargs
+        ):
+            return None
+        return batch_executor
+
+    async def _call_batch_api_for_samples(
+        self,
+        batch_executor: LlmBatchExecutor,
+        messages: list[dict[str, str]],
+        litellm_kwargs: dict[str, Any],
+    ) -> MultipleTextTokenCostResponse:
+        """
+        Batch calls skip the rate and concurrency limiters and are not
+        recorded in the model tracker, since their latency is the batch's.
+        """
+        body = await batch_executor.run(litellm_kwargs, messages)
+        answers = [choice["message"]["content"] for choice in body["choices"]]
+        for answer in answers:
+            assert isinstance(
+                answer, str
+            ), f"Answer is not a string and is of type: {type(answer)}. Answer: {answer}"
+        usage = body.get("usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        prompt_tokens_details = usage.get("prompt_tokens_details") or {}
+        try:
+            cost = (
+                self.calculate_cost_from_tokens(
+                    prompt_tokens, completion_tokens, calculate_full_cost=False
+                )
+                * batch_executor.BATCH_COST_MULTIPLIER
+            )
+        except ValueError:
+            cost = 0
+        cost += self.calculate_per_request_cost(self.model)
+        return MultipleTextTokenCostResponse(
+            data=answers,
+            prompt_tokens_used=prompt_tokens,
+            completion_tokens_used=completion_tokens,
+            total_tokens_used=usage.get(
+                "total_tokens", prompt_tokens + completion_tokens
+            ),
+            cached_prompt_tokens_used=prompt_tokens_details.get(
+                "cached_tokens"
+            )
+            or 0,
             model=self.model,
             cost=cost,
         )
 
+    @staticmethod
+    def _get_cached_prompt_tokens(usage: Usage) -> int:
+        prompt_tokens_details = getattr(usage, "prompt_tokens_details", None)
+        openai_cached_tokens = (
+            getattr(prompt_tokens_details, "cached_tokens", None) or 0
+        )
+        anthropic_cached_tokens = (
+            getattr(usage, "cache_read_input_tokens", None) or 0
+        )
+        return max(openai_cached_tokens, anthropic_cached_tokens)
+
     def model_input_to_message(
         self, user_input: ModelInputType, system_prompt: str | None = None
     ) -> list[dict[str, str]]:
@@ -308,6 +1223,11 @@ class GeneralLlm(
                 ]
             else:
                 messages = [user_message]
+        elif isinstance(user_input, CacheablePrompt):
+            messages = self._cacheable_prompt_to_messages(
+                user_input, system_prompt
+            )
+            return messages
         elif isinstance(user_input, VisionMessageData):
             if system_prompt is not None:
                 messages = (
@@ -325,6 +1245,71 @@ class GeneralLlm(
         messages = typeguard.check_type(messages, list[dict[str, str]])
         return messages
 
+    def supports_explicit_prompt_caching(self) -> bool:
+        return "claude" in self._litellm_model
+
+    def supports_structured_output(self) -> bool:
+        try:
+            return litellm.supports_response_schema(model=self._litellm_model)
+        except Exception:
+            return False
+
+    async def _invoke_with_response_format(
+        self, input: ModelInputType, response_format: dict
+    ) -> str:
+        """
+        Falls back to a plain invoke if the provider rejects the schema (e.g.
+        strict mode does not allow free-form dict fields). Rejected schemas
+        are remembered so later calls skip straight to the fallback.
+        """
+        schema_name = response_format.get("json_schema", {}).get("name", "")
+        rejection_key = (self._litellm_model, schema_name)
+        if rejection_key in self._response_formats_rejected:
+            return await self.invoke(input)
+        try:
+            return await self.with_litellm_kwargs(
+                response_format=response_format
+            ).invoke(input)
+        except litellm.BadRequestError as e:
+            logger.warning(
+                f"{self.model} rejected the response format for {schema_name}, "
+                f"falling back to parsing free text: {e}"
+            )
+            self._response_formats_rejected.add(rejection_key)
+            return await self.invoke(input)
+
+    def with_litellm_kwargs(self, **litellm_kwargs: Any) -> GeneralLlm:
+        """
+        Returns a copy of this model that sends extra litellm kwargs
+        """
+        llm_copy = copy.copy(self)
+        llm_copy.litellm_kwargs = {**self.litellm_kwargs, **litellm_kwargs}
+        return llm_copy
+
+    def _cacheable_prompt_to_messages(
+        self, prompt: CacheablePrompt, system_prompt: str | None
+    ) -> list[dict[str, Any]]:
+        messages: list[dict[str, Any]] = []
+        if system_prompt is not None:
+            messages.append({"role": "system", "content": system_prompt})
+        if not self.supports_explicit_prompt_caching():
+            messages.append({"role": "user", "content": prompt.to_text()})
+            return messages
+        messages.append(
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt.stable_prefix,
+                        "cache_control": {"type": "ephemeral"},
+                    },
+                    {"type": "text", "text": prompt.variable_suffix},
+                ],
+            }
+        )
+        return messages
+
     ################################## Methods For Mocking/Testing ##################################
 
     def _get_mock_return_for_direct_call_to_model_using_cheap_input(
@@ -360,13 +1345,17 @@ class GeneralLlm(
     ############################# Cost and Token Tracking Methods #############################
 
     def input_to_tokens(self, prompt: ModelInputType) -> int:
-        return token_counter(
-            model=self._litellm_model,
-            messages=self.model_input_to_message(prompt),
+        return TokenCounter.count_message_tokens(
+            self._litellm_model, self.model_input_to_message(prompt)
         )
 
     def text_to_tokens_direct(self, text: str) -> int:
-        return token_counter(model=self._litellm_model, text=text)
+        return TokenCounter.count_text_tokens(self._litellm_model, text)
+
+    def input_to_approximate_tokens(self, prompt: ModelInputType) -> int:
+        return TokenCounter.approximate_tokens(
+            self.model_input_to_message(prompt)
+        )
 
     def calculate_cost_from_tokens(
         self,
@@ -5,7 +5,8 @@ import re
 from abc import ABC
 from typing import Any, TypeVar, get_args, get_origin
 
-from pydantic import BaseModel
+from litellm.utils import type_to_response_format_param
+from pydantic import BaseModel, create_model
 
 from forecasting_tools.ai_models.ai_utils.ai_misc import (
     strip_code_block_markdown,
@@ -31,6 +32,11 @@ class OutputsText(AiModel, ABC):
         Input should ask for the type of resulting object you want with no other words around it
         Retries if an invalid format is given
 
+        If the type is a Pydantic model or list of models and the model supports
+        structured output, its JSON schema is sent to the provider as the response
+        format so the output is guaranteed to parse. Otherwise the JSON is parsed out of
+        the free text response.
+
         ## Handles
         - normal types (e.g. str, int, list, dict, bool, union)
         - complex types (e.g. list[str], dict[str, int], list[tuple[dict,int]], etc.)
@@ -92,10 +98,81 @@ class OutputsText(AiModel, ABC):
             false_keyword,
         )
 
+    def supports_structured_output(self) -> bool:
+        return False
+
+    async def _invoke_with_response_format(
+        self, input: Any, response_format: dict
+    ) -> str:
+        raise NotImplementedError(
+            f"{self.__class__.__name__} does not support structured output"
+        )
+
+    @classmethod
+    def make_response_format_for_type(
+        cls, normal_complex_or_pydantic_type: type
+    ) -> dict | None:
+        """
+        Returns a json_schema response format for a Pydantic model or a list of
+        models, or None for other types. Lists are wrapped in an object with an
+        "items" field since providers require the root of the schema to be an object.
+        """
+        pydantic_type = cls.__get_pydantic_type(
+            normal_complex_or_pydantic_type
+        )
+        if pydantic_type is None:
+            return None
+        if get_origin(normal_complex_or_pydantic_type) == list:
+            pydantic_type = create_model(
+                f"ListOf{pydantic_type.__name__}",
+                items=(list[pydantic_type], ...),  # type: ignore
+            )
+        return type_to_response_format_param(pydantic_type)
+
+    @staticmethod
+    def __get_pydantic_type(
+        normal_complex_or_pydantic_type: type,
+    ) -> type[BaseModel] | None:
+        if get_origin(normal_complex_or_pydantic_type) == list:
+            inner_types = get_args(normal_complex_or_pydantic_type)
+            candidate_type = inner_types[0] if inner_types else None
+        else:
+            candidate_type = normal_complex_or_pydantic_type
+        try:
+            if isinstance(candidate_type, type) and issubclass(
+                candidate_type, BaseModel
+            ):
+                return candidate_type
+        except TypeError:
+            pass
+        return None
+
+    @staticmethod
+    def __unwrap_structured_list(response: str) -> str:
+        try:
+            response_json = json.loads(response)
+        except json.JSONDecodeError:
+            return response
+        if isinstance(response_json, dict) and set(response_json) == {"items"}:
+            return json.dumps(response_json["items"])
+        return response
+
     async def __invoke_and_transform_to_type(
         self, input: Any, normal_complex_or_pydantic_type: type[T]
     ) -> T:
-        response: str = await self.invoke(input)
+        response_format = None
+        if self.supports_structured_output():
+            response_format = self.make_response_format_for_type(
+                normal_complex_or_pydantic_type
+            )
+        if response_format is None:
+            response: str = await self.invoke(input)
+        else:
+            response = await self._invoke_with_response_format(
+                input, response_format
+            )
+            if get_origin(normal_complex_or_pydantic_type) == list:
+                response = self.__unwrap_structured_list(response.strip())
         cleaned_response = strip_code_block_markdown(response.strip())
         try:
             transformed_response = self.transform_response_to_type(
@@ -6,8 +6,10 @@ from abc import ABC
 from typing import Any, Callable, Coroutine, TypeVar
 
 from forecasting_tools.ai_models.model_interfaces.ai_model import AiModel
-from forecasting_tools.ai_models.resource_managers.refreshing_bucket_rate_limiter import (
-    RefreshingBucketRateLimiter,
+from forecasting_tools.ai_models.resource_managers.rate_limiter_registry import (
+    NamedRateLimiter,
+    RateLimit,
+    RateLimiterRegistry,
 )
 
 logger = logging.getLogger(__name__)
@@ -20,7 +22,9 @@ class RequestLimitedModel(AiModel, ABC):
     # For more thoughts on abstract class properties see https://stackoverflow.com/questions/45248243/most-pythonic-way-to-declare-an-abstract-class-property
     REQUESTS_PER_PERIOD_LIMIT: int = NotImplemented
     REQUEST_PERIOD_IN_SECONDS: int = NotImplemented
-    _request_limiter: RefreshingBucketRateLimiter = NotImplemented
+    # Limiters are looked up by name in the RateLimiterRegistry. The name
+    # uses this provider, or the class name if it isn't set
+    RATE_LIMIT_PROVIDER: str | None = None
 
     def __init_subclass__(cls: type[RequestLimitedModel], **kwargs) -> None:
         super().__init_subclass__(**kwargs)
@@ -38,11 +42,24 @@ class RequestLimitedModel(AiModel, ABC):
 
     @classmethod
     def _reinitialize_request_rate_limiter(cls) -> None:
-        cls._request_limiter = NotImplemented
-        cls._request_limiter = RefreshingBucketRateLimiter(
-            cls.REQUESTS_PER_PERIOD_LIMIT,
-            cls.REQUESTS_PER_PERIOD_LIMIT / cls.REQUEST_PERIOD_IN_SECONDS,
+        RateLimiterRegistry.remove_limiter(cls._get_request_limiter_name())
+
+    @classmethod
+    def _get_request_limiter_name(cls) -> str:
+        return RateLimiterRegistry.make_name(
+            cls.RATE_LIMIT_PROVIDER or cls.__name__, "requests"
+        )
+
+    @classmethod
+    def _get_request_limiter(cls) -> NamedRateLimiter:
+        limiter = RateLimiterRegistry.get_limiter(
+            cls._get_request_limiter_name(),
+            default_limit=RateLimit(
+                cls.REQUESTS_PER_PERIOD_LIMIT, cls.REQUEST_PERIOD_IN_SECONDS
+            ),
         )
+        assert limiter is not None
+        return limiter
 
     @staticmethod
     def _wait_till_request_capacity_available(
@@ -51,7 +68,7 @@ class RequestLimitedModel(AiModel, ABC):
         @functools.wraps(func)
         async def wrapper(self: RequestLimitedModel, *args, **kwargs) -> T:
             number_of_requests_being_made = 1
-            await self._request_limiter.wait_till_able_to_acquire_resources(
+            await self._get_request_limiter().wait_till_able_to_acquire_resources(
                 number_of_requests_being_made
             )
             result = await func(self, *args, **kwargs)
@@ -9,18 +9,23 @@ from forecasting_tools.ai_models.model_interfaces.ai_model import AiModel
 logger = logging.getLogger(__name__)
 import functools
 
-from tenacity import retry, stop_after_attempt, wait_random_exponential
+from forecasting_tools.ai_models.ai_utils.retry_policy import RetryPolicy
 
 T = TypeVar("T")
 
 
 class RetryableModel(AiModel, ABC):
     _DEFAULT_ALLOWED_TRIES: int = 2
+    _default_retry_policy: RetryPolicy = RetryPolicy()
 
     def __init__(
-        self, allowed_tries: int = _DEFAULT_ALLOWED_TRIES, **kwargs
+        self,
+        allowed_tries: int = _DEFAULT_ALLOWED_TRIES,
+        retry_policy: RetryPolicy | None = None,
+        **kwargs,
     ) -> None:
         super().__init__(**kwargs)
+        self.retry_policy = retry_policy or self._default_retry_policy
         if isinstance(allowed_tries, int) and allowed_tries > 0:
             self.allowed_tries = allowed_tries
         else:
@@ -48,19 +53,8 @@ class RetryableModel(AiModel, ABC):
         async def wrapper_with_access_to_self_variable(
             self: RetryableModel, *args, **kwargs
         ) -> T:
-            @retry(
-                wait=wait_random_exponential(
-                    exp_base=2, multiplier=10, min=5, max=60
-                ),  # Waits random number between 0 and exp_base^current_attempt * multiplier (with min and max override as needed)
-                reraise=True,
-                stop=stop_after_attempt(self.allowed_tries),
+            return await self.retry_policy.run(
+                lambda: func(self, *args, **kwargs), self.allowed_tries
             )
-            async def wrapper_with_action(
-                self: RetryableModel, *args, **kwargs
-            ) -> T:
-                result = await func(self, *args, **kwargs)
-                return result
-
-            return await wrapper_with_action(self, *args, **kwargs)
 
         return wrapper_with_access_to_self_variable
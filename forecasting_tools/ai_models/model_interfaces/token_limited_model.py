@@ -6,12 +6,19 @@ from abc import ABC
 from forecasting_tools.ai_models.model_interfaces.ai_model import AiModel
 
 logger = logging.getLogger(__name__)
+import asyncio
 import functools
 from typing import Any, Callable, Coroutine, TypeVar
 
+from forecasting_tools.ai_models.ai_utils.openai_utils import VisionMessageData
 from forecasting_tools.ai_models.model_interfaces.tokens_are_calculatable import (
     TokensAreCalculatable,
 )
+from forecasting_tools.ai_models.resource_managers.rate_limiter_registry import (
+    NamedRateLimiter,
+    RateLimit,
+    RateLimiterRegistry,
+)
 from forecasting_tools.ai_models.resource_managers.refreshing_bucket_rate_limiter import (
     RefreshingBucketRateLimiter,
 )
@@ -22,7 +29,9 @@ T = TypeVar("T")
 class TokenLimitedModel(AiModel, TokensAreCalculatable, ABC):
     TOKENS_PER_PERIOD_LIMIT: int = NotImplemented
     TOKEN_PERIOD_IN_SECONDS: int = NotImplemented
-    _token_limiter: RefreshingBucketRateLimiter = NotImplemented
+    # Limiters are looked up by name in the RateLimiterRegistry. The name
+    # uses this provider, or the class name if it isn't set
+    RATE_LIMIT_PROVIDER: str | None = None
 
     def __init_subclass__(cls: type[TokenLimitedModel], **kwargs) -> None:
         super().__init_subclass__(**kwargs)
@@ -40,20 +49,42 @@ class TokenLimitedModel(AiModel, TokensAreCalculatable, ABC):
 
     @classmethod
     def _reinitialize_token_limiter(cls) -> None:
-        cls._token_limiter = NotImplemented
-        cls._token_limiter = RefreshingBucketRateLimiter(
-            cls.TOKENS_PER_PERIOD_LIMIT,
-            cls.TOKENS_PER_PERIOD_LIMIT / cls.TOKEN_PERIOD_IN_SECONDS,
+        RateLimiterRegistry.remove_limiter(cls._get_token_limiter_name())
+
+    @classmethod
+    def _get_token_limiter_name(cls) -> str:
+        return RateLimiterRegistry.make_name(
+            cls.RATE_LIMIT_PROVIDER or cls.__name__, "tokens"
         )
 
+    @classmethod
+    def _get_token_limiter(cls) -> NamedRateLimiter:
+        limiter = RateLimiterRegistry.get_limiter(
+            cls._get_token_limiter_name(),
+            default_limit=RateLimit(
+                cls.TOKENS_PER_PERIOD_LIMIT, cls.TOKEN_PERIOD_IN_SECONDS
+            ),
+        )
+        assert limiter is not None
+        return limiter
+
     @staticmethod
     def _wait_till_token_capacity_available(
         func: Callable[..., Coroutine[Any, Any, T]]
     ) -> Callable[..., Coroutine[Any, Any, T]]:
         @functools.wraps(func)
         async def wrapper(self: TokenLimitedModel, *args, **kwargs) -> T:
-            tokens_of_prompt = self.input_to_tokens(*args, **kwargs)
-            await self._token_limiter.wait_till_able_to_acquire_resources(
+            if any(
+                isinstance(arg, VisionMessageData)
+                for arg in [*args, *kwargs.values()]
+            ):
+                # Counting image tokens can download the image
+                tokens_of_prompt = await asyncio.to_thread(
+                    self.input_to_tokens, *args, **kwargs
+                )
+            else:
+                tokens_of_prompt = self.input_to_tokens(*args, **kwargs)
+            await self._get_token_limiter().wait_till_able_to_acquire_resources(
                 tokens_of_prompt
             )
             result = await func(self, *args, **kwargs)
@@ -67,6 +98,9 @@ class TokenLimitedModel(AiModel, TokensAreCalculatable, ABC):
         NOTE: This method is only for testing purposes.
         """
         absurdly_large_capacity = 100000000
-        cls._token_limiter = RefreshingBucketRateLimiter(
-            absurdly_large_capacity, absurdly_large_capacity / 1
+        RateLimiterRegistry.set_limiter(
+            cls._get_token_limiter_name(),
+            RefreshingBucketRateLimiter(
+                absurdly_large_capacity, absurdly_large_capacity / 1
+            ),
         )
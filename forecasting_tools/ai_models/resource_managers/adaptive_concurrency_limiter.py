@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import litellm
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits how many calls can run at once, and adapts the limit using
+    AIMD (additive increase, multiplicative decrease) like TCP congestion
+    control.
+    - Each call that succeeds (and is not slower than `slow_call_threshold_in_seconds`)
+    raises the limit by `additive_increase / limit`, so the limit grows by
+    about `additive_increase` every time a full limit's worth of calls succeed.
+    - A call that is rate limited (429) or times out multiplies the limit by
+    `multiplicative_decrease`. Only calls that started after the last decrease
+    can cause another one, so a burst of failures from the same congested
+    window only cuts the limit once.
+    - The limit always stays between `min_limit` and `max_limit`.
+
+    ```
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=32)
+    async with limiter.limit_concurrency():
+        await call_provider()
+    ```
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 64,
+        additive_increase: float = 1,
+        multiplicative_decrease: float = 0.5,
+        slow_call_threshold_in_seconds: float | None = None,
+    ) -> None:
+        if min_limit < 1:
+            raise ValueError("min_limit must be at least 1")
+        if max_limit < min_limit:
+            raise ValueError("max_limit must not be less than min_limit")
+        if not min_limit <= initial_limit <= max_limit:
+            raise ValueError(
+                "initial_limit must be between min_limit and max_limit"
+            )
+        if additive_increase <= 0:
+            raise ValueError("additive_increase must be greater than 0")
+        if not 0 < multiplicative_decrease < 1:
+            raise ValueError("multiplicative_decrease must be between 0 and 1")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.slow_call_threshold_in_seconds = slow_call_threshold_in_seconds
+        self._limit = float(initial_limit)
+        self._calls_in_flight = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._time_of_last_decrease = float("-inf")
+        self.number_of_decreases = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def calls_in_flight(self) -> int:
+        return self._calls_in_flight
+
+    @asynccontextmanager
+    async def limit_concurrency(self) -> AsyncIterator[None]:
+        """
+        Waits for a free slot, runs the block, then adjusts the limit based
+        on how the block went. Errors are re-raised.
+        """
+        await self._acquire()
+        start_time = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            if self.is_congestion_error(e):
+                self._record_congestion(start_time)
+            self._release()
+            raise
+        self._record_success(time.monotonic() - start_time)
+        self._release()
+
+    @staticmethod
+    def is_congestion_error(error: BaseException) -> bool:
+        if isinstance(
+            error,
+            (
+                TimeoutError,
+                asyncio.TimeoutError,
+                litellm.RateLimitError,
+                litellm.Timeout,
+            ),
+        ):
+            return True
+        status_code = getattr(error, "status_code", None)
+        return status_code in (408, 429)
+
+    async def _acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._calls_in_flight >= self.limit:
+            waiter: asyncio.Future[None] = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                self._wake_waiters()
+                raise
+        self._calls_in_flight += 1
+
+    def _release(self) -> None:
+        self._calls_in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        free_slots = self.limit - self._calls_in_flight
+        while free_slots > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if waiter.done() or waiter.get_loop().is_closed():
+                continue
+            waiter.set_result(None)
+            free_slots -= 1
+
+    def _record_success(self, duration: float) -> None:
+        if (
+            self.slow_call_threshold_in_seconds is not None
+            and duration > self.slow_call_threshold_in_seconds
+        ):
+            return
+        self._limit = min(
+            self.max_limit, self._limit + self.additive_increase / self._limit
+        )
+
+    def _record_congestion(self, call_start_time: float) -> None:
+        if call_start_time < self._time_of_last_decrease:
+            return
+        self._time_of_last_decrease = time.monotonic()
+        self._limit = max(
+            self.min_limit, self._limit * self.multiplicative_decrease
+        )
+        self.number_of_decreases += 1
+        logger.info(
+            f"Congestion detected, lowering concurrency limit to {self.limit}"
+        )
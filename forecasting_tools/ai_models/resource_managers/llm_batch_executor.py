@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+import litellm
+from litellm.utils import get_optional_params
+from openai import AsyncOpenAI
+
+from forecasting_tools.util import file_manipulation
+
+logger = logging.getLogger(__name__)
+
+
+class LlmBatchError(Exception):
+    """
+    Raised when a batch job fails or a request in it returns an error.
+    `status_code` is set when the provider answered with one (e.g. 400 when
+    it rejected the request's params), so a RetryPolicy can tell rejected
+    requests from transient failures.
+    """
+
+    def __init__(self, message: str, status_code: int | None = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class _QueuedRequest:
+    custom_id: str
+    body: dict[str, Any]
+    future: asyncio.Future[dict[str, Any]]
+
+
+class LlmBatchExecutor:
+    """
+    Sends GeneralLlm calls through a provider's Batch API instead of the
+    real-time endpoint. Batch jobs are cheaper (OpenAI bills them at half
+    price) and have much higher rate limits, but can take minutes or hours,
+    so this is meant for large runs that are not latency-sensitive like
+    benchmarks.
+
+    Use the executor as a context manager (like the LlmResponseCache), or
+    pass it to a Benchmarker. Every batchable GeneralLlm call made inside the
+    block is queued. Once `max_requests_per_batch` calls are queued, or
+    `seconds_to_collect_requests` have passed since the first call in the
+    queue, the queue is written to a JSONL batch file in the OpenAI Batch
+    format, uploaded and submitted. The job is polled every
+    `poll_interval_in_seconds` and the waiting calls resume with their
+    results when it finishes.
+    ```
+    with LlmBatchExecutor():
+        await benchmarker.run_benchmark()
+    ```
+
+    Only models called directly through OpenAI (or an OpenAI-compatible
+    server at `base_url`) are batched. Request bodies get the same param
+    mapping litellm does for real-time calls (e.g. max_completion_tokens
+    and no temperature for reasoning models), and calls whose params can't
+    be mapped are not batched. Other calls go to the real-time endpoint as
+    usual. Calls in the same batch run in parallel, so the more
+    calls are in flight at once, the fuller each batch is.
+    """
+
+    _active_executors: ContextVar[list[LlmBatchExecutor]] = ContextVar(
+        "_active_executors", default=[]
+    )
+    BATCH_COST_MULTIPLIER = 0.5
+    ENDPOINT = "/v1/chat/completions"
+    TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+    KWARGS_EXCLUDED_FROM_BODY: set[str] = {
+        "timeout",
+        "api_key",
+        "base_url",
+        "api_base",
+        "extra_headers",
+        "drop_params",
+    }
+
+    def __init__(
+        self,
+        batch_file_directory: str = "logs/llm_batches",
+        max_requests_per_batch: int = 50000,
+        seconds_to_collect_requests: float = 10,
+        poll_interval_in_seconds: float = 30,
+        base_url: str | None = None,
+        api_key: str | None = None,
+    ) -> None:
+        if max_requests_per_batch <= 0:
+            raise ValueError("max_requests_per_batch must be greater than 0")
+        if seconds_to_collect_requests < 0:
+            raise ValueError(
+                "seconds_to_collect_requests must not be negative"
+            )
+        if poll_interval_in_seconds <= 0:
+            raise ValueError("poll_interval_in_seconds must be greater than 0")
+        self.batch_file_directory = batch_file_directory
+        self.max_requests_per_batch = max_requests_per_batch
+        self.seconds_to_collect_requests = seconds_to_collect_requests
+        self.poll_interval_in_seconds = poll_interval_in_seconds
+        self.base_url = base_url
+        self.api_key = api_key
+        self.batches_submitted = 0
+        self.requests_submitted = 0
+        self._queued_requests: list[_QueuedRequest] = []
+        self._submit_timer: asyncio.TimerHandle | None = None
+        self._running_batches: set[asyncio.Task[None]] = set()
+        self._request_ids = itertools.count()
+
+    def __enter__(self) -> LlmBatchExecutor:
+        active_executors = self._active_executors.get().copy()
+        active_executors.append(self)
+        self._active_executors.set(active_executors)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:  # NOSONAR
+        active_executors = self._active_executors.get().copy()
+        active_executors.remove(self)
+        self._active_executors.set(active_executors)
+
+    @classmethod
+    def get_active_executor(cls) -> LlmBatchExecutor | None:
+        active_executors = cls._active_executors.get()
+        if not active_executors:
+            return None
+        return active_executors[-1]
+
+    def can_batch(self, provider: str, litellm_kwargs: dict[str, Any]) -> bool:
+        if provider != "openai":
+            return False
+        if litellm_kwargs.get("stream"):
+            return False
+        model_base_url = litellm_kwargs.get("base_url") or litellm_kwargs.get(
+            "api_base"
+        )
+        if model_base_url is not None and model_base_url != self.base_url:
+            return False
+        try:
+            self.make_request_body(litellm_kwargs, [])
+        except Exception as e:
+            logger.warning(
+                f"Not batching calls to {litellm_kwargs.get('model')} since "
+                f"their params can't be mapped to a batch request: {e}"
+            )
+            return False
+        return True
+
+    def make_request_body(
+        self, litellm_kwargs: dict[str, Any], messages: list[dict[str, Any]]
+    ) -> dict[str, Any]:
+        """
+        Maps litellm kwargs to an OpenAI chat completion body the way
+        litellm does for a real-time call. Params the model doesn't support
+        are dropped.
+        """
+        model, provider, _, _ = litellm.get_llm_provider(
+            litellm_kwargs["model"]
+        )
+        params = {
+            key: value
+            for key, value in litellm_kwargs.items()
+            if key not in self.KWARGS_EXCLUDED_FROM_BODY
+            and key != "model"
+            and value is not None
+        }
+        optional_params = get_optional_params(
+            model=model,
+            custom_llm_provider=provider,
+            drop_params=True,
+            **params,
+        )
+        extra_body = optional_params.pop("extra_body", None) or {}
+        if not optional_params.get("stream"):
+            optional_params.pop("stream", None)
+        return {
+            "model": model,
+            **optional_params,
+            **extra_body,
+            "messages": messages,
+        }
+
+    async def run(
+        self, litellm_kwargs: dict[str, Any], messages: list[dict[str, Any]]
+    ) -> dict[str, Any]:
+        """
+        Queues one chat completion and returns its response body (an OpenAI
+        chat completion as a dict) once its batch finishes.
+        """
+        body = self.make_request_body(litellm_kwargs, messages)
+        future: asyncio.Future[dict[str, Any]] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._queued_requests.append(
+            _QueuedRequest(
+                custom_id=f"request-{next(self._request_ids)}",
+                body=body,
+                future=future,
+            )
+        )
+        if len(self._queued_requests) >= self.max_requests_per_batch:
+            self._submit_queued_requests()
+        elif self._submit_timer is None:
+            self._submit_timer = asyncio.get_running_loop().call_later(
+                self.seconds_to_collect_requests,
+                self._submit_queued_requests,
+            )
+        return await future
+
+    def _submit_queued_requests(self) -> None:
+        if self._submit_timer is not None:
+            self._submit_timer.cancel()
+            self._submit_timer = None
+        requests = [
+            request
+            for request in self._queued_requests
+            if not request.future.done()
+        ]
+        self._queued_requests = []
+        if not requests:
+            return
+        task = asyncio.ensure_future(self._run_batch(requests))
+        self._running_batches.add(task)
+        task.add_done_callback(self._running_batches.discard)
+
+    async def _run_batch(self, requests: list[_QueuedRequest]) -> None:
+        try:
+            results = await self._submit_and_wait_for_batch(requests)
+        except Exception as e:
+            logger.error(f"Batch of {len(requests)} requests failed: {e}")
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        for request in requests:
+            if request.future.done():
+                continue
+            result_line = results.get(request.custom_id)
+            try:
+                request.future.set_result(
+                    self._get_body_from_result_line(result_line)
+                )
+            except LlmBatchError as e:
+                request.future.set_exception(e)
+
+    async def _submit_and_wait_for_batch(
+        self, requests: list[_QueuedRequest]
+    ) -> dict[str, dict[str, Any]]:
+        batch_file_path = self._make_batch_file_path()
+        batch_file_text = self._make_batch_file_text(requests)
+        await asyncio.to_thread(
+            file_manipulation.create_or_overwrite_file,
+            batch_file_path,
+            batch_file_text,
+        )
+        async with AsyncOpenAI(
+            api_key=self.api_key or os.getenv("OPENAI_API_KEY"),
+            base_url=self.base_url,
+        ) as client:
+            uploaded_file = await client.files.create(
+                file=(
+                    os.path.basename(batch_file_path),
+                    batch_file_text.encode(),
+                ),
+                purpose="batch",
+            )
+            batch = await client.batches.create(
+                input_file_id=uploaded_file.id,
+                endpoint=self.ENDPOINT,
+                completion_window="24h",
+            )
+            self.batches_submitted += 1
+            self.requests_submitted += len(requests)
+            logger.info(
+                f"Submitted batch {batch.id} with {len(requests)} requests "
+                f"from {batch_file_path}"
+            )
+            while batch.status not in self.TERMINAL_STATUSES:
+                await asyncio.sleep(self.poll_interval_in_seconds)
+                batch = await client.batches.retrieve(batch.id)
+            logger.info(f"Batch {batch.id} finished as {batch.status}")
+
+            result_lines: list[str] = []
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id is None:
+                    continue
+                file_content = await client.files.content(file_id)
+                result_lines.extend(file_content.text.splitlines())
+        if batch.status != "completed" and not result_lines:
+            # A batch "failed" when its input file didn't pass validation
+            raise LlmBatchError(
+                f"Batch {batch.id} ended with status {batch.status}: {batch.errors}",
+                status_code=400 if batch.status == "failed" else None,
+            )
+        results: dict[str, dict[str, Any]] = {}
+        for line in result_lines:
+            if line.strip():
+                result_line = json.loads(line)
+                results[result_line["custom_id"]] = result_line
+        return results
+
+    def _make_batch_file_path(self) -> str:
+        file_name = (
+            f"batch_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+            f"_{uuid.uuid4().hex[:8]}.jsonl"
+        )
+        return os.path.join(self.batch_file_directory, file_name)
+
+    def _make_batch_file_text(self, requests: list[_QueuedRequest]) -> str:
+        lines = [
+            {
+                "custom_id": request.custom_id,
+                "method": "POST",
+                "url": self.ENDPOINT,
+                "body": request.body,
+            }
+            for request in requests
+        ]
+        return "".join(json.dumps(line, default=str) + "\n" for line in lines)
+
+    @staticmethod
+    def _get_body_from_result_line(
+        result_line: dict[str, Any] | None,
+    ) -> dict[str, Any]:
+        if result_line is None:
+            raise LlmBatchError("Batch finished without a result for request")
+        if result_line.get("error"):
+            raise LlmBatchError(
+                f"Batch request failed: {result_line['error']}"
+            )
+        response = result_line.get("response") or {}
+        status_code = response.get("status_code")
+        body = response.get("body")
+        if status_code != 200 or not isinstance(body, dict):
+            raise LlmBatchError(
+                f"Batch request failed with status {status_code}: {body}",
+                status_code=(
+                    status_code if isinstance(status_code, int) else None
+                ),
+            )
+        return body
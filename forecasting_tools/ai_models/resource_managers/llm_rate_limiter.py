@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import logging
+
+from forecasting_tools.ai_models.resource_managers.rate_limiter_registry import (
+    NamedRateLimiter,
+)
+from forecasting_tools.ai_models.resource_managers.refreshing_bucket_rate_limiter import (
+    RefreshingBucketRateLimiter,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LlmRateLimiter:
+    """
+    Holds the tokens per minute (TPM) and requests per minute (RPM) budgets
+    of one provider account, so calls wait before being sent instead of
+    being rejected with a 429.
+
+    Prompt tokens are counted and acquired before the call is sent. Once the
+    response arrives, the real token usage (prompt + completion) is
+    reconciled with what was acquired.
+    """
+
+    def __init__(
+        self,
+        tokens_per_minute: int | None = None,
+        requests_per_minute: int | None = None,
+    ) -> None:
+        if tokens_per_minute is not None and tokens_per_minute <= 0:
+            raise ValueError("tokens_per_minute must be greater than 0")
+        if requests_per_minute is not None and requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be greater than 0")
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self._token_limiter: NamedRateLimiter | None = (
+            RefreshingBucketRateLimiter(
+                tokens_per_minute, tokens_per_minute / 60
+            )
+            if tokens_per_minute is not None
+            else None
+        )
+        self._request_limiter: NamedRateLimiter | None = (
+            RefreshingBucketRateLimiter(
+                requests_per_minute, requests_per_minute / 60
+            )
+            if requests_per_minute is not None
+            else None
+        )
+
+    @classmethod
+    def from_limiters(
+        cls,
+        token_limiter: NamedRateLimiter | None,
+        request_limiter: NamedRateLimiter | None,
+    ) -> LlmRateLimiter:
+        """
+        Wraps limiters that already exist (e.g. ones from the
+        RateLimiterRegistry) instead of creating new ones.
+        """
+        rate_limiter = cls()
+        rate_limiter._token_limiter = token_limiter
+        rate_limiter._request_limiter = request_limiter
+        if token_limiter is not None:
+            rate_limiter.tokens_per_minute = round(
+                token_limiter.refresh_rate * 60
+            )
+        if request_limiter is not None:
+            rate_limiter.requests_per_minute = round(
+                request_limiter.refresh_rate * 60
+            )
+        return rate_limiter
+
+    async def wait_till_able_to_send(self, prompt_tokens: int) -> int:
+        """
+        Waits until a request with the given prompt size can be sent.
+        Returns the number of tokens acquired, which should be passed to
+        `reconcile_token_usage` once the real usage is known.
+        """
+        if self._request_limiter is not None:
+            await self._request_limiter.wait_till_able_to_acquire_resources(1)
+        if self._token_limiter is None:
+            return 0
+        tokens_to_acquire = min(prompt_tokens, self._token_limiter.capacity)
+        if tokens_to_acquire < prompt_tokens:
+            logger.warning(
+                f"Prompt of {prompt_tokens} tokens is larger than the "
+                f"{self.tokens_per_minute} tokens per minute limit"
+            )
+        await self._token_limiter.wait_till_able_to_acquire_resources(
+            int(tokens_to_acquire)
+        )
+        return int(tokens_to_acquire)
+
+    async def reconcile_token_usage(
+        self, tokens_acquired: int, tokens_actually_used: int
+    ) -> None:
+        if self._token_limiter is None:
+            return
+        await self._token_limiter.adjust_resources_used(
+            tokens_actually_used - tokens_acquired
+        )
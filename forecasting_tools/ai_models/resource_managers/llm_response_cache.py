@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any
+
+from forecasting_tools.ai_models.ai_utils.response_types import (
+    TextTokenCostResponse,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LlmResponseCache:
+    """
+    An opt-in, persistent, content-addressed cache for GeneralLlm responses.
+
+    Responses are stored in a SQLite file keyed by a hash of the model,
+    the normalized litellm kwargs, and the message list sent to the model.
+    Entries expire after `ttl_in_seconds` and the least recently used entries
+    are evicted once there are more than `max_entries`.
+
+    Use the cache as a context manager (like the MonetaryCostManager) so that
+    every GeneralLlm invoked inside the block checks it, or pass it to a
+    GeneralLlm directly with the `response_cache` argument.
+    ```
+    with LlmResponseCache("logs/llm_cache.sqlite"):
+        await benchmarker.run_benchmark()
+    ```
+
+    Cache hits report the cost and tokens of the original call, but are flagged
+    with `is_cached_response` so they are not charged to cost managers again.
+    Only deterministic calls (temperature 0) are cached by GeneralLlm.
+    """
+
+    _active_caches: ContextVar[list[LlmResponseCache]] = ContextVar(
+        "_active_caches", default=[]
+    )
+    KWARGS_EXCLUDED_FROM_KEY: set[str] = {
+        "api_key",
+        "extra_headers",
+        "timeout",
+    }
+
+    def __init__(
+        self,
+        file_path: str = "logs/llm_response_cache.sqlite",
+        ttl_in_seconds: float | None = 60 * 60 * 24 * 7,
+        max_entries: int | None = 10000,
+    ) -> None:
+        if ttl_in_seconds is not None and ttl_in_seconds <= 0:
+            raise ValueError("ttl_in_seconds must be greater than 0")
+        if max_entries is not None and max_entries <= 0:
+            raise ValueError("max_entries must be greater than 0")
+        self.file_path = file_path
+        self.ttl_in_seconds = ttl_in_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = self._create_connection(file_path)
+
+    def __enter__(self) -> LlmResponseCache:
+        active_caches = self._active_caches.get().copy()
+        active_caches.append(self)
+        self._active_caches.set(active_caches)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:  # NOSONAR
+        active_caches = self._active_caches.get().copy()
+        active_caches.remove(self)
+        self._active_caches.set(active_caches)
+
+    @classmethod
+    def get_active_cache(cls) -> LlmResponseCache | None:
+        active_caches = cls._active_caches.get()
+        if not active_caches:
+            return None
+        return active_caches[-1]
+
+    @classmethod
+    def make_key(
+        cls, litellm_kwargs: dict[str, Any], messages: list[dict]
+    ) -> str:
+        normalized_kwargs = {
+            key: value
+            for key, value in litellm_kwargs.items()
+            if key not in cls.KWARGS_EXCLUDED_FROM_KEY
+        }
+        key_material = json.dumps(
+            {"kwargs": normalized_kwargs, "messages": messages},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(key_material.encode()).hexdigest()
+
+    def get(self, key: str) -> TextTokenCostResponse | None:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response_json, created_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response_json, created_at = row
+            if (
+                self.ttl_in_seconds is not None
+                and now - created_at > self.ttl_in_seconds
+            ):
+                self._connection.execute(
+                    "DELETE FROM responses WHERE key = ?", (key,)
+                )
+                self._connection.commit()
+                self.misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE responses SET last_accessed_at = ? WHERE key = ?",
+                (now, key),
+            )
+            self._connection.commit()
+            self.hits += 1
+        response = TextTokenCostResponse.model_validate_json(response_json)
+        response.is_cached_response = True
+        logger.debug(f"LLM response cache hit for key {key}")
+        return response
+
+    def set(self, key: str, response: TextTokenCostResponse) -> None:
+        now = time.time()
+        response_json = response.model_copy(
+            update={"is_cached_response": False}
+        ).model_dump_json()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, response_json, created_at, last_accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, response_json, now, now),
+            )
+            self._evict_expired_and_least_recently_used(now)
+            self._connection.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()
+        return row[0]
+
+    def _evict_expired_and_least_recently_used(self, now: float) -> None:
+        if self.ttl_in_seconds is not None:
+            self._connection.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (now - self.ttl_in_seconds,),
+            )
+        if self.max_entries is not None:
+            self._connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_accessed_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    @staticmethod
+    def _create_connection(file_path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(file_path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, "
+            "response_json TEXT NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "last_accessed_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_accessed_at "
+            "ON responses (last_accessed_at)"
+        )
+        connection.commit()
+        return connection
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Final
+
+from forecasting_tools.ai_models.resource_managers.refreshing_bucket_rate_limiter import (
+    RateLimitAlgorithm,
+    RefreshingBucketRateLimiter,
+)
+from forecasting_tools.ai_models.resource_managers.shared_rate_limiter import (
+    SharedRefreshingBucketRateLimiter,
+)
+from forecasting_tools.util import file_manipulation
+
+logger = logging.getLogger(__name__)
+
+NamedRateLimiter = (
+    RefreshingBucketRateLimiter | SharedRefreshingBucketRateLimiter
+)
+
+
+@dataclass
+class RateLimit:
+    capacity: float
+    period_in_seconds: float = 60
+    algorithm: RateLimitAlgorithm = RateLimitAlgorithm.FILL_THE_BUCKET
+
+    @property
+    def refresh_rate(self) -> float:
+        return self.capacity / self.period_in_seconds
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> RateLimit:
+        return cls(
+            capacity=data["capacity"],
+            period_in_seconds=data.get("period_in_seconds", 60),
+            algorithm=RateLimitAlgorithm[
+                data.get("algorithm", "fill_the_bucket").upper()
+            ],
+        )
+
+
+@dataclass
+class RateLimiterUtilization:
+    name: str
+    capacity: float
+    available_resources: float
+    refresh_rate: float
+    number_of_waiters: int | None
+
+    @property
+    def fraction_in_use(self) -> float:
+        return 1 - self.available_resources / self.capacity
+
+
+class RateLimiterRegistry:
+    """
+    One rate limiter per name for the whole process, so every call site that
+    uses the same provider and credential draws from the same bucket.
+
+    Names look like "exa:requests" or "openai:tokens:<credential hash>" (see
+    `make_name`). A limit configured for "provider:resource" applies to each
+    credential of that provider that has no limit of its own.
+
+    Limits are configured with `set_limit`, or declaratively from JSON such as
+    {"exa:requests": {"capacity": 3, "period_in_seconds": 1},
+    "openai:tokens": {"capacity": 30000, "algorithm": "gcra"}}
+    found in the file at RATE_LIMITS_CONFIG_PATH or inline in RATE_LIMITS.
+    Call sites pass a `default_limit` for names that aren't configured.
+    Limiters are shared between processes when
+    SHARED_RATE_LIMITER_DATABASE_PATH is set (see
+    SharedRefreshingBucketRateLimiter).
+    """
+
+    CONFIG_PATH_ENV_VAR: Final[str] = "RATE_LIMITS_CONFIG_PATH"
+    CONFIG_ENV_VAR: Final[str] = "RATE_LIMITS"
+
+    _limiters: dict[str, NamedRateLimiter] = {}
+    _configured_limits: dict[str, RateLimit] | None = None
+    _lock = threading.RLock()
+
+    @staticmethod
+    def make_name(
+        provider: str,
+        resource: str = "requests",
+        credential: str | None = None,
+    ) -> str:
+        """
+        Leave credential as None for the default credential from the
+        environment. Credentials are hashed so they never appear in names.
+        """
+        if credential is None:
+            return f"{provider}:{resource}"
+        credential_hash = hashlib.sha256(credential.encode()).hexdigest()[:16]
+        return f"{provider}:{resource}:{credential_hash}"
+
+    @classmethod
+    def get_limiter(
+        cls, name: str, default_limit: RateLimit | None = None
+    ) -> NamedRateLimiter | None:
+        """
+        Returns the limiter for `name`, creating it from the configured limit
+        (or `default_limit`) the first time. Returns None if neither exists.
+        """
+        with cls._lock:
+            limiter = cls._limiters.get(name)
+            if limiter is not None:
+                return limiter
+            limit = cls.get_limit(name) or default_limit
+            if limit is None:
+                return None
+            limiter = SharedRefreshingBucketRateLimiter.create_rate_limiter(
+                name,
+                limit.capacity,
+                limit.refresh_rate,
+                algorithm=limit.algorithm,
+            )
+            cls._limiters[name] = limiter
+            return limiter
+
+    @classmethod
+    def get_limit(cls, name: str) -> RateLimit | None:
+        with cls._lock:
+            configured_limits = cls.__get_configured_limits()
+            if name in configured_limits:
+                return configured_limits[name]
+            provider_wide_name = ":".join(name.split(":")[:2])
+            return configured_limits.get(provider_wide_name)
+
+    @classmethod
+    def set_limit(cls, name: str, limit: RateLimit | None) -> None:
+        """
+        Configures the limit for `name` (None removes it). Limiters already
+        created under the name, or under credentials of a provider-wide
+        name, start again with a full bucket at the new limit.
+        """
+        with cls._lock:
+            configured_limits = cls.__get_configured_limits()
+            if limit is None:
+                configured_limits.pop(name, None)
+            else:
+                configured_limits[name] = limit
+            for existing_name in list(cls._limiters):
+                if existing_name == name or existing_name.startswith(
+                    f"{name}:"
+                ):
+                    del cls._limiters[existing_name]
+
+    @classmethod
+    def set_limiter(cls, name: str, limiter: NamedRateLimiter) -> None:
+        with cls._lock:
+            cls._limiters[name] = limiter
+
+    @classmethod
+    def remove_limiter(cls, name: str) -> None:
+        """
+        Forgets the limiter under `name`. The configured limit is kept, and
+        the next lookup creates a limiter with a full bucket.
+        """
+        with cls._lock:
+            cls._limiters.pop(name, None)
+
+    @classmethod
+    def load_limits(cls, config_path: str | None = None) -> None:
+        """
+        Replaces the configured limits with those in the JSON file at
+        `config_path` (or RATE_LIMITS_CONFIG_PATH) and in RATE_LIMITS.
+        """
+        limits_data: dict[str, dict[str, Any]] = {}
+        config_path = config_path or os.getenv(cls.CONFIG_PATH_ENV_VAR)
+        if config_path:
+            limits_data.update(file_manipulation.load_json_file(config_path))  # type: ignore
+        inline_config = os.getenv(cls.CONFIG_ENV_VAR)
+        if inline_config:
+            limits_data.update(json.loads(inline_config))
+
+        configured_limits = {
+            name: RateLimit.from_dict(limit_data)
+            for name, limit_data in limits_data.items()
+        }
+        with cls._lock:
+            cls._configured_limits = configured_limits
+            cls._limiters.clear()
+        if configured_limits:
+            logger.info(
+                f"Loaded rate limits for {', '.join(configured_limits)}"
+            )
+
+    @classmethod
+    def get_utilization(cls) -> list[RateLimiterUtilization]:
+        with cls._lock:
+            limiters = list(cls._limiters.items())
+        utilizations = []
+        for name, limiter in limiters:
+            utilizations.append(
+                RateLimiterUtilization(
+                    name=name,
+                    capacity=limiter.capacity,
+                    available_resources=limiter.refresh_and_then_get_available_resources(),
+                    refresh_rate=limiter.refresh_rate,
+                    number_of_waiters=(
+                        limiter.number_of_waiters
+                        if isinstance(limiter, RefreshingBucketRateLimiter)
+                        else None
+                    ),
+                )
+            )
+        return utilizations
+
+    @classmethod
+    def __get_configured_limits(cls) -> dict[str, RateLimit]:
+        if cls._configured_limits is None:
+            cls.load_limits()
+        assert cls._configured_limits is not None
+        return cls._configured_limits
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import selectors
+from dataclasses import dataclass
+from typing import Coroutine, TypeVar
+
+from forecasting_tools.ai_models.resource_managers.refreshing_bucket_rate_limiter import (
+    RateLimitAlgorithm,
+    RefreshingBucketRateLimiter,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SimulatedClock:
+    def __init__(self, start_time: float = 0) -> None:
+        self.now = start_time
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _SimulatedTimeSelector(selectors.DefaultSelector):
+    """
+    Instead of blocking until the next timer is due, the event loop's
+    selector jumps the simulated clock forward to it.
+    """
+
+    def __init__(self, clock: SimulatedClock) -> None:
+        super().__init__()
+        self.__clock = clock
+
+    def select(
+        self, timeout: float | None = None
+    ) -> list[tuple[selectors.SelectorKey, int]]:
+        if timeout is None:
+            raise RuntimeError(
+                "Simulation is waiting on something other than a timer"
+            )
+        if timeout > 0:
+            self.__clock.now += timeout
+        return super().select(0)
+
+
+def run_with_simulated_time(
+    coroutine: Coroutine[None, None, T], clock: SimulatedClock
+) -> T:
+    """
+    Runs a coroutine on an event loop whose time is `clock`, so sleeps and
+    timeouts finish instantly while the clock moves as if they had happened
+    """
+    loop = asyncio.SelectorEventLoop(_SimulatedTimeSelector(clock))
+    loop.time = clock  # type: ignore[method-assign]
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@dataclass
+class RateLimiterThroughputResult:
+    algorithm: RateLimitAlgorithm
+    simulated_seconds: float
+    resources_acquired: float
+    longest_gap_in_seconds: float
+
+    @property
+    def resources_per_second(self) -> float:
+        return self.resources_acquired / self.simulated_seconds
+
+
+def simulate_rate_limiter_throughput(
+    algorithm: RateLimitAlgorithm,
+    capacity: float = 60,
+    refresh_rate: float = 1,
+    simulated_seconds: float = 600,
+    resources_per_request: int = 1,
+    concurrent_callers: int = 10,
+) -> RateLimiterThroughputResult:
+    """
+    Has `concurrent_callers` acquire resources from one limiter as fast as it
+    allows for `simulated_seconds`, and measures what got through
+    """
+    clock = SimulatedClock()
+    limiter = RefreshingBucketRateLimiter(
+        capacity, refresh_rate, clock=clock, algorithm=algorithm
+    )
+    acquire_times: list[float] = []
+
+    async def keep_acquiring() -> None:
+        while clock.now < simulated_seconds:
+            await limiter.wait_till_able_to_acquire_resources(
+                resources_per_request
+            )
+            if clock.now <= simulated_seconds:
+                acquire_times.append(clock.now)
+
+    async def run_callers() -> None:
+        await asyncio.gather(
+            *[keep_acquiring() for _ in range(concurrent_callers)]
+        )
+
+    run_with_simulated_time(run_callers(), clock)
+
+    checkpoints = [0.0, *acquire_times, simulated_seconds]
+    longest_gap = max(
+        later - earlier for earlier, later in zip(checkpoints, checkpoints[1:])
+    )
+    return RateLimiterThroughputResult(
+        algorithm=algorithm,
+        simulated_seconds=simulated_seconds,
+        resources_acquired=len(acquire_times) * resources_per_request,
+        longest_gap_in_seconds=longest_gap,
+    )
+
+
+def compare_rate_limiter_algorithms(
+    capacity: float = 60,
+    refresh_rate: float = 1,
+    simulated_seconds: float = 600,
+    resources_per_request: int = 1,
+    concurrent_callers: int = 10,
+) -> list[RateLimiterThroughputResult]:
+    return [
+        simulate_rate_limiter_throughput(
+            algorithm,
+            capacity=capacity,
+            refresh_rate=refresh_rate,
+            simulated_seconds=simulated_seconds,
+            resources_per_request=resources_per_request,
+            concurrent_callers=concurrent_callers,
+        )
+        for algorithm in RateLimitAlgorithm
+    ]
@@ -1,10 +1,16 @@
+import heapq
+import itertools
 import logging
-from datetime import datetime, timedelta
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime
 
 logger = logging.getLogger(__name__)
 import asyncio
 from enum import Enum
-from typing import Final
+from typing import Callable, Final, Literal
 
 
 class LimitReachedResponse(Enum):
@@ -12,14 +18,42 @@ class LimitReachedResponse(Enum):
     WAIT = 2
 
 
+class RateLimitAlgorithm(Enum):
+    FILL_THE_BUCKET = 1
+    GCRA = 2
+
+
 class ResourceUnavailableError(RuntimeError):
     """Raised when resources are unavailable and cannot continue execution."""
 
 
-class ResourceUseEntry:
-    def __init__(self, resources_used: int, time: datetime) -> None:
-        self.resources_used: int = resources_used
-        self.time: datetime = time
+@dataclass
+class _Waiter:
+    resources: float
+    future: asyncio.Future[None]
+
+
+@dataclass
+class _LoopQueue:
+    """The waiters of one event loop and the scheduler task that wakes them"""
+
+    loop: asyncio.AbstractEventLoop
+    waiters_changed: asyncio.Event
+    waiters: list[tuple[float, int, _Waiter]] = field(default_factory=list)
+    scheduler: asyncio.Task[None] | None = None
+
+    def wake_scheduler(self) -> None:
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self.loop:
+            self.waiters_changed.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.waiters_changed.set)
+        except RuntimeError:
+            pass  # The loop was closed and its waiters are gone
 
 
 class RefreshingBucketRateLimiter:
@@ -42,13 +76,45 @@ class RefreshingBucketRateLimiter:
     If you reach the bottom of the bucket, the bucket will fill all the way up before you can use resources again.
     This is to make sure something like a "requests per minute" limit is not exceeded even after a burst
     (since averaging out the burst over the full recharge period would successfully hold to the limit).
+
+    Every acquire is kept in a history for `history_retention_in_seconds`
+    (at most `max_history_entries` are kept), so memory stays bounded in long
+    running processes. Time is measured with `clock` (time.monotonic by
+    default) so wall clock jumps do not change refills.
+
+    With `algorithm=RateLimitAlgorithm.GCRA` the bucket never has to refill
+    completely. This is the Generic Cell Rate Algorithm: each resource is
+    due 1/refresh_rate seconds after the last (its "theoretical arrival
+    time"), and up to `capacity` resources may arrive early as a burst.
+    After a burst, requests are spaced evenly at the sustained rate
+    instead of stopping for capacity/refresh_rate seconds.
+
+    Callers that have to wait join their event loop's queue, and a scheduler
+    task per loop wakes the next waiter when enough resources have refilled
+    for it (so several threads can each run their own loop against one
+    limiter). With
+    `waiter_order="fifo"` waiters are served in the order they arrived, so
+    nobody is starved. With "fewest_resources_first" the waiter asking for
+    the least resources is served first.
+
+    Synchronous code (e.g. worker threads) uses
+    `wait_till_able_to_acquire_resources_sync`, which sleeps the calling
+    thread instead of joining an event loop's queue. A lock keeps its
+    acquires and the event loop's from interleaving.
     """
 
+    MAX_SECONDS_BETWEEN_SYNC_CHECKS: Final[float] = 1
+
     def __init__(
         self,
         capacity: float,
         refresh_rate: float,
         limit_reached_response: LimitReachedResponse = LimitReachedResponse.WAIT,
+        history_retention_in_seconds: float = 3600,
+        max_history_entries: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+        waiter_order: Literal["fifo", "fewest_resources_first"] = "fifo",
+        algorithm: RateLimitAlgorithm = RateLimitAlgorithm.FILL_THE_BUCKET,
     ) -> None:
         if capacity <= 0:
             raise ValueError("capacity must be greater than 0")
@@ -60,23 +126,69 @@ class RefreshingBucketRateLimiter:
             logger.info("refresh_rate is 0, resources will not refresh")
         self.refresh_rate: Final[float] = refresh_rate
 
+        if algorithm == RateLimitAlgorithm.GCRA and refresh_rate == 0:
+            raise ValueError("GCRA needs a refresh_rate greater than 0")
+        self.algorithm: Final[RateLimitAlgorithm] = algorithm
+
         self.__limit_reached_response: LimitReachedResponse = (
             limit_reached_response
         )
+        if history_retention_in_seconds < 0:
+            raise ValueError(
+                "history_retention_in_seconds must not be negative"
+            )
+        if max_history_entries <= 0:
+            raise ValueError("max_history_entries must be greater than 0")
+        self.history_retention_in_seconds = history_retention_in_seconds
+        self.max_history_entries = max_history_entries
+        self.__clock = clock
+        self.__clock_at_creation: float = clock()
+        self.__datetime_at_creation: datetime = datetime.now()
+
         self.__available_resources: float = capacity
-        self.__resource_history: list[ResourceUseEntry] = []
-        self.__last_replenish_time: datetime = datetime.now()
-        self.__available_resource_lock = asyncio.Lock()
-        self.__resource_history_lock = asyncio.Lock()
+        # The history is a ring buffer of acquire times with running totals
+        # of the resources acquired, so range queries are two bisects.
+        # Entries before __history_start have expired and are compacted away
+        # once they make up half of the lists.
+        self.__history_times: list[float] = []
+        self.__history_running_totals: list[float] = []
+        self.__history_start = 0
+        self.__running_total_before_history: float = 0
+        self.__last_replenish_time: float = clock()
         self.__fill_the_bucket_mode = False
 
+        if waiter_order not in ("fifo", "fewest_resources_first"):
+            raise ValueError(f"Unknown waiter_order: {waiter_order}")
+        self.waiter_order = waiter_order
+        self.__waiter_sequence = itertools.count()
+        self.__loop_queues: dict[asyncio.AbstractEventLoop, _LoopQueue] = {}
+        self.__state_lock = threading.RLock()
+
     def refresh_and_then_get_available_resources(self) -> float:
-        asyncio.run(self._refresh_resource_count())
-        return self._available_resources
+        with self.__state_lock:
+            self.__refresh_resource_count()
+            return self._available_resources
 
     def zero_out_resources(self) -> None:
-        self._available_resources = 0
-        asyncio.run(self.__update_fill_the_bucket_mode(resources_ran_out=True))
+        with self.__state_lock:
+            self._available_resources = 0
+            self.__update_fill_the_bucket_mode(resources_ran_out=True)
+
+    @property
+    def theoretical_arrival_time(self) -> float:
+        """
+        The GCRA theoretical arrival time: the clock time at which the
+        bucket would be full again if nothing else were acquired.
+        """
+        self.__refresh_resource_count()
+        missing_resources = self.capacity - self._available_resources
+        if missing_resources == 0:
+            return self.__last_replenish_time
+        if self.refresh_rate == 0:
+            return float("inf")
+        return (
+            self.__last_replenish_time + missing_resources / self.refresh_rate
+        )
 
     @property
     def _available_resources(self) -> float:
@@ -91,14 +203,37 @@ class RefreshingBucketRateLimiter:
         self.__available_resources = value
 
     def calculate_resources_passed_into_acquire_in_time_range(
-        self, start_time: datetime, end_time: datetime
+        self, start_time: datetime | float, end_time: datetime | float
     ) -> int:
-        resources_used = 0
-        for entry in self.__resource_history:
-            if start_time < entry.time < end_time:
-                resources_used += entry.resources_used
+        """
+        Times are datetimes or readings of the limiter's clock. Acquires
+        older than the retention window are not counted.
+        """
+        start = self.__to_clock_time(start_time)
+        end = self.__to_clock_time(end_time)
+        times = self.__history_times
+        first_index = bisect_right(times, start, lo=self.__history_start)
+        end_index = bisect_left(times, end, lo=first_index)
+        if end_index <= first_index:
+            return 0
+        return int(
+            self.__history_running_totals[end_index - 1]
+            - self.__get_running_total_before(first_index)
+        )
 
-        return resources_used
+    @property
+    def history_length(self) -> int:
+        return len(self.__history_times) - self.__history_start
+
+    @property
+    def number_of_waiters(self) -> int:
+        with self.__state_lock:
+            self.__remove_queues_of_closed_loops()
+            return sum(
+                not waiter.future.done()
+                for loop_queue in self.__loop_queues.values()
+                for _, _, waiter in loop_queue.waiters
+            )
 
     async def wait_till_able_to_acquire_resources(
         self, resources_being_consumed: int
@@ -108,62 +243,187 @@ class RefreshingBucketRateLimiter:
                 f"resources_being_consumed must be less than or equal to capacity. Capacity: {self.capacity}, resources_being_consumed: {resources_being_consumed}"
             )
 
-        resources_are_available: bool = (
-            await self._determine_if_resources_available(
-                resources_being_consumed
-            )
-        )
-        await self.__update_fill_the_bucket_mode(
-            resources_ran_out=(not resources_are_available)
-        )
-
-        if (
-            not resources_are_available
-            and self.__limit_reached_response
-            == LimitReachedResponse.RAISE_EXCEPTION
-        ):
-            raise ResourceUnavailableError(
-                "Resources not available. Limit Reached Response is RAISE_EXCEPTION"
-            )
-
-        if not resources_are_available and self.refresh_rate == 0:
-            raise RuntimeError(
-                "Resources not available. Would have waited indefinitely. refresh_rate is 0"
-            )
+        if self.__try_to_acquire_without_waiting(resources_being_consumed):
+            return
+        await self.__wait_in_queue(resources_being_consumed)
 
-        while not resources_are_available or self.__fill_the_bucket_mode:
-            seconds_to_sleep = await self.__calculate_seconds_to_sleep(
-                resources_being_consumed
+    def wait_till_able_to_acquire_resources_sync(
+        self, resources_being_consumed: int
+    ) -> None:
+        """
+        Blocks the calling thread until the resources are acquired. Safe to
+        call from several threads at once. Waiters on an event loop are
+        served first whenever both are waiting.
+        """
+        if resources_being_consumed > self.capacity:
+            raise ValueError(
+                f"resources_being_consumed must be less than or equal to capacity. Capacity: {self.capacity}, resources_being_consumed: {resources_being_consumed}"
             )
-            await asyncio.sleep(seconds_to_sleep)
-            resources_are_available = (
-                await self._determine_if_resources_available(
+        while True:
+            with self.__state_lock:
+                if self.__try_to_acquire_without_waiting(
+                    resources_being_consumed
+                ):
+                    return
+                seconds_to_wait = self.__calculate_seconds_to_sleep(
                     resources_being_consumed
                 )
+            # Resources can be free while event loop waiters are queued
+            # ahead, so poll instead of spinning
+            time.sleep(
+                min(
+                    max(seconds_to_wait, 0.01),
+                    self.MAX_SECONDS_BETWEEN_SYNC_CHECKS,
+                )
             )
-            await self.__update_fill_the_bucket_mode(
-                resources_ran_out=(not resources_are_available)
-            )
-
-        async with self.__available_resource_lock:
-            self._available_resources -= resources_being_consumed
-
-        await self.__add_resource_use_entry(resources_being_consumed)
 
-    async def _determine_if_resources_available(
+    def __try_to_acquire_without_waiting(
         self, resources_being_consumed: int
     ) -> bool:
-        await self._refresh_resource_count()
-        async with self.__available_resource_lock:
+        """
+        Consumes the resources if they are available now and nobody is
+        queued ahead. Otherwise raises if the caller must not wait.
+        """
+        with self.__state_lock:
+            self.__refresh_resource_count()
             resources_are_available = (
                 resources_being_consumed <= self._available_resources
             )
-            return resources_are_available
+            self.__update_fill_the_bucket_mode(
+                resources_ran_out=not resources_are_available
+            )
+            if (
+                resources_are_available
+                and not self.__fill_the_bucket_mode
+                and self.number_of_waiters == 0
+            ):
+                self.__consume(resources_being_consumed)
+                return True
+
+            if not resources_are_available:
+                if (
+                    self.__limit_reached_response
+                    == LimitReachedResponse.RAISE_EXCEPTION
+                ):
+                    raise ResourceUnavailableError(
+                        "Resources not available. Limit Reached Response is RAISE_EXCEPTION"
+                    )
+            if self.refresh_rate == 0:
+                raise RuntimeError(
+                    "Resources not available. Would have waited indefinitely. refresh_rate is 0"
+                )
+            return False
+
+    async def adjust_resources_used(self, resource_difference: float) -> None:
+        """
+        Corrects an earlier acquire once the real amount used is known.
+        A positive difference consumes more resources (without waiting),
+        and a negative difference gives resources back.
+        """
+        with self.__state_lock:
+            self.__refresh_resource_count()
+            new_total = self._available_resources - resource_difference
+            self._available_resources = min(max(new_total, 0), self.capacity)
+            if new_total <= 0 and resource_difference > 0:
+                self.__update_fill_the_bucket_mode(resources_ran_out=True)
+        self.__wake_scheduler()
+
+    async def __wait_in_queue(self, resources_being_consumed: int) -> None:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(resources_being_consumed, loop.create_future())
+        priority = (
+            resources_being_consumed
+            if self.waiter_order == "fewest_resources_first"
+            else 0
+        )
+        with self.__state_lock:
+            loop_queue = self.__ensure_scheduler_is_running(loop)
+            heapq.heappush(
+                loop_queue.waiters,
+                (priority, next(self.__waiter_sequence), waiter),
+            )
+            waiter_is_first = loop_queue.waiters[0][2] is waiter
+        if waiter_is_first:
+            loop_queue.wake_scheduler()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if not waiter.future.done():
+                waiter.future.cancel()
+            loop_queue.wake_scheduler()
+            raise
+
+    def __ensure_scheduler_is_running(
+        self, loop: asyncio.AbstractEventLoop
+    ) -> _LoopQueue:
+        with self.__state_lock:
+            self.__remove_queues_of_closed_loops()
+            loop_queue = self.__loop_queues.get(loop)
+            if loop_queue is None:
+                loop_queue = _LoopQueue(loop, asyncio.Event())
+                self.__loop_queues[loop] = loop_queue
+            if loop_queue.scheduler is None or loop_queue.scheduler.done():
+                loop_queue.scheduler = loop.create_task(
+                    self.__run_scheduler(loop_queue)
+                )
+            return loop_queue
+
+    def __remove_queues_of_closed_loops(self) -> None:
+        # Waiters from an event loop that has since been closed (e.g. an
+        # earlier asyncio.run) can never be resumed
+        for loop in [loop for loop in self.__loop_queues if loop.is_closed()]:
+            del self.__loop_queues[loop]
+
+    def __wake_scheduler(self) -> None:
+        with self.__state_lock:
+            loop_queues = list(self.__loop_queues.values())
+        for loop_queue in loop_queues:
+            loop_queue.wake_scheduler()
+
+    async def __run_scheduler(self, loop_queue: _LoopQueue) -> None:
+        waiters = loop_queue.waiters
+        waiters_changed = loop_queue.waiters_changed
+        while True:
+            with self.__state_lock:
+                while waiters and waiters[0][2].future.done():
+                    heapq.heappop(waiters)
+                if not waiters:
+                    return
+                waiter = waiters[0][2]
+                self.__refresh_resource_count()
+                resources_are_available = (
+                    waiter.resources <= self._available_resources
+                )
+                self.__update_fill_the_bucket_mode(
+                    resources_ran_out=not resources_are_available
+                )
+                if resources_are_available and not self.__fill_the_bucket_mode:
+                    heapq.heappop(waiters)
+                    self.__consume(waiter.resources)
+                    waiter.future.set_result(None)
+                    continue
+                seconds_to_sleep = self.__calculate_seconds_to_sleep(
+                    waiter.resources
+                )
 
-    async def __update_fill_the_bucket_mode(
-        self, resources_ran_out: bool
-    ) -> None:
-        await self._refresh_resource_count()
+            waiters_changed.clear()
+            try:
+                await asyncio.wait_for(
+                    waiters_changed.wait(), timeout=seconds_to_sleep
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def __consume(self, resources_being_consumed: float) -> None:
+        self._available_resources -= resources_being_consumed
+        self.__add_resource_use_entry(resources_being_consumed)
+
+    def __update_fill_the_bucket_mode(self, resources_ran_out: bool) -> None:
+        # Under GCRA the bucket is tracked the same way (available resources
+        # are capacity - (theoretical arrival time - now) * refresh_rate), it
+        # just never has to refill all the way before being used again
+        if self.algorithm == RateLimitAlgorithm.GCRA:
+            return
         if self._available_resources >= self.capacity:
             if resources_ran_out == True:
                 raise ValueError(
@@ -173,21 +433,16 @@ class RefreshingBucketRateLimiter:
         if resources_ran_out:
             self.__fill_the_bucket_mode = True
 
-    async def _refresh_resource_count(self) -> None:
-        async with self.__available_resource_lock:
-            time_since_last_replenish: timedelta = (
-                datetime.now() - self.__last_replenish_time
-            )
-            seconds_since_last_replenish: float = (
-                time_since_last_replenish.total_seconds()
-            )
-            replenish_amount = seconds_since_last_replenish * self.refresh_rate
-            new_total = self._available_resources + replenish_amount
-            self._available_resources = min(new_total, self.capacity)
-            self.__last_replenish_time = datetime.now()
+    def __refresh_resource_count(self) -> None:
+        now = self.__clock()
+        seconds_since_last_replenish = max(now - self.__last_replenish_time, 0)
+        replenish_amount = seconds_since_last_replenish * self.refresh_rate
+        new_total = self._available_resources + replenish_amount
+        self._available_resources = min(new_total, self.capacity)
+        self.__last_replenish_time = now
 
-    async def __calculate_seconds_to_sleep(
-        self, resources_being_consumed: int
+    def __calculate_seconds_to_sleep(
+        self, resources_being_consumed: float
     ) -> float:
         if self.__fill_the_bucket_mode:
             seconds_till_bucket_is_full = (
@@ -202,7 +457,44 @@ class RefreshingBucketRateLimiter:
         else:
             return 0
 
-    async def __add_resource_use_entry(self, resource_amount: int) -> None:
-        async with self.__resource_history_lock:
-            new_entry = ResourceUseEntry(resource_amount, datetime.now())
-            self.__resource_history.append(new_entry)
+    def __add_resource_use_entry(self, resource_amount: float) -> None:
+        now = self.__clock()
+        previous_total = (
+            self.__history_running_totals[-1]
+            if self.__history_running_totals
+            else 0
+        )
+        self.__history_times.append(now)
+        self.__history_running_totals.append(previous_total + resource_amount)
+        self.__remove_expired_history(now)
+
+    def __remove_expired_history(self, now: float) -> None:
+        oldest_time_to_keep = now - self.history_retention_in_seconds
+        self.__history_start = bisect_left(
+            self.__history_times, oldest_time_to_keep, lo=self.__history_start
+        )
+        self.__history_start = max(
+            self.__history_start,
+            len(self.__history_times) - self.max_history_entries,
+        )
+        if self.__history_start * 2 >= len(self.__history_times):
+            if self.__history_start > 0:
+                self.__running_total_before_history = (
+                    self.__history_running_totals[self.__history_start - 1]
+                )
+            del self.__history_times[: self.__history_start]
+            del self.__history_running_totals[: self.__history_start]
+            self.__history_start = 0
+
+    def __get_running_total_before(self, index: int) -> float:
+        if index > 0:
+            return self.__history_running_totals[index - 1]
+        return self.__running_total_before_history
+
+    def __to_clock_time(self, time_point: datetime | float) -> float:
+        if isinstance(time_point, datetime):
+            seconds_since_creation = (
+                time_point - self.__datetime_at_creation
+            ).total_seconds()
+            return self.__clock_at_creation + seconds_since_creation
+        return time_point
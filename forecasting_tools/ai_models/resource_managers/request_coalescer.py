@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Callable, Coroutine, Generic, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _InFlightCall(Generic[T]):
+    def __init__(self, task: asyncio.Task[T]) -> None:
+        self.task = task
+        self.waiters = 0
+        self.result_was_claimed = False
+
+
+class RequestCoalescer(Generic[T]):
+    """
+    Merges identical concurrent calls into one ("singleflight").
+
+    The first caller for a key starts the call, and every caller that asks for
+    the same key while the call is in flight waits on the same result.
+    A waiter being cancelled does not cancel the call for the other waiters.
+    The call is only cancelled if every waiter has been cancelled.
+
+    The first waiter still alive when the call finishes claims its result
+    (e.g. to be charged for it), whether or not it started the call. Every
+    other waiter is told the result was shared.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight_calls: dict[str, _InFlightCall[T]] = {}
+        self.calls_made: int = 0
+        self.calls_coalesced: int = 0
+
+    async def run(
+        self,
+        key: str,
+        coroutine_factory: Callable[[], Coroutine[Any, Any, T]],
+    ) -> tuple[T, bool]:
+        """
+        Returns the result and whether the result was shared, i.e. another
+        waiter already claimed it.
+        """
+        in_flight_call = self._in_flight_calls.get(key)
+        loop = asyncio.get_running_loop()
+        call_was_shared = (
+            in_flight_call is not None
+            and in_flight_call.task.get_loop() is loop
+            and not in_flight_call.task.done()
+        )
+        if not call_was_shared:
+            in_flight_call = self._start_call(key, coroutine_factory)
+            self.calls_made += 1
+        else:
+            self.calls_coalesced += 1
+            logger.debug(f"Coalesced request with in-flight call {key}")
+        assert in_flight_call is not None
+
+        in_flight_call.waiters += 1
+        try:
+            result = await asyncio.shield(in_flight_call.task)
+        except asyncio.CancelledError:
+            in_flight_call.waiters -= 1
+            if in_flight_call.waiters == 0:
+                in_flight_call.task.cancel()
+            raise
+        in_flight_call.waiters -= 1
+        result_was_shared = in_flight_call.result_was_claimed
+        in_flight_call.result_was_claimed = True
+        return result, result_was_shared
+
+    @property
+    def number_of_calls_in_flight(self) -> int:
+        return len(self._in_flight_calls)
+
+    def _start_call(
+        self,
+        key: str,
+        coroutine_factory: Callable[[], Coroutine[Any, Any, T]],
+    ) -> _InFlightCall[T]:
+        task = asyncio.ensure_future(coroutine_factory())
+        in_flight_call = _InFlightCall(task)
+        self._in_flight_calls[key] = in_flight_call
+        task.add_done_callback(
+            lambda finished_task: self._remove_finished_call(
+                key, finished_task
+            )
+        )
+        return in_flight_call
+
+    def _remove_finished_call(
+        self, key: str, finished_task: asyncio.Task[T]
+    ) -> None:
+        in_flight_call = self._in_flight_calls.get(key)
+        if in_flight_call is not None and in_flight_call.task is finished_task:
+            del self._in_flight_calls[key]
+        if not finished_task.cancelled():
+            finished_task.exception()  # Marks the exception as retrieved
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Callable, Final
+
+from forecasting_tools.ai_models.resource_managers.refreshing_bucket_rate_limiter import (
+    LimitReachedResponse,
+    RateLimitAlgorithm,
+    RefreshingBucketRateLimiter,
+    ResourceUnavailableError,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SharedRefreshingBucketRateLimiter:
+    """
+    A RefreshingBucketRateLimiter whose bucket is shared by every process on
+    the host that uses the same `name` and `database_path`, so several bots
+    running against the same API key stay under its limit together.
+
+    The bucket lives in a SQLite database in WAL mode. Each check runs in a
+    `BEGIN IMMEDIATE` transaction, which takes SQLite's write lock on the
+    file, so a refill and acquire can't interleave with another process's.
+    The bucket is refilled by wall clock time (time.time) since the monotonic
+    clock isn't comparable between processes on every platform.
+
+    Waiting callers poll the database at the refill time they were given (at
+    most MAX_SECONDS_BETWEEN_CHECKS apart, since other processes may return
+    resources early). Database calls run in a worker thread so the event
+    loop isn't blocked while another process holds the lock. Synchronous
+    code uses `wait_till_able_to_acquire_resources_sync`, which polls the
+    same way from the calling thread.
+
+    Use `create_rate_limiter` to get a shared limiter when
+    SHARED_RATE_LIMITER_DATABASE_PATH is set and an in-process one otherwise.
+    """
+
+    DATABASE_PATH_ENV_VAR: Final[str] = "SHARED_RATE_LIMITER_DATABASE_PATH"
+    MAX_SECONDS_BETWEEN_CHECKS: Final[float] = 1
+    SECONDS_TO_WAIT_FOR_DATABASE_LOCK: Final[float] = 30
+
+    def __init__(
+        self,
+        name: str,
+        capacity: float,
+        refresh_rate: float,
+        database_path: str,
+        limit_reached_response: LimitReachedResponse = LimitReachedResponse.WAIT,
+        algorithm: RateLimitAlgorithm = RateLimitAlgorithm.FILL_THE_BUCKET,
+    ) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be greater than 0")
+        if refresh_rate < 0:
+            raise ValueError("refresh_rate must not be negative")
+        if algorithm == RateLimitAlgorithm.GCRA and refresh_rate == 0:
+            raise ValueError("GCRA needs a refresh_rate greater than 0")
+        self.name: Final[str] = name
+        self.capacity: Final[float] = capacity
+        self.refresh_rate: Final[float] = refresh_rate
+        self.database_path: Final[str] = database_path
+        self.algorithm: Final[RateLimitAlgorithm] = algorithm
+        self.__limit_reached_response = limit_reached_response
+        self.__create_bucket_if_missing()
+
+    @classmethod
+    def create_rate_limiter(
+        cls,
+        name: str,
+        capacity: float,
+        refresh_rate: float,
+        limit_reached_response: LimitReachedResponse = LimitReachedResponse.WAIT,
+        algorithm: RateLimitAlgorithm = RateLimitAlgorithm.FILL_THE_BUCKET,
+    ) -> RefreshingBucketRateLimiter | SharedRefreshingBucketRateLimiter:
+        database_path = os.getenv(cls.DATABASE_PATH_ENV_VAR)
+        if not database_path:
+            return RefreshingBucketRateLimiter(
+                capacity,
+                refresh_rate,
+                limit_reached_response,
+                algorithm=algorithm,
+            )
+        return cls(
+            name,
+            capacity,
+            refresh_rate,
+            database_path,
+            limit_reached_response=limit_reached_response,
+            algorithm=algorithm,
+        )
+
+    async def wait_till_able_to_acquire_resources(
+        self, resources_being_consumed: int
+    ) -> None:
+        self.__check_resources_fit(resources_being_consumed)
+        while True:
+            seconds_to_wait = await asyncio.to_thread(
+                self.__try_to_acquire, resources_being_consumed
+            )
+            if seconds_to_wait == 0:
+                return
+            await asyncio.sleep(self.__get_seconds_to_sleep(seconds_to_wait))
+
+    def wait_till_able_to_acquire_resources_sync(
+        self, resources_being_consumed: int
+    ) -> None:
+        """
+        Blocks the calling thread until the resources are acquired. Safe to
+        call from several threads at once.
+        """
+        self.__check_resources_fit(resources_being_consumed)
+        while True:
+            seconds_to_wait = self.__try_to_acquire(resources_being_consumed)
+            if seconds_to_wait == 0:
+                return
+            time.sleep(self.__get_seconds_to_sleep(seconds_to_wait))
+
+    def __check_resources_fit(self, resources_being_consumed: int) -> None:
+        if resources_being_consumed > self.capacity:
+            raise ValueError(
+                f"resources_being_consumed must be less than or equal to capacity. Capacity: {self.capacity}, resources_being_consumed: {resources_being_consumed}"
+            )
+
+    def __get_seconds_to_sleep(self, seconds_to_wait: float) -> float:
+        if (
+            self.__limit_reached_response
+            == LimitReachedResponse.RAISE_EXCEPTION
+        ):
+            raise ResourceUnavailableError(
+                "Resources not available. Limit Reached Response is RAISE_EXCEPTION"
+            )
+        if self.refresh_rate == 0:
+            raise RuntimeError(
+                "Resources not available. Would have waited indefinitely. refresh_rate is 0"
+            )
+        return min(seconds_to_wait, self.MAX_SECONDS_BETWEEN_CHECKS)
+
+    async def adjust_resources_used(self, resource_difference: float) -> None:
+        await asyncio.to_thread(self.__adjust_resources, resource_difference)
+
+    def refresh_and_then_get_available_resources(self) -> float:
+        available_resources, _ = self.__run_in_transaction(lambda *_: None)
+        return available_resources
+
+    def zero_out_resources(self) -> None:
+        self.__run_in_transaction(lambda *_: (0, True))
+
+    def __try_to_acquire(self, resources_being_consumed: int) -> float:
+        seconds_to_wait: float = 0
+
+        def acquire(
+            available_resources: float, fill_the_bucket_mode: bool
+        ) -> tuple[float, bool] | None:
+            nonlocal seconds_to_wait
+            resources_are_available = (
+                resources_being_consumed <= available_resources
+            )
+            if resources_are_available and not fill_the_bucket_mode:
+                return available_resources - resources_being_consumed, False
+            if self.algorithm == RateLimitAlgorithm.FILL_THE_BUCKET:
+                fill_the_bucket_mode = True
+                resources_needed = self.capacity
+            else:
+                resources_needed = resources_being_consumed
+            seconds_to_wait = (
+                (resources_needed - available_resources) / self.refresh_rate
+                if self.refresh_rate > 0
+                else float("inf")
+            )
+            return available_resources, fill_the_bucket_mode
+
+        self.__run_in_transaction(acquire)
+        return seconds_to_wait
+
+    def __adjust_resources(self, resource_difference: float) -> None:
+        def adjust(
+            available_resources: float, fill_the_bucket_mode: bool
+        ) -> tuple[float, bool]:
+            new_total = available_resources - resource_difference
+            ran_out = new_total <= 0 and resource_difference > 0
+            return (
+                min(max(new_total, 0), self.capacity),
+                fill_the_bucket_mode or ran_out,
+            )
+
+        self.__run_in_transaction(adjust)
+
+    def __run_in_transaction(
+        self,
+        update: Callable[[float, bool], tuple[float, bool] | None],
+    ) -> tuple[float, bool]:
+        """
+        Refills the shared bucket, then lets `update` return the new
+        (available_resources, fill_the_bucket_mode), or None to keep them.
+        Returns the state that was written.
+        """
+        with closing(self.__connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT available_resources, last_replenish_time, "
+                    "fill_the_bucket_mode FROM buckets WHERE name = ?",
+                    (self.name,),
+                ).fetchone()
+                available_resources, last_replenish_time, fill_mode = row
+                now = time.time()
+                seconds_since_last_replenish = max(
+                    now - last_replenish_time, 0
+                )
+                available_resources = min(
+                    available_resources
+                    + seconds_since_last_replenish * self.refresh_rate,
+                    self.capacity,
+                )
+                fill_the_bucket_mode = bool(fill_mode)
+                if available_resources >= self.capacity:
+                    fill_the_bucket_mode = False
+
+                new_state = update(available_resources, fill_the_bucket_mode)
+                if new_state is not None:
+                    available_resources, fill_the_bucket_mode = new_state
+                if self.algorithm == RateLimitAlgorithm.GCRA:
+                    fill_the_bucket_mode = False
+
+                connection.execute(
+                    "UPDATE buckets SET available_resources = ?, "
+                    "last_replenish_time = ?, fill_the_bucket_mode = ? "
+                    "WHERE name = ?",
+                    (
+                        available_resources,
+                        now,
+                        int(fill_the_bucket_mode),
+                        self.name,
+                    ),
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return available_resources, fill_the_bucket_mode
+
+    def __create_bucket_if_missing(self) -> None:
+        with closing(self.__connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, "
+                "available_resources REAL NOT NULL, "
+                "last_replenish_time REAL NOT NULL, "
+                "fill_the_bucket_mode INTEGER NOT NULL)"
+            )
+            connection.execute(
+                "INSERT OR IGNORE INTO buckets VALUES (?, ?, ?, 0)",
+                (self.name, self.capacity, time.time()),
+            )
+
+    def __connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(
+            self.database_path,
+            timeout=self.SECONDS_TO_WAIT_FOR_DATABASE_LOCK,
+            isolation_level=None,
+        )
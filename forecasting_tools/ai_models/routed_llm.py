@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, AsyncIterator, Callable
+
+from litellm import model_cost
+
+from forecasting_tools.ai_models.ai_utils.response_types import (
+    MultipleTextTokenCostResponse,
+)
+from forecasting_tools.ai_models.ai_utils.retry_policy import RetryPolicy
+from forecasting_tools.ai_models.general_llm import GeneralLlm, ModelInputType
+from forecasting_tools.ai_models.model_interfaces.retryable_model import (
+    RetryableModel,
+)
+from forecasting_tools.ai_models.resource_managers.llm_response_cache import (
+    LlmResponseCache,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RoutedLlm(GeneralLlm):
+    """
+    A GeneralLlm that sends each call to one of several candidate models,
+    and fails over to the next candidate if a call errors.
+
+    Candidates are ranked by a score in "seconds" (lower is better):
+    - the average of their recent p50 and p95 latency
+    - plus `error_rate_penalty_in_seconds` times their recent error rate
+    - plus `seconds_per_dollar_per_million_tokens` times their price from
+    litellm.model_cost
+    Ties go to the candidate listed first. A candidate that failed its last
+    `max_consecutive_failures` calls is only tried after the others.
+
+    Latency and error rates are shared by every GeneralLlm of the same model
+    and endpoint, so a router that is recreated for every call still sees live health.
+    ```
+    llm = RoutedLlm(["gpt-4o", "claude-3-5-sonnet-20241022"], temperature=0.3)
+    searcher = SmartSearcher(model=llm)
+    ```
+    """
+
+    def __init__(
+        self,
+        candidates: list[GeneralLlm | str],
+        allowed_tries: int = RetryableModel._DEFAULT_ALLOWED_TRIES,
+        temperature: float | int | None = 0,
+        response_cache: LlmResponseCache | None = None,
+        retry_policy: RetryPolicy | None = None,
+        error_rate_penalty_in_seconds: float = 60,
+        seconds_per_dollar_per_million_tokens: float = 1,
+        max_consecutive_failures: int = 3,
+    ) -> None:
+        """
+        Candidates given as strings are made into GeneralLlms with the given
+        temperature. Candidates given as GeneralLlms keep their own settings.
+        """
+        if not candidates:
+            raise ValueError("At least one candidate model is required")
+        self.candidates: list[GeneralLlm] = [
+            (
+                candidate
+                if isinstance(candidate, GeneralLlm)
+                else GeneralLlm(model=candidate, temperature=temperature)
+            )
+            for candidate in candidates
+        ]
+        super().__init__(
+            model=self.candidates[0].model,
+            allowed_tries=allowed_tries,
+            temperature=temperature,
+            response_cache=response_cache,
+            retry_policy=retry_policy,
+        )
+        self.error_rate_penalty_in_seconds = error_rate_penalty_in_seconds
+        self.seconds_per_dollar_per_million_tokens = (
+            seconds_per_dollar_per_million_tokens
+        )
+        self.max_consecutive_failures = max_consecutive_failures
+
+    def rank_candidates(self) -> list[GeneralLlm]:
+        known_latencies = [
+            latency
+            for candidate in self.candidates
+            if (latency := self._get_recent_latency(candidate)) is not None
+        ]
+        latency_for_untried_candidates = (
+            min(known_latencies) if known_latencies else 0
+        )
+        scored_candidates = []
+        for index, candidate in enumerate(self.candidates):
+            model_tracker = candidate._get_model_tracker()
+            is_failing = (
+                model_tracker.get_consecutive_failures()
+                >= self.max_consecutive_failures
+            )
+            latency = self._get_recent_latency(candidate)
+            if latency is None:
+                latency = latency_for_untried_candidates
+            error_rate = model_tracker.get_recent_error_rate() or 0
+            score = (
+                latency
+                + error_rate * self.error_rate_penalty_in_seconds
+                + self._get_price_per_million_tokens(candidate)
+                * self.seconds_per_dollar_per_million_tokens
+            )
+            scored_candidates.append((is_failing, score, index, candidate))
+        scored_candidates.sort(key=lambda scored: scored[:3])
+        return [candidate for _, _, _, candidate in scored_candidates]
+
+    def supports_explicit_prompt_caching(self) -> bool:
+        return all(
+            candidate.supports_explicit_prompt_caching()
+            for candidate in self.candidates
+        )
+
+    def supports_structured_output(self) -> bool:
+        return all(
+            candidate.supports_structured_output()
+            for candidate in self.candidates
+        )
+
+    def with_litellm_kwargs(self, **litellm_kwargs: Any) -> RoutedLlm:
+        llm_copy = super().with_litellm_kwargs(**litellm_kwargs)
+        assert isinstance(llm_copy, RoutedLlm)
+        llm_copy.candidates = [
+            candidate.with_litellm_kwargs(**litellm_kwargs)
+            for candidate in self.candidates
+        ]
+        return llm_copy
+
+    async def invoke_stream(
+        self,
+        prompt: ModelInputType,
+        stop_condition: Callable[[str], bool] | None = None,
+    ) -> AsyncIterator[str]:
+        best_candidate = self.rank_candidates()[0]
+        async for new_text in best_candidate.invoke_stream(
+            prompt, stop_condition
+        ):
+            yield new_text
+
+    async def _call_litellm_for_samples(
+        self, messages: list[dict[str, str]], number_of_samples: int
+    ) -> MultipleTextTokenCostResponse:
+        last_error: Exception | None = None
+        for candidate in self.rank_candidates():
+            try:
+                return await candidate._call_litellm_for_samples(
+                    messages, number_of_samples
+                )
+            except Exception as e:
+                logger.warning(
+                    f"Routed call to {candidate.model} failed, trying next candidate: {e}"
+                )
+                last_error = e
+        assert last_error is not None
+        raise last_error
+
+    @staticmethod
+    def _get_recent_latency(candidate: GeneralLlm) -> float | None:
+        model_tracker = candidate._get_model_tracker()
+        p50 = model_tracker.get_recent_latency_percentile(50)
+        p95 = model_tracker.get_recent_latency_percentile(95)
+        if p50 is None or p95 is None:
+            return None
+        return (p50 + p95) / 2
+
+    @staticmethod
+    def _get_price_per_million_tokens(candidate: GeneralLlm) -> float:
+        model_cost_data = model_cost.get(candidate._litellm_model)
+        if model_cost_data is None:
+            return 0
+        input_cost = model_cost_data.get("input_cost_per_token") or 0
+        output_cost = model_cost_data.get("output_cost_per_token") or 0
+        return (input_cost + output_cost) / 2 * 1_000_000
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import statistics
 from typing import Sequence
 
@@ -30,11 +31,15 @@ class BinaryReport(ForecastReport):
             raise ValueError(
                 "Publishing to Metaculus requires a post ID for the question"
             )
-        MetaculusApi.post_binary_question_prediction(
-            self.question.id_of_question, self.prediction
+        await asyncio.to_thread(
+            MetaculusApi.post_binary_question_prediction,
+            self.question.id_of_question,
+            self.prediction,
         )
-        MetaculusApi.post_question_comment(
-            self.question.id_of_post, self.explanation
+        await asyncio.to_thread(
+            MetaculusApi.post_question_comment,
+            self.question.id_of_post,
+            self.explanation,
         )
 
     @classmethod
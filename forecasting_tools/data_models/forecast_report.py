@@ -23,6 +23,7 @@ class ResearchWithPredictions(BaseModel, Generic[T]):
     research_report: str
     summary_report: str
     errors: list[str] = Field(default_factory=list)
+    notes: list[str] = Field(default_factory=list)
     predictions: list[ReasonedPrediction[T]]
 
 
@@ -1,3 +1,5 @@
+import asyncio
+
 from pydantic import BaseModel, Field
 
 from forecasting_tools.data_models.forecast_report import ForecastReport
@@ -37,11 +39,15 @@ class MultipleChoiceReport(ForecastReport):
             raise ValueError(
                 "Publishing to Metaculus requires a post ID for the question"
             )
-        MetaculusApi.post_multiple_choice_question_prediction(
-            self.question.id_of_question, options_with_probabilities
+        await asyncio.to_thread(
+            MetaculusApi.post_multiple_choice_question_prediction,
+            self.question.id_of_question,
+            options_with_probabilities,
         )
-        MetaculusApi.post_question_comment(
-            self.question.id_of_post, self.explanation
+        await asyncio.to_thread(
+            MetaculusApi.post_question_comment,
+            self.question.id_of_post,
+            self.explanation,
         )
 
     @classmethod
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 
 import numpy as np
@@ -272,9 +273,13 @@ class NumericReport(ForecastReport):
             raise ValueError(
                 "Publishing to Metaculus requires a post ID for the question"
             )
-        MetaculusApi.post_numeric_question_prediction(
-            self.question.id_of_question, cdf_probabilities
+        await asyncio.to_thread(
+            MetaculusApi.post_numeric_question_prediction,
+            self.question.id_of_question,
+            cdf_probabilities,
         )
-        MetaculusApi.post_question_comment(
-            self.question.id_of_post, self.explanation
+        await asyncio.to_thread(
+            MetaculusApi.post_question_comment,
+            self.question.id_of_post,
+            self.explanation,
         )
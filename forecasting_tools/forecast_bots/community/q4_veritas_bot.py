@@ -115,7 +115,9 @@ class Q4VeritasBot(Q3TemplateBot2024):
             You write your rationale and then the last thing you write is your final answer as: "Probability: ZZ%", 0-100
             """
         )
-        gpt_forecast = await self.FINAL_DECISION_LLM.invoke(prompt)
+        gpt_forecast = await self._invoke_llm_for_forecast(
+            self.FINAL_DECISION_LLM, prompt
+        )
         prediction = PredictionExtractor.extract_last_percentage_value(
             gpt_forecast, max_prediction=0.95, min_prediction=0.05
         )
@@ -90,8 +90,8 @@ class Q1TemplateBotWithConvertToBinary(Q1TemplateBot2025):
             """
         )
 
-        final_distribution = await self._get_final_decision_llm().invoke(
-            consistency_prompt
+        final_distribution = await self._invoke_llm_for_forecast(
+            self._get_final_decision_llm(), consistency_prompt
         )
         prediction = (
             PredictionExtractor.extract_option_list_with_percentage_afterwards(
@@ -211,8 +211,8 @@ class Q1TemplateBotWithConvertToBinary(Q1TemplateBot2025):
             """
         )
 
-        final_distribution = await self._get_final_decision_llm().invoke(
-            consistency_prompt
+        final_distribution = await self._invoke_llm_for_forecast(
+            self._get_final_decision_llm(), consistency_prompt
         )
         prediction = PredictionExtractor.extract_numeric_distribution_from_list_of_percentile_number_and_probability(
             final_distribution, question
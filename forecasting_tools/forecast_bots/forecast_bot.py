@@ -1,17 +1,25 @@
 import asyncio
+import functools
 import inspect
 import logging
 import os
+import threading
 import time
 from abc import ABC, abstractmethod
+from contextvars import ContextVar
 from datetime import datetime
+from itertools import combinations
 from typing import Any, Coroutine, Sequence, TypeVar, cast, overload
 
 from exceptiongroup import ExceptionGroup
 from pydantic import BaseModel
 
 from forecasting_tools.ai_models.ai_utils.ai_misc import clean_indents
-from forecasting_tools.ai_models.general_llm import GeneralLlm
+from forecasting_tools.ai_models.ai_utils.token_counting import TokenCounter
+from forecasting_tools.ai_models.general_llm import CacheablePrompt, GeneralLlm
+from forecasting_tools.ai_models.resource_managers.llm_response_cache import (
+    LlmResponseCache,
+)
 from forecasting_tools.ai_models.resource_managers.monetary_cost_manager import (
     MonetaryCostManager,
 )
@@ -36,6 +44,10 @@ from forecasting_tools.data_models.questions import (
     NumericQuestion,
 )
 from forecasting_tools.forecast_helpers.metaculus_api import MetaculusApi
+from forecasting_tools.forecast_helpers.research_context_packer import (
+    ResearchContextPacker,
+)
+from forecasting_tools.util.http_clients import SharedHttpClients
 
 T = TypeVar("T")
 
@@ -55,11 +67,215 @@ class ScratchPad(BaseModel):
     note_entries: dict[str, str] = {}
 
 
+class _SharedSampleBatch:
+    def __init__(
+        self, samples_task: asyncio.Future[list[str]], number_of_samples: int
+    ) -> None:
+        self.samples_task = samples_task
+        self.number_of_samples = number_of_samples
+        self.samples_claimed = 0
+
+    def has_unclaimed_samples(self) -> bool:
+        return self.samples_claimed < self.number_of_samples
+
+    def claim_sample(self) -> int:
+        sample_index = self.samples_claimed
+        self.samples_claimed += 1
+        return sample_index
+
+
+class _CheapStage:
+    def __init__(self, cheap_llm: GeneralLlm) -> None:
+        self.cheap_llm = cheap_llm
+        self.cheap_llm_was_used = False
+
+
+class ForecastCascade:
+    """
+    Runs the forecasts of each research report on a cheap model first, and
+    only escalates to the bot's own (expensive) models when the cheap
+    samples disagree or fail.
+
+    The cheap samples disagree when
+    - binary: the spread between the highest and lowest probability is above
+    `max_binary_spread`
+    - multiple choice: the total variation distance between any two samples
+    is above `max_multiple_choice_divergence`
+    - numeric: the mean absolute distance between the CDFs of any two
+    samples is above `max_numeric_cdf_distance`
+
+    A research report with any failed cheap sample (e.g. a prediction could
+    not be extracted) is escalated too, unless `escalate_on_errors` is False.
+    Disagreement needs at least two samples, so set
+    predictions_per_research_report above 1 and give the cheap model a
+    temperature above 0.
+
+    The cheap model replaces the model given to
+    `ForecastBot._invoke_llm_for_forecast`, so only forecasts that get their
+    reasoning through it are cascaded. If the cheap stage never called it,
+    its predictions came from the bot's own models and are kept as they are
+    instead of being made a second time. Whether each research report was
+    escalated (and why) is written to the report's `other_notes`.
+    """
+
+    _cheap_stage_in_use: ContextVar[_CheapStage | None] = ContextVar(
+        "_cheap_stage_in_use", default=None
+    )
+
+    def __init__(
+        self,
+        cheap_llm: GeneralLlm | None = None,
+        max_binary_spread: float = 0.15,
+        max_multiple_choice_divergence: float = 0.2,
+        max_numeric_cdf_distance: float = 0.1,
+        escalate_on_errors: bool = True,
+    ) -> None:
+        self.cheap_llm = cheap_llm or GeneralLlm(
+            model="gpt-4o-mini", temperature=0.7
+        )
+        self.max_binary_spread = max_binary_spread
+        self.max_multiple_choice_divergence = max_multiple_choice_divergence
+        self.max_numeric_cdf_distance = max_numeric_cdf_distance
+        self.escalate_on_errors = escalate_on_errors
+
+    def __repr__(self) -> str:
+        return (
+            f"ForecastCascade(cheap_llm={self.cheap_llm.model!r}, "
+            f"max_binary_spread={self.max_binary_spread}, "
+            f"max_multiple_choice_divergence={self.max_multiple_choice_divergence}, "
+            f"max_numeric_cdf_distance={self.max_numeric_cdf_distance})"
+        )
+
+    @classmethod
+    def swap_in_cheap_llm(cls, llm: GeneralLlm) -> GeneralLlm:
+        """
+        Returns the cheap model while a cheap stage is running (and records
+        that it was used), and `llm` otherwise
+        """
+        cheap_stage = cls._cheap_stage_in_use.get()
+        if cheap_stage is None:
+            return llm
+        cheap_stage.cheap_llm_was_used = True
+        return cheap_stage.cheap_llm
+
+    async def run_cheap(
+        self, coroutine: Coroutine[Any, Any, T]
+    ) -> tuple[T, bool]:
+        """
+        Runs the coroutine with the cheap model in place of the forecasting
+        model. Also returns whether the cheap model was used at all.
+        """
+        cheap_stage = _CheapStage(self.cheap_llm)
+        token = self._cheap_stage_in_use.set(cheap_stage)
+        try:
+            result = await coroutine
+        finally:
+            self._cheap_stage_in_use.reset(token)
+        return result, cheap_stage.cheap_llm_was_used
+
+    def get_escalation_reason(
+        self, predictions: Sequence[PredictionTypes], errors: list[str]
+    ) -> str | None:
+        """
+        Returns why the cheap predictions should be escalated, or None if
+        they can be kept
+        """
+        if not predictions:
+            return "no cheap prediction succeeded"
+        if errors and self.escalate_on_errors:
+            return f"{len(errors)} cheap predictions failed"
+        disagreement, threshold = self.measure_disagreement(predictions)
+        if disagreement > threshold:
+            return (
+                f"cheap predictions disagree by {disagreement:.3f} "
+                f"(threshold {threshold})"
+            )
+        return None
+
+    def measure_disagreement(
+        self, predictions: Sequence[PredictionTypes]
+    ) -> tuple[float, float]:
+        """
+        Returns the disagreement between the predictions and the threshold
+        above which they are escalated
+        """
+        first_prediction = predictions[0]
+        if isinstance(first_prediction, PredictedOptionList):
+            return (
+                self._max_pairwise_distance(
+                    predictions, self._total_variation_distance
+                ),
+                self.max_multiple_choice_divergence,
+            )
+        if isinstance(first_prediction, NumericDistribution):
+            return (
+                self._max_pairwise_distance(
+                    predictions, self._mean_cdf_distance
+                ),
+                self.max_numeric_cdf_distance,
+            )
+        if isinstance(first_prediction, (int, float)):
+            probabilities = cast(list[float], list(predictions))
+            return (
+                max(probabilities) - min(probabilities),
+                self.max_binary_spread,
+            )
+        raise ValueError(f"Unknown prediction type: {type(first_prediction)}")
+
+    @staticmethod
+    def _max_pairwise_distance(
+        predictions: Sequence[Any], distance_function: Any
+    ) -> float:
+        return max(
+            (
+                distance_function(first, second)
+                for first, second in combinations(predictions, 2)
+            ),
+            default=0,
+        )
+
+    @staticmethod
+    def _total_variation_distance(
+        first: PredictedOptionList, second: PredictedOptionList
+    ) -> float:
+        first_probabilities = {
+            option.option_name: option.probability
+            for option in first.predicted_options
+        }
+        second_probabilities = {
+            option.option_name: option.probability
+            for option in second.predicted_options
+        }
+        option_names = set(first_probabilities) | set(second_probabilities)
+        return 0.5 * sum(
+            abs(
+                first_probabilities.get(name, 0)
+                - second_probabilities.get(name, 0)
+            )
+            for name in option_names
+        )
+
+    @staticmethod
+    def _mean_cdf_distance(
+        first: NumericDistribution, second: NumericDistribution
+    ) -> float:
+        first_cdf = first.cdf
+        second_cdf = second.cdf
+        return sum(
+            abs(first_point.percentile - second_point.percentile)
+            for first_point, second_point in zip(first_cdf, second_cdf)
+        ) / max(len(first_cdf), 1)
+
+
 class ForecastBot(ABC):
     """
     Base class for all forecasting bots.
     """
 
+    # Tokenizers are warmed up once per process, not on every bot creation
+    _models_with_tokenizer_warm_up: set[str] = set()
+    _tokenizer_warm_up_lock = threading.Lock()
+
     def __init__(
         self,
         *,
@@ -69,7 +285,21 @@ class ForecastBot(ABC):
         publish_reports_to_metaculus: bool = False,
         folder_to_save_reports_to: str | None = None,
         skip_previously_forecasted_questions: bool = False,
+        use_multi_sample_generation: bool = False,
+        research_context_packer: ResearchContextPacker | None = None,
+        forecast_cascade: ForecastCascade | None = None,
     ) -> None:
+        """
+        If use_multi_sample_generation is True, forecasts that get their
+        reasoning through `_invoke_llm_for_forecast` share one request for
+        all predictions_per_research_report samples of a research report
+        (when the provider supports `n`).
+        If a research_context_packer is given, research is fit into the token
+        budget of the bot's FINAL_DECISION_LLM before it is given to the
+        forecast functions. By default research is not packed.
+        With a forecast_cascade, each research report is forecast on the
+        cascade's cheap model first (see ForecastCascade).
+        """
         assert (
             research_reports_per_question > 0
         ), "Must run at least one research report"
@@ -86,8 +316,73 @@ class ForecastBot(ABC):
         self.skip_previously_forecasted_questions = (
             skip_previously_forecasted_questions
         )
+        self.use_multi_sample_generation = use_multi_sample_generation
+        self.research_context_packer = research_context_packer
+        self._summary_packer = (
+            research_context_packer or ResearchContextPacker()
+        )
+        self.forecast_cascade = forecast_cascade
         self._scratch_pads: list[ScratchPad] = []
         self._scratch_pad_lock = asyncio.Lock()
+        self._shared_sample_batches: dict[str, _SharedSampleBatch] = {}
+        self.__start_tokenizer_warm_up()
+
+    @property
+    def _llms(self) -> list[GeneralLlm]:
+        """
+        The GeneralLlms the bot is configured with: GeneralLlm attributes of
+        the bot or its class (e.g. FINAL_DECISION_LLM) and the cheap model of
+        its forecast_cascade
+        """
+        candidates = [
+            *[
+                value
+                for bot_class in reversed(type(self).__mro__)
+                for value in vars(bot_class).values()
+            ],
+            *vars(self).values(),
+        ]
+        if self.forecast_cascade is not None:
+            candidates.append(self.forecast_cascade.cheap_llm)
+        llms: list[GeneralLlm] = []
+        for candidate in candidates:
+            if isinstance(candidate, GeneralLlm) and all(
+                candidate is not llm for llm in llms
+            ):
+                llms.append(candidate)
+        return llms
+
+    def _get_model_to_pack_research_for(
+        self, research_context_packer: ResearchContextPacker
+    ) -> str:
+        """
+        Research is packed for the model that forecasts with it, the bot's
+        FINAL_DECISION_LLM. Bots without one use the packer's model.
+        """
+        final_decision_llm = getattr(self, "FINAL_DECISION_LLM", None)
+        if isinstance(final_decision_llm, GeneralLlm):
+            return final_decision_llm.model
+        return research_context_packer.model
+
+    def _get_models_to_warm_up(self) -> list[str]:
+        """
+        Models whose tokenizers are loaded in the background when the bot is
+        created, so the first call to each is not stalled by loading them
+        """
+        models = [llm.model for llm in self._llms]
+        models.append(self._summary_packer.model)
+        return list(dict.fromkeys(models))
+
+    def __start_tokenizer_warm_up(self) -> None:
+        with ForecastBot._tokenizer_warm_up_lock:
+            models = [
+                model
+                for model in self._get_models_to_warm_up()
+                if model not in ForecastBot._models_with_tokenizer_warm_up
+            ]
+            ForecastBot._models_with_tokenizer_warm_up.update(models)
+        if models:
+            TokenCounter.start_background_warm_up(models)
 
     def get_config(self) -> dict[str, str]:
         params = inspect.signature(self.__init__).parameters
@@ -116,8 +411,9 @@ class ForecastBot(ABC):
         tournament_id: int | str,
         return_exceptions: bool = False,
     ) -> list[ForecastReport] | list[ForecastReport | BaseException]:
-        questions = MetaculusApi.get_all_open_questions_from_tournament(
-            tournament_id
+        questions = await asyncio.to_thread(
+            MetaculusApi.get_all_open_questions_from_tournament,
+            tournament_id,
         )
         return await self.forecast_questions(questions, return_exceptions)
 
@@ -178,13 +474,16 @@ class ForecastBot(ABC):
                 )
             questions = unforecasted_questions
         reports: list[ForecastReport | BaseException] = []
-        reports = await asyncio.gather(
-            *[
-                self._run_individual_question_with_error_propagation(question)
-                for question in questions
-            ],
-            return_exceptions=return_exceptions,
-        )
+        async with SharedHttpClients.open():
+            reports = await asyncio.gather(
+                *[
+                    self._run_individual_question_with_error_propagation(
+                        question
+                    )
+                    for question in questions
+                ],
+                return_exceptions=return_exceptions,
+            )
         if self.folder_to_save_reports_to:
             non_exception_reports = [
                 report
@@ -209,10 +508,15 @@ class ForecastBot(ABC):
         self, question: MetaculusQuestion, research: str
     ) -> str:
         logger.info(f"Summarizing research for question: {question.page_url}")
-        default_summary_size = 2500
-        default_summary = f"{research[:default_summary_size]}..."
+        default_summary_size_in_tokens = 625
+        default_summary = await asyncio.to_thread(
+            self._summary_packer.pack,
+            question.question_text,
+            research,
+            max_tokens=default_summary_size_in_tokens,
+        )
 
-        if len(research) < default_summary_size:
+        if default_summary == research:
             return research
 
         if os.getenv("OPENAI_API_KEY"):
@@ -223,6 +527,12 @@ class ForecastBot(ABC):
             return default_summary
 
         try:
+            research_for_summary = await asyncio.to_thread(
+                self._summary_packer.pack,
+                question.question_text,
+                research,
+                model=model.model,
+            )
             prompt = clean_indents(
                 f"""
                 Please summarize the following research in 1-2 paragraphs. The report tries to help answer the following question:
@@ -235,14 +545,14 @@ class ForecastBot(ABC):
                 Do not make up links.
 
                 The research is:
-                {research}
+                {research_for_summary}
                 """
             )
             summary = await model.invoke(prompt)
             return summary
         except Exception as e:
             logger.debug(
-                f"Could not summarize research. Defaulting to first {default_summary_size} characters: {e}"
+                f"Could not summarize research. Defaulting to the {default_summary_size_in_tokens} most useful tokens of it: {e}"
             )
             return default_summary
 
@@ -292,6 +602,11 @@ class ForecastBot(ABC):
                 for error in prediction_set.errors
             ]
             all_errors = research_errors + prediction_errors
+            all_notes = [
+                note
+                for prediction_set in valid_prediction_set
+                for note in prediction_set.notes
+            ]
 
             report_type = DataOrganizer.get_report_type_for_question_type(
                 type(question)
@@ -323,6 +638,7 @@ class ForecastBot(ABC):
             price_estimate=final_cost,
             minutes_taken=time_spent_in_minutes,
             errors=all_errors,
+            other_notes="\n".join(all_notes) or None,
         )
         if self.publish_reports_to_metaculus:
             await report.publish_report_to_metaculus()
@@ -354,11 +670,18 @@ class ForecastBot(ABC):
     ) -> ResearchWithPredictions[PredictionTypes]:
         research = await self.run_research(question)
         summary_report = await self.summarize_research(question, research)
-        research_to_use = (
-            summary_report
-            if self.use_research_summary_to_forecast
-            else research
-        )
+        research_to_use = research
+        if self.use_research_summary_to_forecast:
+            research_to_use = summary_report
+        elif self.research_context_packer is not None:
+            research_to_use = await asyncio.to_thread(
+                self.research_context_packer.pack,
+                question.question_text,
+                research,
+                model=self._get_model_to_pack_research_for(
+                    self.research_context_packer
+                ),
+            )
 
         if isinstance(question, BinaryQuestion):
             forecast_function = lambda q, r: self._run_forecast_on_binary(q, r)
@@ -375,16 +698,22 @@ class ForecastBot(ABC):
         else:
             raise ValueError(f"Unknown question type: {type(question)}")
 
-        tasks = cast(
-            list[Coroutine[Any, Any, ReasonedPrediction[Any]]],
-            [
-                forecast_function(question, research_to_use)
-                for _ in range(self.predictions_per_research_report)
-            ],
-        )
-        valid_predictions, errors, exception_group = (
-            await self._gather_results_and_exceptions(tasks)
-        )
+        notes: list[str] = []
+        if self.forecast_cascade is None:
+            valid_predictions, errors, exception_group = (
+                await self._make_predictions(
+                    question, research_to_use, forecast_function
+                )
+            )
+        else:
+            valid_predictions, errors, exception_group, notes = (
+                await self._make_cascaded_predictions(
+                    self.forecast_cascade,
+                    question,
+                    research_to_use,
+                    forecast_function,
+                )
+            )
         if errors:
             logger.warning(f"Encountered errors while predicting: {errors}")
         if len(valid_predictions) == 0:
@@ -397,9 +726,137 @@ class ForecastBot(ABC):
             research_report=research,
             summary_report=summary_report,
             errors=errors,
+            notes=notes,
             predictions=valid_predictions,
         )
 
+    async def _make_predictions(
+        self,
+        question: MetaculusQuestion,
+        research: str,
+        forecast_function: Any,
+    ) -> tuple[
+        list[ReasonedPrediction[Any]], list[str], ExceptionGroup | None
+    ]:
+        tasks = cast(
+            list[Coroutine[Any, Any, ReasonedPrediction[Any]]],
+            [
+                forecast_function(question, research)
+                for _ in range(self.predictions_per_research_report)
+            ],
+        )
+        return await self._gather_results_and_exceptions(tasks)
+
+    async def _make_cascaded_predictions(
+        self,
+        cascade: ForecastCascade,
+        question: MetaculusQuestion,
+        research: str,
+        forecast_function: Any,
+    ) -> tuple[
+        list[ReasonedPrediction[Any]],
+        list[str],
+        ExceptionGroup | None,
+        list[str],
+    ]:
+        cheap_results, cheap_llm_was_used = await cascade.run_cheap(
+            self._make_predictions(question, research, forecast_function)
+        )
+        cheap_predictions, cheap_errors, cheap_exception_group = cheap_results
+        cheap_model = cascade.cheap_llm.model
+        if not cheap_llm_was_used:
+            note = (
+                f"Cascade: skipped because the forecasts never called "
+                f"_invoke_llm_for_forecast, so {cheap_model} was not used"
+            )
+            logger.warning(f"{note} for question {question.page_url}")
+            return (
+                cheap_predictions,
+                cheap_errors,
+                cheap_exception_group,
+                [note],
+            )
+        escalation_reason = cascade.get_escalation_reason(
+            [prediction.prediction_value for prediction in cheap_predictions],
+            cheap_errors,
+        )
+        if escalation_reason is None:
+            note = (
+                f"Cascade: kept {len(cheap_predictions)} predictions "
+                f"from {cheap_model}"
+            )
+            logger.info(f"{note} for question {question.page_url}")
+            return (
+                cheap_predictions,
+                cheap_errors,
+                cheap_exception_group,
+                [note],
+            )
+
+        note = f"Cascade: escalated from {cheap_model} because {escalation_reason}"
+        if cheap_errors:
+            note += f". Cheap model errors: {cheap_errors}"
+        logger.info(f"{note} for question {question.page_url}")
+        predictions, errors, exception_group = await self._make_predictions(
+            question, research, forecast_function
+        )
+        return predictions, errors, exception_group, [note]
+
+    async def _invoke_llm_for_forecast(
+        self, llm: GeneralLlm, prompt: str | CacheablePrompt
+    ) -> str:
+        """
+        Returns the llm's response to a forecasting prompt.
+        Prompts that share a long prefix (question details and research) with
+        other forecasts should be given as a CacheablePrompt, so providers can
+        reuse the prefix from their prompt cache.
+        With use_multi_sample_generation on, the forecasts of a research report
+        that send the same prompt to an llm with the same settings (model,
+        temperature, base_url, etc.) get their reasoning from one request for
+        predictions_per_research_report samples.
+        Each forecast still extracts its own ReasonedPrediction.
+        While a ForecastCascade runs its cheap stage, the cheap model is
+        called instead of `llm`.
+        """
+        llm = ForecastCascade.swap_in_cheap_llm(llm)
+        number_of_samples = self.predictions_per_research_report
+        if not self.use_multi_sample_generation or number_of_samples == 1:
+            return await llm.invoke(prompt)
+
+        batch_key = LlmResponseCache.make_key(
+            llm.litellm_kwargs, llm.model_input_to_message(prompt)
+        )
+        batch = self._shared_sample_batches.get(batch_key)
+        if batch is None or not batch.has_unclaimed_samples():
+            samples_task = asyncio.ensure_future(
+                llm.invoke_and_return_multiple_samples(
+                    prompt, number_of_samples
+                )
+            )
+            batch = _SharedSampleBatch(samples_task, number_of_samples)
+            self._shared_sample_batches[batch_key] = batch
+            # Samples nobody claimed by the time the request finishes are
+            # dropped, so later forecasts never get samples from an old run
+            samples_task.add_done_callback(
+                functools.partial(
+                    self._remove_shared_sample_batch, batch_key, batch
+                )
+            )
+        sample_index = batch.claim_sample()
+        if not batch.has_unclaimed_samples():
+            del self._shared_sample_batches[batch_key]
+        samples = await asyncio.shield(batch.samples_task)
+        return samples[sample_index]
+
+    def _remove_shared_sample_batch(
+        self,
+        batch_key: str,
+        batch: _SharedSampleBatch,
+        samples_task: asyncio.Future[list[str]],
+    ) -> None:
+        if self._shared_sample_batches.get(batch_key) is batch:
+            del self._shared_sample_batches[batch_key]
+
     @abstractmethod
     async def _run_forecast_on_binary(
         self, question: BinaryQuestion, research: str
@@ -4,7 +4,8 @@ import os
 from datetime import datetime
 
 from forecasting_tools.ai_models.ai_utils.ai_misc import clean_indents
-from forecasting_tools.ai_models.general_llm import GeneralLlm
+from forecasting_tools.ai_models.general_llm import CacheablePrompt, GeneralLlm
+from forecasting_tools.ai_models.routed_llm import RoutedLlm
 from forecasting_tools.data_models.forecast_report import ReasonedPrediction
 from forecasting_tools.data_models.multiple_choice_report import (
     PredictedOptionList,
@@ -56,6 +57,8 @@ class Q1TemplateBot2025(ForecastBot):
 
     _max_concurrent_questions = 2  # Set this to whatever works for your search-provider/ai-model rate limits
     _concurrency_limiter = asyncio.Semaphore(_max_concurrent_questions)
+    ROUTE_FINAL_DECISION_LLM = False  # Set to True to route between every provider with a key (see RoutedLlm) instead of using the first one
+    _routed_final_decision_llm: RoutedLlm | None = None
 
     async def run_research(self, question: MetaculusQuestion) -> str:
         async with self._concurrency_limiter:
@@ -127,60 +130,76 @@ class Q1TemplateBot2025(ForecastBot):
         return response
 
     def _get_final_decision_llm(self) -> GeneralLlm:
-        model = None
+        if self._routed_final_decision_llm is not None:
+            return self._routed_final_decision_llm
+        candidates: list[GeneralLlm] = []
         if os.getenv("OPENAI_API_KEY"):
-            model = GeneralLlm(model="gpt-4o", temperature=0.3)
-        elif os.getenv("ANTHROPIC_API_KEY"):
-            model = GeneralLlm(
-                model="claude-3-5-sonnet-20241022", temperature=0.3
+            candidates.append(GeneralLlm(model="gpt-4o", temperature=0.3))
+        if os.getenv("ANTHROPIC_API_KEY"):
+            candidates.append(
+                GeneralLlm(model="claude-3-5-sonnet-20241022", temperature=0.3)
             )
-        elif os.getenv("OPENROUTER_API_KEY"):
-            model = GeneralLlm(
-                model="openrouter/openai/gpt-4o", temperature=0.3
+        if os.getenv("OPENROUTER_API_KEY"):
+            candidates.append(
+                GeneralLlm(model="openrouter/openai/gpt-4o", temperature=0.3)
             )
-        elif os.getenv("METACULUS_TOKEN"):
-            model = GeneralLlm(model="metaculus/gpt-4o", temperature=0.3)
-        else:
+        if os.getenv("METACULUS_TOKEN"):
+            candidates.append(
+                GeneralLlm(model="metaculus/gpt-4o", temperature=0.3)
+            )
+        if not candidates:
             raise ValueError("No API key for final_decision_llm found")
-        return model
+        if not self.ROUTE_FINAL_DECISION_LLM or len(candidates) == 1:
+            return candidates[0]
+        self._routed_final_decision_llm = RoutedLlm(
+            candidates, temperature=0.3
+        )
+        return self._routed_final_decision_llm
 
     async def _run_forecast_on_binary(
         self, question: BinaryQuestion, research: str
     ) -> ReasonedPrediction[float]:
-        prompt = clean_indents(
-            f"""
-            You are a professional forecaster interviewing for a job.
-
-            Your interview question is:
-            {question.question_text}
+        prompt = CacheablePrompt(
+            stable_prefix=clean_indents(
+                f"""
+                You are a professional forecaster interviewing for a job.
 
-            Question background:
-            {question.background_info}
+                Your interview question is:
+                {question.question_text}
 
+                Question background:
+                {question.background_info}
 
-            This question's outcome will be determined by the specific criteria below. These criteria have not yet been satisfied:
-            {question.resolution_criteria}
 
-            {question.fine_print}
+                This question's outcome will be determined by the specific criteria below. These criteria have not yet been satisfied:
+                {question.resolution_criteria}
 
+                {question.fine_print}
 
-            Your research assistant says:
-            {research}
 
-            Today is {datetime.now().strftime("%Y-%m-%d")}.
+                Your research assistant says:
+                {research}
 
-            Before answering you write:
-            (a) The time left until the outcome to the question is known.
-            (b) The status quo outcome if nothing changed.
-            (c) A brief description of a scenario that results in a No outcome.
-            (d) A brief description of a scenario that results in a Yes outcome.
+                Today is {datetime.now().strftime("%Y-%m-%d")}.
+                """
+            ),
+            variable_suffix=clean_indents(
+                """
+                Before answering you write:
+                (a) The time left until the outcome to the question is known.
+                (b) The status quo outcome if nothing changed.
+                (c) A brief description of a scenario that results in a No outcome.
+                (d) A brief description of a scenario that results in a Yes outcome.
 
-            You write your rationale remembering that good forecasters put extra weight on the status quo outcome since the world changes slowly most of the time.
+                You write your rationale remembering that good forecasters put extra weight on the status quo outcome since the world changes slowly most of the time.
 
-            The last thing you write is your final answer as: "Probability: ZZ%", 0-100
-            """
+                The last thing you write is your final answer as: "Probability: ZZ%", 0-100
+                """
+            ),
+        )
+        reasoning = await self._invoke_llm_for_forecast(
+            self._get_final_decision_llm(), prompt
         )
-        reasoning = await self._get_final_decision_llm().invoke(prompt)
         prediction: float = PredictionExtractor.extract_last_percentage_value(
             reasoning, max_prediction=1, min_prediction=0
         )
@@ -194,44 +213,51 @@ class Q1TemplateBot2025(ForecastBot):
     async def _run_forecast_on_multiple_choice(
         self, question: MultipleChoiceQuestion, research: str
     ) -> ReasonedPrediction[PredictedOptionList]:
-        prompt = clean_indents(
-            f"""
-            You are a professional forecaster interviewing for a job.
+        prompt = CacheablePrompt(
+            stable_prefix=clean_indents(
+                f"""
+                You are a professional forecaster interviewing for a job.
 
-            Your interview question is:
-            {question.question_text}
+                Your interview question is:
+                {question.question_text}
 
-            The options are: {question.options}
+                The options are: {question.options}
 
 
-            Background:
-            {question.background_info}
+                Background:
+                {question.background_info}
 
-            {question.resolution_criteria}
+                {question.resolution_criteria}
 
-            {question.fine_print}
+                {question.fine_print}
 
 
-            Your research assistant says:
-            {research}
+                Your research assistant says:
+                {research}
 
-            Today is {datetime.now().strftime("%Y-%m-%d")}.
+                Today is {datetime.now().strftime("%Y-%m-%d")}.
+                """
+            ),
+            variable_suffix=clean_indents(
+                f"""
+                Before answering you write:
+                (a) The time left until the outcome to the question is known.
+                (b) The status quo outcome if nothing changed.
+                (c) A description of an scenario that results in an unexpected outcome.
 
-            Before answering you write:
-            (a) The time left until the outcome to the question is known.
-            (b) The status quo outcome if nothing changed.
-            (c) A description of an scenario that results in an unexpected outcome.
+                You write your rationale remembering that (1) good forecasters put extra weight on the status quo outcome since the world changes slowly most of the time, and (2) good forecasters leave some moderate probability on most options to account for unexpected outcomes.
 
-            You write your rationale remembering that (1) good forecasters put extra weight on the status quo outcome since the world changes slowly most of the time, and (2) good forecasters leave some moderate probability on most options to account for unexpected outcomes.
-
-            The last thing you write is your final probabilities for the N options in this order {question.options} as:
-            Option_A: Probability_A
-            Option_B: Probability_B
-            ...
-            Option_N: Probability_N
-            """
+                The last thing you write is your final probabilities for the N options in this order {question.options} as:
+                Option_A: Probability_A
+                Option_B: Probability_B
+                ...
+                Option_N: Probability_N
+                """
+            ),
+        )
+        reasoning = await self._invoke_llm_for_forecast(
+            self._get_final_decision_llm(), prompt
         )
-        reasoning = await self._get_final_decision_llm().invoke(prompt)
         prediction: PredictedOptionList = (
             PredictionExtractor.extract_option_list_with_percentage_afterwards(
                 reasoning, question.options
@@ -250,56 +276,63 @@ class Q1TemplateBot2025(ForecastBot):
         upper_bound_message, lower_bound_message = (
             self._create_upper_and_lower_bound_messages(question)
         )
-        prompt = clean_indents(
-            f"""
-            You are a professional forecaster interviewing for a job.
-
-            Your interview question is:
-            {question.question_text}
-
-            Background:
-            {question.background_info}
-
-            {question.resolution_criteria}
-
-            {question.fine_print}
-
-
-            Your research assistant says:
-            {research}
-
-            Today is {datetime.now().strftime("%Y-%m-%d")}.
-
-            {lower_bound_message}
-            {upper_bound_message}
-
-            Formatting Instructions:
-            - Please notice the units requested (e.g. whether you represent a number as 1,000,000 or 1m).
-            - Never use scientific notation.
-            - Always start with a smaller number (more negative if negative) and then increase from there
-
-            Before answering you write:
-            (a) The time left until the outcome to the question is known.
-            (b) The outcome if nothing changed.
-            (c) The outcome if the current trend continued.
-            (d) The expectations of experts and markets.
-            (e) A brief description of an unexpected scenario that results in a low outcome.
-            (f) A brief description of an unexpected scenario that results in a high outcome.
-
-            You remind yourself that good forecasters are humble and set wide 90/10 confidence intervals to account for unknown unknowns.
-
-            The last thing you write is your final answer as:
-            "
-            Percentile 10: XX
-            Percentile 20: XX
-            Percentile 40: XX
-            Percentile 60: XX
-            Percentile 80: XX
-            Percentile 90: XX
-            "
-            """
+        prompt = CacheablePrompt(
+            stable_prefix=clean_indents(
+                f"""
+                You are a professional forecaster interviewing for a job.
+
+                Your interview question is:
+                {question.question_text}
+
+                Background:
+                {question.background_info}
+
+                {question.resolution_criteria}
+
+                {question.fine_print}
+
+
+                Your research assistant says:
+                {research}
+
+                Today is {datetime.now().strftime("%Y-%m-%d")}.
+                """
+            ),
+            variable_suffix=clean_indents(
+                f"""
+                {lower_bound_message}
+                {upper_bound_message}
+
+                Formatting Instructions:
+                - Please notice the units requested (e.g. whether you represent a number as 1,000,000 or 1m).
+                - Never use scientific notation.
+                - Always start with a smaller number (more negative if negative) and then increase from there
+
+                Before answering you write:
+                (a) The time left until the outcome to the question is known.
+                (b) The outcome if nothing changed.
+                (c) The outcome if the current trend continued.
+                (d) The expectations of experts and markets.
+                (e) A brief description of an unexpected scenario that results in a low outcome.
+                (f) A brief description of an unexpected scenario that results in a high outcome.
+
+                You remind yourself that good forecasters are humble and set wide 90/10 confidence intervals to account for unknown unknowns.
+
+                The last thing you write is your final answer as:
+                "
+                Percentile 10: XX
+                Percentile 20: XX
+                Percentile 40: XX
+                Percentile 60: XX
+                Percentile 80: XX
+                Percentile 90: XX
+                "
+                """
+            ),
+        )
+        reasoning = await self._invoke_llm_for_forecast(
+            self._get_final_decision_llm(), prompt
         )
-        reasoning = await self._get_final_decision_llm().invoke(prompt)
         prediction: NumericDistribution = (
             PredictionExtractor.extract_numeric_distribution_from_list_of_percentile_number_and_probability(
                 reasoning, question
@@ -82,7 +82,9 @@ class Q3TemplateBot2024(ForecastBot):
             You write your rationale and then the last thing you write is your final answer as: "Probability: ZZ%", 0-100
             """
         )
-        reasoning = await self.FINAL_DECISION_LLM.invoke(prompt)
+        reasoning = await self._invoke_llm_for_forecast(
+            self.FINAL_DECISION_LLM, prompt
+        )
         prediction = PredictionExtractor.extract_last_percentage_value(
             reasoning, max_prediction=0.99, min_prediction=0.01
         )
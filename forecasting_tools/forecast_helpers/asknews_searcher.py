@@ -8,9 +8,14 @@ from datetime import datetime
 from typing import Any, AsyncGenerator, Dict, List, Literal, Optional, Union
 from urllib.parse import quote, urlencode
 
-import httpx
 from httpx import Auth, Request
 
+from forecasting_tools.ai_models.resource_managers.rate_limiter_registry import (
+    RateLimiterRegistry,
+)
+from forecasting_tools.util.cassette import Cassette
+from forecasting_tools.util.http_clients import SharedHttpClients
+
 # NOTE: Until there is more need for asknews endpoints, this is a custom implementation
 # That does not use the SDK. As of Feb 1 2025 there were dependency conflicts
 # due to asknews dependencies
@@ -66,7 +71,7 @@ class OAuth2ClientCredentials(Auth):
             > (self.token_expires - 15)  # 15 seconds before expiration
         ):
             token_request = self._build_token_request()
-            async with httpx.AsyncClient() as client:
+            async with SharedHttpClients.httpx_client() as client:
                 response = await client.send(token_request)
                 response.raise_for_status()
                 data = response.json()
@@ -156,7 +161,10 @@ class AskNewsSearcher:
         self.base_url = "https://api.asknews.app/v1"
         self.token_url = "https://auth.asknews.app/oauth2/token"
 
-        if not self.client_id or not self.client_secret:
+        if Cassette.is_replaying():
+            self.client_id = self.client_id or ""
+            self.client_secret = self.client_secret or ""
+        elif not self.client_id or not self.client_secret:
             raise ValueError("ASKNEWS_CLIENT_ID or ASKNEWS_SECRET is not set")
 
         self.auth = OAuth2ClientCredentials(
@@ -225,15 +233,30 @@ class AskNewsSearcher:
 
         params = {k: v for k, v in params.items() if v is not None}
 
-        async with httpx.AsyncClient(auth=self.auth) as client:
+        url = f"{self.base_url}/news/search"
+        data = await Cassette.record_or_replay_async(
+            "asknews",
+            {"url": url, "params": params},
+            lambda: self._get_from_api(url, params),
+        )
+        return SearchResponse(
+            as_string=data.get("as_string"), as_dicts=data.get("as_dicts")
+        )
+
+    async def _get_from_api(self, url: str, params: dict) -> dict:
+        rate_limiter = RateLimiterRegistry.get_limiter(
+            RateLimiterRegistry.make_name(
+                "asknews", "requests", self.client_id
+            )
+        )
+        if rate_limiter is not None:
+            await rate_limiter.wait_till_able_to_acquire_resources(1)
+        async with SharedHttpClients.httpx_client() as client:
             response = await client.get(
-                f"{self.base_url}/news/search",
+                url,
                 params=params,
                 headers={"Accept": "application/json"},
+                auth=self.auth,
             )
             response.raise_for_status()
-            data = response.json()
-
-            return SearchResponse(
-                as_string=data.get("as_string"), as_dicts=data.get("as_dicts")
-            )
+            return response.json()
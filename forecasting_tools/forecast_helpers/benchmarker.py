@@ -2,11 +2,15 @@ import inspect
 import logging
 import subprocess
 import time
+from contextlib import nullcontext
 from datetime import datetime
 from typing import Sequence
 
 import typeguard
 
+from forecasting_tools.ai_models.resource_managers.llm_batch_executor import (
+    LlmBatchExecutor,
+)
 from forecasting_tools.ai_models.resource_managers.monetary_cost_manager import (
     MonetaryCostManager,
 )
@@ -28,6 +32,10 @@ class Benchmarker:
     Lower than 100 can differentiate between bots of large skill differences,
     but not between bots of small skill differences. But even with 100 there is
     ~30% of the 'worse bot' winning if there are not large skill differences.
+
+    If an llm_batch_executor is given, LLM calls that can be batched are sent
+    through the provider's Batch API (see LlmBatchExecutor). This is cheaper
+    but slower, so raise concurrent_question_batch_size to fill each batch.
     """
 
     def __init__(
@@ -37,6 +45,7 @@ class Benchmarker:
         questions_to_use: Sequence[MetaculusQuestion] | None = None,
         file_path_to_save_reports: str | None = None,
         concurrent_question_batch_size: int = 10,
+        llm_batch_executor: LlmBatchExecutor | None = None,
     ) -> None:
         if (
             number_of_questions_to_use is not None
@@ -61,6 +70,7 @@ class Benchmarker:
         self.file_path_to_save_reports = file_path_to_save_reports
         self.initialization_timestamp = datetime.now()
         self.concurrent_question_batch_size = concurrent_question_batch_size
+        self.llm_batch_executor = llm_batch_executor
 
     async def run_benchmark(self) -> list[BenchmarkForBot]:
         if self.questions_to_use is None:
@@ -102,7 +112,10 @@ class Benchmarker:
             benchmarks.append(benchmark)
 
         for bot, benchmark in zip(self.forecast_bots, benchmarks):
-            with MonetaryCostManager() as cost_manager:
+            with (
+                MonetaryCostManager() as cost_manager,
+                self.llm_batch_executor or nullcontext(),
+            ):
                 start_time = time.time()
                 for batch in self._batch_questions(
                     chosen_questions, self.concurrent_question_batch_size
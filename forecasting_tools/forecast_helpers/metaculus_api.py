@@ -14,6 +14,9 @@ import requests
 import typeguard
 from pydantic import BaseModel
 
+from forecasting_tools.ai_models.resource_managers.rate_limiter_registry import (
+    RateLimiterRegistry,
+)
 from forecasting_tools.data_models.questions import (
     BinaryQuestion,
     DateQuestion,
@@ -21,6 +24,8 @@ from forecasting_tools.data_models.questions import (
     MultipleChoiceQuestion,
     NumericQuestion,
 )
+from forecasting_tools.util.cassette import Cassette
+from forecasting_tools.util.http_clients import SharedHttpClients
 from forecasting_tools.util.misc import raise_for_status_with_additional_info
 
 logger = logging.getLogger(__name__)
@@ -50,15 +55,15 @@ class MetaculusApi:
 
     @classmethod
     def post_question_comment(cls, post_id: int, comment_text: str) -> None:
-        response = requests.post(
+        response = cls._send_request(
+            "POST",
             f"{cls.API_BASE_URL}/comments/create/",
-            json={
+            json_body={
                 "on_post": post_id,
                 "text": comment_text,
                 "is_private": True,
                 "included_forecast": True,
             },
-            **cls._get_auth_headers(),  # type: ignore
         )
         logger.info(f"Posted comment on post {post_id}")
         raise_for_status_with_additional_info(response)
@@ -126,10 +131,7 @@ class MetaculusApi:
     def get_question_by_post_id(cls, post_id: int) -> MetaculusQuestion:
         logger.info(f"Retrieving question details for question {post_id}")
         url = f"{cls.API_BASE_URL}/posts/{post_id}/"
-        response = requests.get(
-            url,
-            **cls._get_auth_headers(),  # type: ignore
-        )
+        response = cls._send_request("GET", url)
         raise_for_status_with_additional_info(response)
         json_question = json.loads(response.content)
         metaculus_question = MetaculusApi._metaculus_api_json_to_question(
@@ -222,20 +224,75 @@ class MetaculusApi:
             raise ValueError("METACULUS_TOKEN environment variable not set")
         return {"headers": {"Authorization": f"Token {METACULUS_TOKEN}"}}
 
+    @classmethod
+    def _send_request(
+        cls,
+        method: Literal["GET", "POST"],
+        url: str,
+        params: dict[str, Any] | None = None,
+        json_body: Any = None,
+    ) -> requests.Response:
+        """
+        Sends a request with the Metaculus auth headers. If a Cassette is
+        active, the response is recorded or replayed (see Cassette).
+        Requests wait on the "metaculus:requests" limit if one is configured
+        in the RateLimiterRegistry.
+        """
+
+        def send() -> dict[str, Any]:
+            rate_limiter = RateLimiterRegistry.get_limiter(
+                RateLimiterRegistry.make_name(
+                    "metaculus", "requests", os.getenv("METACULUS_TOKEN")
+                )
+            )
+            if rate_limiter is not None:
+                rate_limiter.wait_till_able_to_acquire_resources_sync(1)
+            response = SharedHttpClients.requests_session().request(
+                method,
+                url,
+                params=params,
+                json=json_body,
+                **cls._get_auth_headers(),  # type: ignore
+            )
+            return {
+                "status_code": response.status_code,
+                "reason": response.reason,
+                "url": response.url,
+                "text": response.text,
+            }
+
+        recorded_response = Cassette.record_or_replay(
+            "metaculus",
+            {
+                "method": method,
+                "url": url,
+                "params": params,
+                "json": json_body,
+            },
+            send,
+        )
+        response = requests.Response()
+        response.status_code = recorded_response["status_code"]
+        response.reason = recorded_response["reason"]
+        response.url = recorded_response["url"]
+        response._content = recorded_response["text"].encode()
+        response.encoding = "utf-8"
+        return response
+
     @classmethod
     def _post_question_prediction(
         cls, question_id: int, forecast_payload: dict
     ) -> None:
         url = f"{cls.API_BASE_URL}/questions/forecast/"
-        response = requests.post(
+        response = cls._send_request(
+            "POST",
             url,
-            json=[
+            json_body=[
                 {
                     "question": question_id,
                     **forecast_payload,
                 },
             ],
-            **cls._get_auth_headers(),  # type: ignore
         )
         logger.info(f"Posted prediction on question {question_id}")
         raise_for_status_with_additional_info(response)
@@ -250,7 +307,7 @@ class MetaculusApi:
             or num_requested <= cls.MAX_QUESTIONS_FROM_QUESTION_API_PER_REQUEST
         ), "You cannot get more than 100 questions at a time"
         url = f"{cls.API_BASE_URL}/posts/"
-        response = requests.get(url, params=params, **cls._get_auth_headers())  # type: ignore
+        response = cls._send_request("GET", url, params=params)
         raise_for_status_with_additional_info(response)
         data = json.loads(response.content)
         results = data["results"]
@@ -46,6 +46,14 @@ class PredictionExtractor:
                 f"Could not extract prediction from response. The text was: {text}"
             )
 
+    @staticmethod
+    def final_probability_is_stated(text: str) -> bool:
+        """
+        Checks for a final answer in the form "Probability: ZZ%".
+        Useful as a stop condition when streaming a binary forecast.
+        """
+        return bool(re.search(r"Probability:\s*\d+(?:\.\d+)?\s*%", text))
+
     @staticmethod
     def extract_option_list_with_percentage_afterwards(
         text: str, options: list[str]
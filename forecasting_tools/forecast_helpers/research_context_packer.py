@@ -0,0 +1,384 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime
+
+import litellm
+
+from forecasting_tools.ai_models.ai_utils.token_counting import TokenCounter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _ResearchChunk:
+    text: str
+    report_index: int
+    position: int
+    score: float = 0
+    tokens: int = 0
+
+
+class ResearchContextPacker:
+    """
+    Fits research into a token budget before it is pasted into a prompt.
+
+    The research is split into chunks (a markdown section, or part of one if
+    the section is long). Chunks that repeat a chunk seen earlier, within a
+    report or across several reports, are dropped. The rest are ranked by
+    - relevance: how many of the question's keywords they mention
+    - recency: how recent the latest date they mention is
+    - citation density: how many links they have per 100 words
+    and the best ones are kept until the budget is full. Kept chunks are put
+    back in their original order.
+
+    The budget is `fraction_of_context_window` of the target model's input
+    context, capped at `max_tokens`. If the model's context window is not
+    known and no `max_tokens` is set, the research is not cut. Tokens are
+    counted with the model's tokenizer. Research that already fits and has
+    no duplicates is returned unchanged.
+    ```
+    packer = ResearchContextPacker(model="gpt-4o", max_tokens=8000)
+    research = packer.pack(question.question_text, [asknews_report, exa_report])
+    ```
+    """
+
+    CHUNK_SEPARATOR = "\n\n"
+    NEAR_DUPLICATE_SIMILARITY = 0.8
+    SHINGLE_SIZE_IN_WORDS = 5
+    RECENCY_HALF_LIFE_IN_DAYS = 30
+    CITATIONS_PER_100_WORDS_FOR_FULL_SCORE = 2
+    MIN_KEYWORD_LENGTH = 4
+    STOP_WORDS: set[str] = {
+        "will",
+        "what",
+        "when",
+        "which",
+        "with",
+        "that",
+        "this",
+        "than",
+        "there",
+        "their",
+        "from",
+        "have",
+        "been",
+        "before",
+        "after",
+        "more",
+        "less",
+        "least",
+        "most",
+        "does",
+        "into",
+        "about",
+        "over",
+        "under",
+        "between",
+        "according",
+    }
+    LINK_PATTERN = r"\[[^\]]*\]\([^)]+\)|https?://\S+"
+    DATE_PATTERNS: list[tuple[str, list[str]]] = [
+        (r"\b\d{4}-\d{2}-\d{2}\b", ["%Y-%m-%d"]),
+        (
+            r"\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.? \d{1,2},? \d{4}\b",
+            ["%B %d %Y", "%b %d %Y"],
+        ),
+        (
+            r"\b\d{1,2} (?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.? \d{4}\b",
+            ["%d %B %Y", "%d %b %Y"],
+        ),
+    ]
+
+    def __init__(
+        self,
+        model: str = "gpt-4o",
+        max_tokens: int | None = None,
+        fraction_of_context_window: float = 0.5,
+        max_chunk_characters: int = 1500,
+        relevance_weight: float = 1,
+        recency_weight: float = 0.5,
+        citation_weight: float = 0.5,
+    ) -> None:
+        if max_tokens is not None and max_tokens <= 0:
+            raise ValueError("max_tokens must be greater than 0")
+        if not 0 < fraction_of_context_window <= 1:
+            raise ValueError(
+                "fraction_of_context_window must be in the range (0, 1]"
+            )
+        if max_chunk_characters <= 0:
+            raise ValueError("max_chunk_characters must be greater than 0")
+        self.model = model
+        self.max_tokens = max_tokens
+        self.fraction_of_context_window = fraction_of_context_window
+        self.max_chunk_characters = max_chunk_characters
+        self.relevance_weight = relevance_weight
+        self.recency_weight = recency_weight
+        self.citation_weight = citation_weight
+
+    def __repr__(self) -> str:
+        return (
+            f"ResearchContextPacker(model={self.model!r}, "
+            f"max_tokens={self.max_tokens}, "
+            f"fraction_of_context_window={self.fraction_of_context_window})"
+        )
+
+    def get_token_budget(self, model: str | None = None) -> int | None:
+        """
+        Returns None if the model's context window is unknown and no
+        max_tokens is set
+        """
+        model = model or self.model
+        context_window = self._get_context_window(model)
+        if context_window is None:
+            return self.max_tokens
+        budget = int(context_window * self.fraction_of_context_window)
+        if self.max_tokens is not None:
+            budget = min(budget, self.max_tokens)
+        return budget
+
+    def pack(
+        self,
+        question_text: str,
+        research: str | list[str],
+        model: str | None = None,
+        max_tokens: int | None = None,
+        now: datetime | None = None,
+    ) -> str:
+        """
+        Returns the research (several reports are joined) cut down to the
+        token budget of `model` (the packer's model by default), or to
+        `max_tokens` if it is given. Without a budget the joined research is
+        returned as is.
+        """
+        model = model or self.model
+        reports = [research] if isinstance(research, str) else research
+        budget = (
+            max_tokens
+            if max_tokens is not None
+            else self.get_token_budget(model)
+        )
+        full_text = self.CHUNK_SEPARATOR.join(
+            report for report in reports if report.strip()
+        )
+        if budget is None:
+            logger.debug(
+                f"Unknown context window for {model}. Research is not packed"
+            )
+            return full_text
+        chunks = self._split_into_chunks(reports)
+        unique_chunks = self._remove_duplicate_chunks(chunks)
+        if len(unique_chunks) == len(chunks) and (
+            TokenCounter.approximate_tokens(full_text) <= budget // 2
+            or TokenCounter.count_text_tokens(model, full_text) <= budget
+        ):
+            return full_text
+
+        keywords = self._get_keywords(question_text)
+        reference_date = now or datetime.now()
+        for chunk in unique_chunks:
+            chunk.score = self._score_chunk(
+                chunk.text, keywords, reference_date
+            )
+            chunk.tokens = TokenCounter.count_text_tokens(model, chunk.text)
+
+        separator_tokens = TokenCounter.approximate_tokens(
+            self.CHUNK_SEPARATOR
+        )
+        kept_chunks: list[_ResearchChunk] = []
+        tokens_used = 0
+        for chunk in sorted(
+            unique_chunks, key=lambda chunk: (-chunk.score, chunk.position)
+        ):
+            chunk_cost = chunk.tokens + separator_tokens
+            if tokens_used + chunk_cost <= budget:
+                kept_chunks.append(chunk)
+                tokens_used += chunk_cost
+
+        logger.info(
+            f"Packed research into {tokens_used} of {budget} tokens for "
+            f"{model}: kept {len(kept_chunks)} of {len(chunks)} chunks "
+            f"({len(chunks) - len(unique_chunks)} duplicates dropped)"
+        )
+        kept_chunks.sort(key=lambda chunk: chunk.position)
+        return self.CHUNK_SEPARATOR.join(chunk.text for chunk in kept_chunks)
+
+    def _split_into_chunks(self, reports: list[str]) -> list[_ResearchChunk]:
+        """
+        Splits each report at its markdown headings, and splits sections
+        longer than `max_chunk_characters` at paragraphs (or sentences).
+        A heading stays with the text that follows it.
+        """
+        chunk_texts: list[tuple[int, str]] = []
+        for report_index, report in enumerate(reports):
+            current_chunk = ""
+            for paragraph in re.split(r"\n\s*\n", report):
+                paragraph = paragraph.strip()
+                if not paragraph:
+                    continue
+                if current_chunk and paragraph.startswith("#"):
+                    chunk_texts.append((report_index, current_chunk))
+                    current_chunk = ""
+                for piece in self._split_long_paragraph(paragraph):
+                    too_long = (
+                        len(current_chunk) + len(piece)
+                        > self.max_chunk_characters
+                    )
+                    if (
+                        current_chunk
+                        and too_long
+                        and not self._is_heading(current_chunk)
+                    ):
+                        chunk_texts.append((report_index, current_chunk))
+                        current_chunk = ""
+                    current_chunk = (
+                        f"{current_chunk}{self.CHUNK_SEPARATOR}{piece}"
+                        if current_chunk
+                        else piece
+                    )
+            if current_chunk:
+                chunk_texts.append((report_index, current_chunk))
+        return [
+            _ResearchChunk(text=text, report_index=report_index, position=i)
+            for i, (report_index, text) in enumerate(chunk_texts)
+        ]
+
+    def _split_long_paragraph(self, paragraph: str) -> list[str]:
+        if len(paragraph) <= self.max_chunk_characters:
+            return [paragraph]
+        pieces: list[str] = []
+        current_piece = ""
+        for sentence in re.split(r"(?<=[.!?])\s+|\n", paragraph):
+            if current_piece and (
+                len(current_piece) + len(sentence) + 1
+                > self.max_chunk_characters
+            ):
+                pieces.append(current_piece)
+                current_piece = ""
+            current_piece = (
+                f"{current_piece} {sentence}" if current_piece else sentence
+            )
+        if current_piece:
+            pieces.append(current_piece)
+        return pieces
+
+    def _remove_duplicate_chunks(
+        self, chunks: list[_ResearchChunk]
+    ) -> list[_ResearchChunk]:
+        unique_chunks: list[_ResearchChunk] = []
+        seen_hashes: set[str] = set()
+        seen_shingles: list[set[tuple[str, ...]]] = []
+        for chunk in chunks:
+            words = self._normalize(chunk.text).split()
+            text_hash = hashlib.sha256(" ".join(words).encode()).hexdigest()
+            if text_hash in seen_hashes:
+                continue
+            shingles = self._make_shingles(words)
+            if any(
+                self._jaccard_similarity(shingles, other)
+                >= self.NEAR_DUPLICATE_SIMILARITY
+                for other in seen_shingles
+            ):
+                continue
+            seen_hashes.add(text_hash)
+            seen_shingles.append(shingles)
+            unique_chunks.append(chunk)
+        return unique_chunks
+
+    def _score_chunk(
+        self, text: str, keywords: set[str], reference_date: datetime
+    ) -> float:
+        return (
+            self.relevance_weight * self._score_relevance(text, keywords)
+            + self.recency_weight * self._score_recency(text, reference_date)
+            + self.citation_weight * self._score_citation_density(text)
+        )
+
+    def _score_relevance(self, text: str, keywords: set[str]) -> float:
+        if not keywords:
+            return 0
+        chunk_words = set(self._normalize(text).split())
+        return len(keywords & chunk_words) / len(keywords)
+
+    def _score_recency(self, text: str, reference_date: datetime) -> float:
+        dates = self._find_dates(text)
+        if not dates:
+            return 0
+        age_in_days = max((reference_date - max(dates)).days, 0)
+        return 0.5 ** (age_in_days / self.RECENCY_HALF_LIFE_IN_DAYS)
+
+    def _score_citation_density(self, text: str) -> float:
+        citations = len(re.findall(self.LINK_PATTERN, text))
+        words = max(len(text.split()), 1)
+        citations_per_100_words = citations * 100 / words
+        return min(
+            citations_per_100_words
+            / self.CITATIONS_PER_100_WORDS_FOR_FULL_SCORE,
+            1,
+        )
+
+    def _find_dates(self, text: str) -> list[datetime]:
+        dates: list[datetime] = []
+        for pattern, date_formats in self.DATE_PATTERNS:
+            for match in re.findall(pattern, text):
+                cleaned_match = re.sub(
+                    r"\bSept\b", "Sep", match.replace(",", "").replace(".", "")
+                )
+                for date_format in date_formats:
+                    try:
+                        dates.append(
+                            datetime.strptime(cleaned_match, date_format)
+                        )
+                        break
+                    except ValueError:
+                        continue
+        return dates
+
+    def _get_keywords(self, question_text: str) -> set[str]:
+        return {
+            word
+            for word in self._normalize(question_text).split()
+            if len(word) >= self.MIN_KEYWORD_LENGTH
+            and word not in self.STOP_WORDS
+        }
+
+    def _make_shingles(self, words: list[str]) -> set[tuple[str, ...]]:
+        size = self.SHINGLE_SIZE_IN_WORDS
+        if len(words) <= size:
+            return {tuple(words)}
+        return {
+            tuple(words[i : i + size]) for i in range(len(words) - size + 1)
+        }
+
+    @staticmethod
+    def _jaccard_similarity(
+        first: set[tuple[str, ...]], second: set[tuple[str, ...]]
+    ) -> float:
+        if not first or not second:
+            return 0
+        return len(first & second) / len(first | second)
+
+    @staticmethod
+    def _is_heading(text: str) -> bool:
+        return text.startswith("#") and "\n" not in text
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+    @staticmethod
+    def _get_context_window(model: str) -> int | None:
+        model_names = [model, model.split("/", 1)[-1], model.split("/")[-1]]
+        for model_name in model_names:
+            model_info = litellm.model_cost.get(model_name)
+            if not model_info:
+                continue
+            context_window = model_info.get(
+                "max_input_tokens"
+            ) or model_info.get("max_tokens")
+            if context_window:
+                return int(context_window)
+        return None
@@ -4,13 +4,13 @@ import os
 import random
 
 import numpy as np
-import requests
 from openai import OpenAI
 from sklearn.metrics.pairwise import cosine_similarity
 
 from forecasting_tools.ai_models.ai_utils.ai_misc import clean_indents
 from forecasting_tools.ai_models.configured_llms import BasicLlm
 from forecasting_tools.forecast_helpers.smart_searcher import SmartSearcher
+from forecasting_tools.util.http_clients import SharedHttpClients
 from forecasting_tools.util.misc import raise_for_status_with_additional_info
 
 logger = logging.getLogger(__name__)
@@ -147,7 +147,7 @@ class Deduplicator:
             return True
 
         is_semantically_duplicate = (
-            cls.__determine_if_text_is_duplicate_semantically(
+            await cls.__determine_if_text_is_duplicate_semantically(
                 item, list_to_check, threshold_for_initial_semantic_check
             )
         )
@@ -189,8 +189,10 @@ class Deduplicator:
     ) -> list[str]:
         deduplicated_items: list[str] = []
         for item in items:
-            is_duplicate = cls.__determine_if_text_is_duplicate_semantically(
-                item, deduplicated_items, threshold
+            is_duplicate = (
+                await cls.__determine_if_text_is_duplicate_semantically(
+                    item, deduplicated_items, threshold
+                )
             )
             if not is_duplicate:
                 deduplicated_items.append(item)
@@ -201,7 +203,7 @@ class Deduplicator:
         return deduplicated_items
 
     @classmethod
-    def __determine_if_text_is_duplicate_semantically(
+    async def __determine_if_text_is_duplicate_semantically(
         cls,
         text: str,
         list_to_compare_to: list[str],
@@ -213,15 +215,17 @@ class Deduplicator:
         """
         texts_to_get_embeddings_for = [text] + list_to_compare_to
         try:
-            embeddings = cls.__get_embeddings_using_huggingface(
-                texts_to_get_embeddings_for
+            embeddings = await asyncio.to_thread(
+                cls.__get_embeddings_using_huggingface,
+                texts_to_get_embeddings_for,
             )
         except Exception as e:
             logger.warning(
                 f"Could not get embeddings using huggingface. Instead now getting embeddings with OpenAI. Error: {e}"
             )
-            embeddings = cls.__get_embeddings_using_openai(
-                texts_to_get_embeddings_for
+            embeddings = await asyncio.to_thread(
+                cls.__get_embeddings_using_openai,
+                texts_to_get_embeddings_for,
             )
 
         text_embedding = embeddings[0]
@@ -263,7 +267,7 @@ class Deduplicator:
         headers = {"Authorization": f"Bearer {api_key}"}
 
         def query(texts: list[str]) -> list[list[float]]:
-            response = requests.post(
+            response = SharedHttpClients.requests_session().post(
                 api_url,
                 headers=headers,
                 json={"inputs": texts, "options": {"wait_for_model": True}},
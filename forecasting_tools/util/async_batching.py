@@ -5,6 +5,12 @@ from typing import Any, Callable, Coroutine, TypeVar
 import nest_asyncio
 from aiolimiter import AsyncLimiter
 
+from forecasting_tools.ai_models.resource_managers.rate_limiter_registry import (
+    NamedRateLimiter,
+    RateLimit,
+    RateLimiterRegistry,
+)
+
 logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
@@ -17,10 +23,23 @@ def wrap_coroutines_with_rate_limit(
     coroutine_list: list[Coroutine[Any, Any, T]],
     calls_per_period: int,
     time_period_in_seconds: int = 60,
+    limiter_name: str | None = None,
 ) -> list[Coroutine[Any, Any, T]]:
     """
-    Rate Limiting is only applied to the coroutines in the list, and not between calls of this function.
+    Without a limiter_name, rate limiting is only applied to the coroutines in the list, and not between calls of this function.
+    With a limiter_name (e.g. "exa:requests"), the coroutines share the named limiter in the RateLimiterRegistry with every other call site using that name.
+    The registry's configured limit is used if there is one, otherwise calls_per_period per time_period_in_seconds.
     """
+    if limiter_name is not None:
+        named_limiter = RateLimiterRegistry.get_limiter(
+            limiter_name,
+            default_limit=RateLimit(calls_per_period, time_period_in_seconds),
+        )
+        assert named_limiter is not None
+        return [
+            apply_named_limiter_to_coroutine(coroutine, named_limiter)
+            for coroutine in coroutine_list
+        ]
     limiter = AsyncLimiter(
         max_rate=calls_per_period, time_period=time_period_in_seconds
     )
@@ -37,6 +56,13 @@ async def apply_limiter_to_coroutine(
     return await coroutine
 
 
+async def apply_named_limiter_to_coroutine(
+    coroutine: Coroutine, limiter: NamedRateLimiter
+) -> Any:
+    await limiter.wait_till_able_to_acquire_resources(1)
+    return await coroutine
+
+
 def wrap_coroutines_with_timeout(
     coroutine_list: list[Coroutine[Any, Any, T]], timeout_time: float
 ) -> list[Coroutine[Any, Any, T]]:
@@ -83,9 +109,10 @@ def wrap_coroutines_with_limit_timeout_and_returning_exceptions(
     calls_per_period: int,
     time_period: int = 60,
     timeout_time: float = 120,
+    limiter_name: str | None = None,
 ) -> list[Coroutine[Any, Any, T | Exception]]:
     rate_limited_coroutines = wrap_coroutines_with_rate_limit(
-        coroutine_list, calls_per_period, time_period
+        coroutine_list, calls_per_period, time_period, limiter_name
     )
     limited_and_timed_coroutines = wrap_coroutines_with_timeout(
         rate_limited_coroutines, timeout_time
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Literal, TypeVar
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CassetteMissError(Exception):
+    """
+    Raised in replay mode when no recording matches a request
+    """
+
+
+class Cassette:
+    """
+    Records outbound model and search requests with their responses, and
+    replays them later without touching the network.
+
+    Use the cassette as a context manager (like the LlmResponseCache). In
+    "record" mode every GeneralLlm, ExaSearcher, AskNewsSearcher and
+    MetaculusApi call made inside the block is sent as usual and saved. In
+    "replay" mode the saved response is returned instead, and a request with
+    no recording raises a CassetteMissError.
+    ```
+    with Cassette("logs/cassettes/q1_run.sqlite", mode="record"):
+        await benchmarker.run_benchmark()
+
+    with Cassette("logs/cassettes/q1_run.sqlite", mode="replay"):
+        await benchmarker.run_benchmark()  # No network, no cost
+    ```
+
+    Requests are matched by a hash of their JSON after each of the
+    `normalizers` has been applied to it. By default dates are removed so a
+    run recorded yesterday replays today even though prompts say "Today is
+    ...". The same request made several times (e.g. samples at temperature
+    above 0) is recorded once per occurrence and replayed in the same order,
+    wrapping around if the replay asks for it more often than it was recorded.
+
+    Credentials are not part of the recorded requests. In replay mode no
+    credentials are needed.
+    """
+
+    _active_cassettes: ContextVar[list[Cassette]] = ContextVar(
+        "_active_cassettes", default=[]
+    )
+    DATE_PATTERNS: list[str] = [
+        r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?",
+        r"(?:January|February|March|April|May|June|July|August|September|October|November|December)"
+        r" \d{1,2},? \d{4}(?: \d{1,2}:\d{2} ?(?:AM|PM))?",
+    ]
+
+    def __init__(
+        self,
+        file_path: str = "logs/cassettes/cassette.sqlite",
+        mode: Literal["record", "replay"] = "replay",
+        normalizers: list[Callable[[str], str]] | None = None,
+    ) -> None:
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Mode must be 'record' or 'replay', not {mode}")
+        self.file_path = file_path
+        self.mode = mode
+        self.normalizers = (
+            normalizers if normalizers is not None else [self.remove_dates]
+        )
+        self.recorded = 0
+        self.replayed = 0
+        self._occurrences: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._connection = self._create_connection(file_path)
+
+    def __enter__(self) -> Cassette:
+        active_cassettes = self._active_cassettes.get().copy()
+        active_cassettes.append(self)
+        self._active_cassettes.set(active_cassettes)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:  # NOSONAR
+        active_cassettes = self._active_cassettes.get().copy()
+        active_cassettes.remove(self)
+        self._active_cassettes.set(active_cassettes)
+
+    @classmethod
+    def get_active_cassette(cls) -> Cassette | None:
+        active_cassettes = cls._active_cassettes.get()
+        if not active_cassettes:
+            return None
+        return active_cassettes[-1]
+
+    @classmethod
+    def is_replaying(cls) -> bool:
+        cassette = cls.get_active_cassette()
+        return cassette is not None and cassette.mode == "replay"
+
+    @classmethod
+    async def record_or_replay_async(
+        cls,
+        source: str,
+        request: dict[str, Any],
+        call: Callable[[], Awaitable[T]],
+        response_type: type[BaseModel] | None = None,
+    ) -> T:
+        """
+        Runs `call` and records its response if a cassette is recording,
+        returns the recorded response if one is replaying, and otherwise just
+        runs `call`. Responses must be JSON serializable, or instances of
+        `response_type` if it is given.
+        """
+        cassette = cls.get_active_cassette()
+        if cassette is None:
+            return await call()
+        request_hash, occurrence = cassette._claim_occurrence(source, request)
+        if cassette.mode == "replay":
+            return cassette._replay(
+                source, request_hash, occurrence, response_type
+            )
+        response = await call()
+        cassette._record(source, request, request_hash, occurrence, response)
+        return response
+
+    @classmethod
+    def record_or_replay(
+        cls,
+        source: str,
+        request: dict[str, Any],
+        call: Callable[[], T],
+        response_type: type[BaseModel] | None = None,
+    ) -> T:
+        """
+        Blocking version of `record_or_replay_async`
+        """
+        cassette = cls.get_active_cassette()
+        if cassette is None:
+            return call()
+        request_hash, occurrence = cassette._claim_occurrence(source, request)
+        if cassette.mode == "replay":
+            return cassette._replay(
+                source, request_hash, occurrence, response_type
+            )
+        response = call()
+        cassette._record(source, request, request_hash, occurrence, response)
+        return response
+
+    @classmethod
+    def remove_dates(cls, text: str) -> str:
+        for pattern in cls.DATE_PATTERNS:
+            text = re.sub(pattern, "<date>", text)
+        return text
+
+    def make_request_hash(self, source: str, request: dict[str, Any]) -> str:
+        request_json = json.dumps(
+            {"source": source, "request": request},
+            sort_keys=True,
+            default=str,
+        )
+        for normalizer in self.normalizers:
+            request_json = normalizer(request_json)
+        return hashlib.sha256(request_json.encode()).hexdigest()
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT COUNT(*) FROM recordings"
+            ).fetchone()
+        return row[0]
+
+    def _claim_occurrence(
+        self, source: str, request: dict[str, Any]
+    ) -> tuple[str, int]:
+        request_hash = self.make_request_hash(source, request)
+        with self._lock:
+            occurrence = self._occurrences.get(request_hash, 0)
+            self._occurrences[request_hash] = occurrence + 1
+        return request_hash, occurrence
+
+    def _replay(
+        self,
+        source: str,
+        request_hash: str,
+        occurrence: int,
+        response_type: type[BaseModel] | None,
+    ) -> Any:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT response_json FROM recordings "
+                "WHERE request_hash = ? ORDER BY occurrence",
+                (request_hash,),
+            ).fetchall()
+            if rows:
+                self.replayed += 1
+        if not rows:
+            raise CassetteMissError(
+                f"No {source} recording in {self.file_path} matches request {request_hash}"
+            )
+        response_json = rows[occurrence % len(rows)][0]
+        if response_type is not None:
+            return response_type.model_validate_json(response_json)
+        return json.loads(response_json)
+
+    def _record(
+        self,
+        source: str,
+        request: dict[str, Any],
+        request_hash: str,
+        occurrence: int,
+        response: Any,
+    ) -> None:
+        if isinstance(response, BaseModel):
+            response_json = response.model_dump_json()
+        else:
+            response_json = json.dumps(response, default=str)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO recordings "
+                "(request_hash, occurrence, source, request_json, "
+                "response_json, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    request_hash,
+                    occurrence,
+                    source,
+                    json.dumps(request, sort_keys=True, default=str),
+                    response_json,
+                    time.time(),
+                ),
+            )
+            self._connection.commit()
+            self.recorded += 1
+
+    @staticmethod
+    def _create_connection(file_path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(file_path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS recordings ("
+            "request_hash TEXT NOT NULL, "
+            "occurrence INTEGER NOT NULL, "
+            "source TEXT NOT NULL, "
+            "request_json TEXT NOT NULL, "
+            "response_json TEXT NOT NULL, "
+            "recorded_at REAL NOT NULL, "
+            "PRIMARY KEY (request_hash, occurrence))"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS recordings_source "
+            "ON recordings (source)"
+        )
+        connection.commit()
+        return connection
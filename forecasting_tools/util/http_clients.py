@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import aiohttp
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class _EventLoopClients:
+    def __init__(
+        self,
+        aiohttp_session: aiohttp.ClientSession,
+        httpx_client: httpx.AsyncClient,
+    ) -> None:
+        self.aiohttp_session = aiohttp_session
+        self.httpx_client = httpx_client
+        self.users = 0
+
+    async def aclose(self) -> None:
+        await self.aiohttp_session.close()
+        await self.httpx_client.aclose()
+
+
+class SharedHttpClients:
+    """
+    One pool of keep-alive HTTP connections for all outbound requests.
+
+    Async clients are tied to an event loop, so they are opened and closed
+    with `SharedHttpClients.open()` around the work of a run (ForecastBot
+    does this around `forecast_questions`). Nested `open()` calls on the same
+    loop reuse the clients, which are closed when the outermost block exits.
+    ```
+    async with SharedHttpClients.open():
+        await bot.forecast_on_tournament(...)
+    ```
+    Outside an `open()` block, `aiohttp_session()` and `httpx_client()` fall
+    back to a short-lived client, so callers always work the same way.
+
+    The blocking `requests_session()` is process-wide and always pooled.
+    The httpx client uses HTTP/2 when the `h2` package is installed.
+    """
+
+    TOTAL_CONNECTION_LIMIT = 100
+    CONNECTIONS_PER_HOST_LIMIT = 20
+    KEEPALIVE_SECONDS = 30
+
+    _clients_by_event_loop: dict[
+        asyncio.AbstractEventLoop, _EventLoopClients
+    ] = {}
+    _requests_session: requests.Session | None = None
+    _requests_session_lock = threading.Lock()
+
+    @classmethod
+    @asynccontextmanager
+    async def open(cls) -> AsyncIterator[None]:
+        loop = asyncio.get_running_loop()
+        clients = cls._clients_by_event_loop.get(loop)
+        if clients is None:
+            clients = _EventLoopClients(
+                cls._create_aiohttp_session(), cls._create_httpx_client()
+            )
+            cls._clients_by_event_loop[loop] = clients
+        clients.users += 1
+        try:
+            yield
+        finally:
+            clients.users -= 1
+            if clients.users == 0:
+                del cls._clients_by_event_loop[loop]
+                await clients.aclose()
+
+    @classmethod
+    def is_open(cls) -> bool:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return loop in cls._clients_by_event_loop
+
+    @classmethod
+    @asynccontextmanager
+    async def aiohttp_session(cls) -> AsyncIterator[aiohttp.ClientSession]:
+        clients = cls._clients_by_event_loop.get(asyncio.get_running_loop())
+        if clients is not None:
+            yield clients.aiohttp_session
+            return
+        async with cls._create_aiohttp_session() as session:
+            yield session
+
+    @classmethod
+    @asynccontextmanager
+    async def httpx_client(cls) -> AsyncIterator[httpx.AsyncClient]:
+        clients = cls._clients_by_event_loop.get(asyncio.get_running_loop())
+        if clients is not None:
+            yield clients.httpx_client
+            return
+        async with cls._create_httpx_client() as client:
+            yield client
+
+    @classmethod
+    def requests_session(cls) -> requests.Session:
+        with cls._requests_session_lock:
+            if cls._requests_session is None:
+                cls._requests_session = cls._create_requests_session()
+            return cls._requests_session
+
+    @classmethod
+    def close_requests_session(cls) -> None:
+        with cls._requests_session_lock:
+            if cls._requests_session is not None:
+                cls._requests_session.close()
+                cls._requests_session = None
+
+    @classmethod
+    def _create_aiohttp_session(cls) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=cls.TOTAL_CONNECTION_LIMIT,
+            limit_per_host=cls.CONNECTIONS_PER_HOST_LIMIT,
+            keepalive_timeout=cls.KEEPALIVE_SECONDS,
+        )
+        return aiohttp.ClientSession(connector=connector)
+
+    @classmethod
+    def _create_httpx_client(cls) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=cls.TOTAL_CONNECTION_LIMIT,
+            max_keepalive_connections=cls.CONNECTIONS_PER_HOST_LIMIT,
+            keepalive_expiry=cls.KEEPALIVE_SECONDS,
+        )
+        return httpx.AsyncClient(
+            limits=limits, http2=cls._http2_is_available()
+        )
+
+    @classmethod
+    def _create_requests_session(cls) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=cls.TOTAL_CONNECTION_LIMIT,
+            pool_maxsize=cls.CONNECTIONS_PER_HOST_LIMIT,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @staticmethod
+    def _http2_is_available() -> bool:
+        return importlib.util.find_spec("h2") is not None
@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from collections import deque
+from typing import Any, Literal
+
+from aiohttp import web
+from pydantic import BaseModel, Field
+
+from forecasting_tools.ai_models.ai_utils.token_counting import TokenCounter
+from forecasting_tools.util import file_manipulation
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyDistribution(BaseModel):
+    """
+    Seconds before the first token is sent. "lognormal" has a long right tail
+    like real providers. "exponential" ignores `spread_in_seconds`.
+    """
+
+    kind: Literal["constant", "uniform", "exponential", "lognormal"] = (
+        "constant"
+    )
+    mean_in_seconds: float = Field(default=0, ge=0)
+    spread_in_seconds: float = Field(default=0, ge=0)
+
+    def sample(self, rng: random.Random) -> float:
+        mean = self.mean_in_seconds
+        if self.kind == "constant" or mean == 0:
+            return mean
+        if self.kind == "uniform":
+            spread = self.spread_in_seconds
+            return max(rng.uniform(mean - spread, mean + spread), 0)
+        if self.kind == "exponential":
+            return rng.expovariate(1 / mean)
+        sigma_squared = math.log(1 + (self.spread_in_seconds / mean) ** 2)
+        mu = math.log(mean) - sigma_squared / 2
+        return rng.lognormvariate(mu, math.sqrt(sigma_squared))
+
+
+class StubLlmServerConfig(BaseModel):
+    """
+    - `scripted_responses` are returned in order, cycling back to the start.
+    - `tokens_per_second` paces the completion after the first token (None
+    sends it at once).
+    - Each request fails with a 429, a 500 or hangs (a timeout) with the given
+    probabilities. Hung requests get a 504 after `hang_in_seconds`.
+    - `requests_per_minute_limit` and `tokens_per_minute_limit` make the
+    server enforce a real budget over a sliding minute, answering 429 with a
+    Retry-After header once it is spent.
+    """
+
+    latency: LatencyDistribution = LatencyDistribution()
+    tokens_per_second: float | None = Field(default=None, gt=0)
+    scripted_responses: list[str] = Field(
+        default_factory=lambda: ["Probability: 37%"], min_length=1
+    )
+    rate_limit_error_probability: float = Field(default=0, ge=0, le=1)
+    server_error_probability: float = Field(default=0, ge=0, le=1)
+    timeout_probability: float = Field(default=0, ge=0, le=1)
+    hang_in_seconds: float = Field(default=600, ge=0)
+    retry_after_in_seconds: float = Field(default=1, ge=0)
+    requests_per_minute_limit: int | None = Field(default=None, gt=0)
+    tokens_per_minute_limit: int | None = Field(default=None, gt=0)
+    seed: int | None = None
+
+
+class StubLlmServerMetrics(BaseModel):
+    requests_received: int = 0
+    responses_by_status: dict[int, int] = Field(default_factory=dict)
+    concurrent_requests: int = 0
+    max_concurrent_requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class StubLlmServer:
+    """
+    A local server that speaks the OpenAI chat-completions protocol, for load
+    testing bots, benchmarks and rate limiters without real providers.
+    Latency, throughput, errors and responses are set by a
+    StubLlmServerConfig. Streaming and multiple samples (`n`) are supported.
+
+    Point a GeneralLlm at it with a model name litellm knows as an OpenAI
+    model, so costs are still calculated:
+    ```
+    async with StubLlmServer(config) as server:
+        llm = GeneralLlm(model="gpt-4o", base_url=server.base_url, api_key="stub")
+        bot = TemplateBot(llms={"default": llm, "summarizer": llm})
+        await bot.forecast_questions(questions)
+        print(server.metrics)
+    ```
+    It can also be run on its own with
+    `python -m forecasting_tools.util.stub_llm_server --port 8000`.
+    """
+
+    def __init__(
+        self,
+        config: StubLlmServerConfig | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.config = config or StubLlmServerConfig()
+        self.host = host
+        self.port = port
+        self.metrics = StubLlmServerMetrics()
+        self._rng = random.Random(self.config.seed)
+        self._scripted_responses = itertools.cycle(
+            self.config.scripted_responses
+        )
+        self._recent_requests: deque[tuple[float, int]] = deque()
+        self._runner: web.AppRunner | None = None
+
+    async def __aenter__(self) -> StubLlmServer:
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.stop()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._chat_completions)
+        app.router.add_post("/chat/completions", self._chat_completions)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if self.port == 0:
+            self.port = site._server.sockets[0].getsockname()[1]  # type: ignore
+        logger.info(f"Stub LLM server listening on {self.base_url}")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _chat_completions(
+        self, request: web.Request
+    ) -> web.StreamResponse:
+        self.metrics.requests_received += 1
+        self.metrics.concurrent_requests += 1
+        self.metrics.max_concurrent_requests = max(
+            self.metrics.max_concurrent_requests,
+            self.metrics.concurrent_requests,
+        )
+        try:
+            response = await self._respond(request)
+        finally:
+            self.metrics.concurrent_requests -= 1
+        self.metrics.responses_by_status[response.status] = (
+            self.metrics.responses_by_status.get(response.status, 0) + 1
+        )
+        return response
+
+    async def _respond(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        messages = body.get("messages", [])
+        prompt_tokens = TokenCounter.approximate_tokens(messages)
+
+        over_budget_response = self._check_budget(prompt_tokens)
+        if over_budget_response is not None:
+            return over_budget_response
+        injected_error_response = await self._maybe_inject_error()
+        if injected_error_response is not None:
+            return injected_error_response
+
+        number_of_samples = body.get("n") or 1
+        answers = [
+            next(self._scripted_responses) for _ in range(number_of_samples)
+        ]
+        completion_tokens = sum(
+            TokenCounter.approximate_tokens(answer) for answer in answers
+        )
+        self.metrics.prompt_tokens += prompt_tokens
+        self.metrics.completion_tokens += completion_tokens
+
+        await asyncio.sleep(self.config.latency.sample(self._rng))
+        model = body.get("model", "stub")
+        if body.get("stream"):
+            return await self._stream_answer(request, model, answers[0])
+        if self.config.tokens_per_second is not None:
+            await asyncio.sleep(
+                completion_tokens / self.config.tokens_per_second
+            )
+        return web.json_response(
+            self._make_completion(
+                model, answers, prompt_tokens, completion_tokens
+            )
+        )
+
+    def _check_budget(self, prompt_tokens: int) -> web.Response | None:
+        now = time.monotonic()
+        while self._recent_requests and self._recent_requests[0][0] < now - 60:
+            self._recent_requests.popleft()
+        requests_in_last_minute = len(self._recent_requests)
+        tokens_in_last_minute = sum(
+            tokens for _, tokens in self._recent_requests
+        )
+        requests_over_limit = (
+            self.config.requests_per_minute_limit is not None
+            and requests_in_last_minute
+            >= self.config.requests_per_minute_limit
+        )
+        tokens_over_limit = (
+            self.config.tokens_per_minute_limit is not None
+            and tokens_in_last_minute + prompt_tokens
+            > self.config.tokens_per_minute_limit
+        )
+        if requests_over_limit or tokens_over_limit:
+            retry_after = (
+                self._recent_requests[0][0] + 60 - now
+                if self._recent_requests
+                else self.config.retry_after_in_seconds
+            )
+            return self._make_error(
+                429, "rate_limit_exceeded", "Rate limit reached", retry_after
+            )
+        self._recent_requests.append((now, prompt_tokens))
+        return None
+
+    async def _maybe_inject_error(self) -> web.Response | None:
+        roll = self._rng.random()
+        if roll < self.config.rate_limit_error_probability:
+            return self._make_error(
+                429,
+                "rate_limit_exceeded",
+                "Injected rate limit",
+                self.config.retry_after_in_seconds,
+            )
+        roll -= self.config.rate_limit_error_probability
+        if roll < self.config.server_error_probability:
+            return self._make_error(500, "server_error", "Injected error")
+        roll -= self.config.server_error_probability
+        if roll < self.config.timeout_probability:
+            await asyncio.sleep(self.config.hang_in_seconds)
+            return self._make_error(504, "timeout", "Injected timeout")
+        return None
+
+    async def _stream_answer(
+        self, request: web.Request, model: str, answer: str
+    ) -> web.StreamResponse:
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream"}
+        )
+        await response.prepare(request)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        words = answer.split(" ")
+        for index, word in enumerate(words):
+            text = word if index == 0 else f" {word}"
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"role": "assistant", "content": text},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            if self.config.tokens_per_second is not None:
+                await asyncio.sleep(
+                    TokenCounter.approximate_tokens(text)
+                    / self.config.tokens_per_second
+                )
+        final_chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        await response.write(f"data: {json.dumps(final_chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    @staticmethod
+    def _make_completion(
+        model: str,
+        answers: list[str],
+        prompt_tokens: int,
+        completion_tokens: int,
+    ) -> dict[str, Any]:
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": index,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }
+                for index, answer in enumerate(answers)
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @staticmethod
+    def _make_error(
+        status: int,
+        error_type: str,
+        message: str,
+        retry_after_in_seconds: float | None = None,
+    ) -> web.Response:
+        headers = {}
+        if retry_after_in_seconds is not None:
+            headers["retry-after"] = f"{max(retry_after_in_seconds, 0):.3f}"
+        return web.json_response(
+            {"error": {"message": message, "type": error_type, "code": None}},
+            status=status,
+            headers=headers,
+        )
+
+
+async def _serve_forever(server: StubLlmServer) -> None:
+    async with server:
+        print(f"Stub LLM server listening on {server.base_url}")
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run a local OpenAI-compatible stub LLM server"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--config",
+        help="Path to a JSON file with StubLlmServerConfig fields",
+    )
+    args = parser.parse_args()
+    config = StubLlmServerConfig()
+    if args.config:
+        config = StubLlmServerConfig.model_validate_json(
+            file_manipulation.load_text_file(args.config)
+        )
+    asyncio.run(_serve_forever(StubLlmServer(config, args.host, args.port)))
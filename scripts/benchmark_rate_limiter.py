@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import logging
+
+from forecasting_tools.ai_models.resource_managers.rate_limiter_simulation import (
+    compare_rate_limiter_algorithms,
+)
+from forecasting_tools.util.custom_logger import CustomLogger
+
+logger = logging.getLogger(__name__)
+
+
+def benchmark_rate_limiter() -> None:
+    # Roughly a 60 requests per minute limit hammered for 10 minutes
+    results = compare_rate_limiter_algorithms(
+        capacity=60,
+        refresh_rate=1,
+        simulated_seconds=600,
+        concurrent_callers=10,
+    )
+    for result in results:
+        logger.info(
+            f"{result.algorithm.name}: "
+            f"{result.resources_acquired:.0f} acquired in "
+            f"{result.simulated_seconds:.0f} simulated seconds "
+            f"({result.resources_per_second:.3f}/s), "
+            f"longest stall {result.longest_gap_in_seconds:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    CustomLogger.setup_logging()
+    benchmark_rate_limiter()